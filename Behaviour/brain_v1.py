@@ -341,7 +341,6 @@ class Brain(BaseBrain):
       new_location = helpers.sum_vectors(self.Body.getLocation(), helpers.scale( \
                      self.Body.step, helpers.make_unit(location)))
       print('climbing beam', beam.name)
-    self.Body.model.SetModelIsLocked(False)
     self.Body.changeLocationOnStructure(new_location, beam)
     return True
 
@@ -489,19 +488,7 @@ class Brain(BaseBrain):
   Finds and returns the number of beams with endpoints within sphere of location
   '''
   def get_structure_density(self, location, radius=BConstants.beam['density_radius']):
-    boxes = self.Body.structure.get_boxes(location, radius)
-    nearby_beams = []
-    for box in boxes:
-      for beam_name in box.keys():
-        beam_info = box[beam_name].current_state()
-        endpoint_1, endpoint_2 = beam_info['endpoints']
-        distance_1, distance_2 = helpers.distance(location, endpoint_1), helpers.distance(location, endpoint_2)
-        if distance_1 <= radius or distance_2 <= radius:
-          if [beam_name, distance_1, distance_2] not in nearby_beams:
-            nearby_beams.append([beam_name, distance_1, distance_2])
-    #print(nearby_beams)
-    num_beams = len(nearby_beams)
-    return num_beams
+    return self.Body.structure.density(location, radius)
 
   def update_radius(self):
     center = CONSTRUCTION['center']
@@ -509,8 +496,7 @@ class Brain(BaseBrain):
     boxes = self.Body.structure.get_boxes(center, max_radius + 120)
     for box in boxes:
       for beam_name in box.keys():
-        beam_info = box[beam_name].current_state()
-        endpoint_1, endpoint_2 = beam_info['endpoints']
+        endpoint_1, endpoint_2 = box[beam_name].endpoints
         distance = 0
         if endpoint_1[2] == 0:
           distance = helpers.distance(center, endpoint_1)
@@ -388,10 +388,10 @@ class Brain(BaseBrain):
     # a direction and store that
     else:
       # Before we decide, we need to make sure that we have access to analysis
-      # results. Therefore, check to see if the model is locked. If it is not,
-      # then execute and analysis.
-      if not self.Body.model.GetModelIsLocked() and self.Body.needData():
-        errors = helpers.run_analysis(self.Body.model)
+      # results. Therefore, request them (the model is only analyzed if the 
+      # results are out of date).
+      if self.Body.needData():
+        errors = self.Body.scheduler.request()
         assert errors == ''
 
       self.Body.addToMemory('next_direction_info', self.get_direction())
@@ -1353,9 +1353,9 @@ class Brain(BaseBrain):
 
       # We still have steps to go, so run an analysis if necessary
       elif self.Body.beam is not None:
-        # Run analysis before deciding to get the next direction
-        if not self.Body.model.GetModelIsLocked() and self.Body.needData():
-          errors = helpers.run_analysis(self.Body.model)
+        # Obtain analysis results before deciding to get the next direction
+        if self.Body.needData():
+          errors = self.Body.scheduler.request()
           if errors != '':
             # pdb.set_trace()
             pass
@@ -1363,17 +1363,11 @@ class Brain(BaseBrain):
         # Get next direction
         self.Body.addToMemory('next_direction_info', self.get_direction())
 
-        # Unlock the results so that we can actually move
-        if self.Body.model.GetModelIsLocked():
-          self.Body.model.SetModelIsLocked(False)
-
         # Move
         self.do_action()
 
       # We climbed off
       else:
-        assert not self.Body.model.GetModelIsLocked()
-        
         self.do_action()
 
     # The direction is larger than the usual step, so move only the step in the 
@@ -1396,7 +1390,7 @@ class Brain(BaseBrain):
 
     # Filter out directions which are unfeasable if we have an analysis result
     # available
-    if self.Body.model.GetModelIsLocked():
+    if not self.Body.scheduler.dirty():
       feasable_directions = self.filter_feasable(info['directions'])
     else:
       feasable_directions = info['directions']
@@ -1450,7 +1444,7 @@ class Brain(BaseBrain):
     to none.
     '''
     # Sanity check
-    assert self.Body.model.GetModelIsLocked()
+    assert not self.Body.scheduler.dirty()
 
     results = {}
     # If at a joint, cycle through possible directions and check that the beams
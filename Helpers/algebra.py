@@ -46,19 +46,10 @@ def dot(v1,v2):
   '''
   Dots two vectors
   '''
-  loc1, dot = 0, 0
-  for coord1 in v1:
-    loc1 += 1
-    loc2 = 0
-    for coord2 in v2:
-      loc2 += 1
-      if loc1 == loc2:
-        dot += coord1 * coord2
-
   # checking the lenght of the tuples
-  assert (loc1 == loc2)
+  assert len(v1) == len(v2)
 
-  return dot
+  return sum(x * y for x, y in zip(v1,v2))
 
 def sum_vectors(v1,v2):
   '''
@@ -148,4 +139,15 @@ def multiplyMatrices(A, B):
   return C
 
 def multiplyScalar(A, c):
-  return tuple(scale(c,row) for row in A)
\ No newline at end of file
+  return tuple(scale(c,row) for row in A)
+
+
+# BACKEND SELECTION
+
+# The vector operations above can be swapped for their NumPy (float64) 
+# counterparts in vectorized.py, which share the same tuple API. This lets us 
+# compare both backends on the same seed. Everything importing from this module
+# picks up whichever backend is selected.
+if PROGRAM['algebra_backend'] == 'numpy':
+  from Helpers.vectorized import (distance, dot, sum_vectors, sub_vectors, 
+    scale, length, make_unit, cross)
@@ -15,15 +15,20 @@ from Helpers.helpers import path_exists
 # program constants
 from variables import PROGRAM
 
-def io(inputfile = "", outputfile = "C:\SAP 2000\output.sdb"):
+def io(inputfile = "", outputfile = "C:\SAP 2000\output.sdb", backend = None):
   """
   Opens the specified inputfile and outputfile. By default, it creates a new 
   model if no inputfile is specified and saves it as the specified outputfile. 
   If no outputfile is specified, the default location is 
-  "C:\SAP 2000\output.sdb". Returns the program and model.
+  "C:\SAP 2000\output.sdb". The backend is either "com" (SAP2000) or "local"
+  (the in-process solver in SAP2000/local.py), PROGRAM['sap_backend'] by 
+  default. Returns the program and model.
   """
+  if backend is None:
+    backend = PROGRAM['sap_backend']
+
   # start program
-  program = sap2000.Sap2000()
+  program = sap2000.Sap2000(backend)
 
   # This opens the model if it is passed in
   program.start(filename=inputfile)
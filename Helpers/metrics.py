@@ -0,0 +1,140 @@
+'''
+Columnar store of the metrics recorded for the robots at every timestep (their
+location and the moment they last read). Rows are kept in fixed-size numpy
+columns and written out as a chunk (<folder>metrics/locations-<n>.npy)
+whenever they fill up, so memory stays bounded however long the run is. Rows
+refer to the robots by id, which is the line of their name in
+<folder>metrics/robots.txt.
+
+load() reads all of the chunks of a folder back as one structured array, and
+export_excel() writes them out as the old locations-*.xlsx sheets.
+'''
+# Python default libraries
+import glob
+import os
+
+# Third party libraries
+import numpy as np
+
+# Importing helper functions
+from Helpers import helpers
+
+# Columns of the metrics of the robots
+LOCATIONS = np.dtype([('timestep','<u4'),('robot','<u4'),('x','<f8'),
+  ('y','<f8'),('z','<f8'),('read_moment','<f8')])
+
+# Number of rows in each chunk
+CHUNK_SIZE = 1 << 14
+
+def metrics_folder(folder):
+  '''
+  Returns the folder where the metrics of the run in the folder are written
+  '''
+  return os.path.join(folder,'metrics')
+
+class MetricsSink(object):
+  def __init__(self,folder,chunk_size = CHUNK_SIZE):
+    super(MetricsSink,self).__init__()
+
+    self.folder = metrics_folder(folder)
+    helpers.path_exists(self.folder)
+
+    # Ids of the robots, {name : id}
+    self.robots = {}
+
+    # Rows waiting to be written, and the number of chunks written so far
+    self.rows = np.zeros(chunk_size,dtype=LOCATIONS)
+    self.count = 0
+    self.chunks = len(glob.glob(os.path.join(self.folder,'locations-*.npy')))
+
+  def add(self,timestep,data):
+    '''
+    Stores the location and read moment of every robot at the timestep, where
+    data is a snapshot of the swarm (see SmartSwarm.get_information)
+    '''
+    for name in data.names:
+      if name not in self.robots:
+        self.robots[name] = len(self.robots)
+        with open(os.path.join(self.folder,'robots.txt'),'a') as robots:
+          robots.write("{}\n".format(name))
+    ids = [self.robots[name] for name in data.names]
+    locations = data.values['location']
+    moments = data.values['read_moment']
+
+    start = 0
+    while start < len(ids):
+      if self.count == len(self.rows):
+        self.flush()
+      end = min(len(ids),start + len(self.rows) - self.count)
+      rows = self.rows[self.count:self.count + end - start]
+      rows['timestep'] = timestep
+      rows['robot'] = ids[start:end]
+      rows['x'], rows['y'], rows['z'] = locations[start:end].T
+      rows['read_moment'] = moments[start:end]
+      self.count += end - start
+      start = end
+
+  def flush(self):
+    '''
+    Writes out the stored rows as a new chunk
+    '''
+    if self.count > 0:
+      np.save(os.path.join(self.folder,'locations-{:05d}.npy'.format(
+        self.chunks)),self.rows[:self.count])
+      self.chunks += 1
+      self.count = 0
+
+  def close(self):
+    self.flush()
+
+def load(folder):
+  '''
+  Returns the names of the robots and all of the rows stored for the run in
+  the folder
+  '''
+  folder = metrics_folder(folder)
+  names = []
+  if os.path.exists(os.path.join(folder,'robots.txt')):
+    with open(os.path.join(folder,'robots.txt'),'r') as robots:
+      names = [line.rstrip('\n') for line in robots]
+  chunks = [np.load(chunk) for chunk in sorted(glob.glob(os.path.join(folder,
+    'locations-*.npy')))]
+  return names, (np.concatenate(chunks) if chunks != [] else
+    np.zeros(0,dtype=LOCATIONS))
+
+def export_excel(folder,file_name):
+  '''
+  Writes the metrics of the run in the folder to an excel file, with one row
+  per timestep and a location, height and measured moment column per robot.
+  Returns whether the file was written (xlsxwriter is needed).
+  '''
+  try:
+    from xlsxwriter.workbook import Workbook
+  except ImportError:
+    print("xlsxwriter is not installed. Cannot write {}.".format(file_name))
+    return False
+
+  names, rows = load(folder)
+
+  # Open work book
+  workbook = Workbook(file_name)
+  worksheet = workbook.add_worksheet()
+
+  # Write headers in the first row
+  for robot, name in enumerate(names):
+    worksheet.write(0,3 * robot,name)
+    worksheet.write(0,3 * robot + 1,"{}-height".format(name))
+    worksheet.write(0,3 * robot + 2,"{}-measured moment".format(name))
+
+  # Write the data of each timestep in the following rows
+  timesteps = np.unique(rows['timestep'])
+  for row in rows:
+    line = 1 + int(np.searchsorted(timesteps,row['timestep']))
+    col = 3 * int(row['robot'])
+    worksheet.write(line,col,str((float(row['x']),float(row['y']),
+      float(row['z']))))
+    worksheet.write(line,col + 1,float(row['z']))
+    worksheet.write(line,col + 2,float(row['read_moment']))
+
+  workbook.close()
+  return True
@@ -0,0 +1,168 @@
+'''
+Writes the text files of a run (robot_data.txt, structure_height.txt, ...).
+An OutputSink opens each file once, the first time it is written to, and
+keeps it open with a large buffer until it is closed, instead of opening and
+closing files every timestep.
+
+Writes can optionally be done by a background thread, fed through a bounded
+queue. The simulation then only queues snapshots of its data (which must not
+be changed afterwards) along with the function that formats them, so both the
+formatting and the disk are off the simulation thread. The queue blocks the
+simulation when it is full, so a slow disk holds the simulation back instead
+of filling up the memory. Errors on the writer thread are raised on the next
+call from the simulation. Whatever is queued is always written: flush() and
+close() wait for the queue to drain, and sinks that are not closed are closed
+when python exits.
+'''
+# Python default libraries
+import atexit
+import pprint
+import queue
+import threading
+
+# Size of the buffer of each file
+BUFFER_SIZE = 1 << 20
+
+# Number of writes waiting for the writer thread before writing blocks
+QUEUE_SIZE = 1024
+
+def robot_data(data,timestep):
+  '''
+  Formats the information of the swarm at a timestep (see
+  SmartSwarm.get_information) for robot_data.txt
+  '''
+  text = ["Data for Timestep: {}\n\n\n".format(str(timestep))]
+  for name, state in data.items():
+    text.append("{} = \n\n".format(name))
+    for key, value in state.items():
+      text.append("{} : {}\n".format(key,pprint.pformat(value)))
+    text.append("\n")
+  text.append("\n")
+  return ''.join(text)
+
+def structure_physics(structure_data):
+  '''
+  Formats the moments of the beams at every timestep (see
+  Structure.structure_data) for structure_physics.txt
+  '''
+  return ''.join(''.join("{},{},".format(beam,str(moment)) for beam,moment in
+    timestep) + "\n" for timestep in structure_data)
+
+class OutputSink(object):
+  def __init__(self,folder,threaded = False,buffer_size = BUFFER_SIZE,
+    queue_size = QUEUE_SIZE):
+    super(OutputSink,self).__init__()
+
+    # The files are all in this folder
+    self.folder = folder
+    self.buffer_size = buffer_size
+
+    # The open files, {name : file}
+    self.files = {}
+
+    # Writes waiting for the writer thread (None if there is no thread), and
+    # the last error on the thread that has not been raised yet
+    self.queue = None
+    self.thread = None
+    self.error = None
+    if threaded:
+      self.queue = queue.Queue(queue_size)
+      self.thread = threading.Thread(target=self.__run,name="OutputSink")
+      self.thread.daemon = True
+      self.thread.start()
+      atexit.register(self.close)
+
+  def __file(self,name):
+    '''
+    Returns the open file with the name, opening it the first time
+    '''
+    if name not in self.files:
+      self.files[name] = open(self.folder + name,'a',buffering=self.buffer_size)
+    return self.files[name]
+
+  def __write(self,name,text):
+    self.__file(name).write(text)
+
+  def __run(self):
+    '''
+    Writes the queued text until close() queues None
+    '''
+    while True:
+      item = self.queue.get()
+      try:
+        if item is None:
+          return
+        # Nothing else is written after an error, until it is raised
+        if self.error is None:
+          function, args = item
+          function(*args)
+      except Exception as e:
+        self.error = e
+      finally:
+        self.queue.task_done()
+
+  def __check(self):
+    '''
+    Raises the last error on the writer thread, if there is one
+    '''
+    if self.error is not None:
+      error, self.error = self.error, None
+      raise error
+
+  def open(self,*names):
+    '''
+    Opens the named files (creating them if they do not exist)
+    '''
+    for name in names:
+      self.write(name,'')
+
+  def call(self,function,*args):
+    '''
+    Calls the function with the arguments on the writer thread (right away if
+    there is none)
+    '''
+    if self.queue is None:
+      function(*args)
+    else:
+      self.__check()
+      self.queue.put((function,args))
+
+  def write(self,name,text):
+    '''
+    Appends the text to the named file
+    '''
+    self.call(self.__write,name,text)
+
+  def __format(self,name,format,args):
+    self.__write(name,format(*args))
+
+  def submit(self,name,format,*snapshot):
+    '''
+    Appends format(*snapshot) to the named file, formatting it on the writer
+    thread. The snapshot must not be changed afterwards.
+    '''
+    self.call(self.__format,name,format,snapshot)
+
+  def flush(self):
+    '''
+    Waits for the writes so far, and writes the buffers of all files to disk
+    '''
+    if self.queue is not None:
+      self.queue.join()
+      self.__check()
+    for output in self.files.values():
+      output.flush()
+
+  def close(self):
+    '''
+    Finishes the writes so far and closes all files
+    '''
+    if self.queue is not None:
+      self.queue.put(None)
+      self.thread.join()
+      self.queue = None
+      atexit.unregister(self.close)
+    for output in self.files.values():
+      output.close()
+    self.files = {}
+    self.__check()
@@ -0,0 +1,367 @@
+'''
+Binary logs of the trajectory of the simulation, used by the visualization.
+A trajectory file is an append-only sequence of fixed-size records:
+
+  timestep  uint32      timestep the record belongs to
+  entity    uint32      id of the robot or beam (see below)
+  kind      uint8       what the value is (one of KINDS)
+  value     3 float32   a location (xyz) or a color (rgb)
+
+A STEP record marks the start of every timestep, so the records before the
+first one belong to timestep 0. Beams are recorded as two records, one per
+endpoint, which are always written together. Values are only written when they
+change, so the state at a timestep is the last value recorded for every entity
+and kind up to it. Entity ids index the names in a text file next to the
+trajectory (<path>.names, one name per line), which are written before the
+first record that uses them.
+
+Every now and then, a keyframe holds the full state: a KEYFRAME record followed
+by the current value of every entity and kind, whose kinds are marked with KEY.
+The state at a timestep is then the last keyframe before its end, updated with
+the changes recorded after it, so it is rebuilt without reading the timesteps
+before the keyframe. Keyframes are not part of the changes of a timestep.
+
+Records are buffered and written in large blocks by TrajectoryWriter. They are
+read back by TrajectoryReader, which memory-maps the file and finds timesteps
+and keyframes through an index of the first record of each one. The index is
+saved next to the trajectory (<path>.index) the first time the file is read,
+so any timestep can be found right away.
+'''
+# Python default libraries
+import os
+
+# Third party libraries
+import numpy as np
+
+# Start of every trajectory file (and version of the format)
+MAGIC = b'SWTRAJ01'
+
+# Layout of every record
+RECORD = np.dtype([('timestep','<u4'),('entity','<u4'),('kind','u1'),
+  ('value','<f4',(3,))])
+
+# Kinds of records
+STEP, ROBOT, ROBOT_COLOR, BEAM_I, BEAM_J, BEAM_COLOR = range(6)
+KINDS = (STEP, ROBOT, ROBOT_COLOR, BEAM_I, BEAM_J, BEAM_COLOR)
+KEYFRAME = len(KINDS)
+
+# Marks the kinds of the records in a keyframe
+KEY = 0x80
+
+# Number of records buffered before they are written
+BUFFER_SIZE = 1 << 16
+
+def names_path(path):
+  '''
+  Returns the path of the file with the entity names of a trajectory
+  '''
+  return path + '.names'
+
+def index_path(path):
+  '''
+  Returns the path of the file with the timestep index of a trajectory
+  '''
+  return path + '.index'
+
+class TrajectoryWriter(object):
+  def __init__(self,path,buffer_size = BUFFER_SIZE):
+    super(TrajectoryWriter,self).__init__()
+
+    self.path = path
+
+    # The current timestep (incremented by step)
+    self.timestep = 0
+
+    # Ids of the entities, {name : id}, and the names not yet written
+    self.ids = {}
+    self.new_names = []
+
+    # Last value written for every kind and entity (NaN if there is none),
+    # indexed by [kind, id]
+    self.values = np.full((len(KINDS),0,3),np.nan,dtype=np.float32)
+
+    # Records waiting to be written
+    self.buffer = np.zeros(buffer_size,dtype=RECORD)
+    self.count = 0
+
+    # Start the file, unless we are appending to an existing one
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+      with open(path,'wb') as trajectory:
+        trajectory.write(MAGIC)
+      open(names_path(path),'w').close()
+    else:
+      with open(names_path(path),'r') as names:
+        for line in names:
+          self.ids[line.rstrip('\n')] = len(self.ids)
+      self.__grow()
+      self.timestep = TrajectoryReader(path).timesteps()
+
+  def __grow(self):
+    '''
+    Makes room in self.values for every id
+    '''
+    if len(self.ids) > self.values.shape[1]:
+      extra = max(len(self.ids),2 * self.values.shape[1]) - self.values.shape[1]
+      self.values = np.concatenate((self.values,np.full((len(KINDS),extra,3),
+        np.nan,dtype=np.float32)),axis=1)
+
+  def entities(self,names):
+    '''
+    Returns the ids of the named entities (as an array), adding new ones
+    '''
+    ids = []
+    for name in names:
+      name = str(name)
+      if name not in self.ids:
+        self.ids[name] = len(self.ids)
+        self.new_names.append(name)
+      ids.append(self.ids[name])
+    self.__grow()
+    return np.array(ids,dtype=np.uint32)
+
+  def __append(self,timestep,ids,kind,values):
+    '''
+    Adds the records to the buffer, writing it out whenever it is full
+    '''
+    start = 0
+    while start < len(ids):
+      if self.count == len(self.buffer):
+        self.flush()
+      end = min(len(ids),start + len(self.buffer) - self.count)
+      records = self.buffer[self.count:self.count + end - start]
+      records['timestep'] = timestep
+      records['entity'] = ids[start:end]
+      records['kind'] = kind
+      records['value'] = values[start:end]
+      self.count += end - start
+      start = end
+
+  def step(self):
+    '''
+    Starts the next timestep
+    '''
+    self.timestep += 1
+    self.__append(self.timestep,np.zeros(1,dtype=np.uint32),STEP,
+      np.full((1,3),np.nan,dtype=np.float32))
+
+  def __record(self,kinds,names,values):
+    '''
+    Records the values of the given kinds (one list of xyz or rgb triples per
+    kind, one triple per name) of the named entities for the current timestep.
+    The values of an entity are skipped if none of them has changed since they
+    were last recorded.
+    '''
+    if len(names) == 0:
+      return
+    ids = self.entities(names)
+    values = [np.asarray(kind_values,dtype=np.float32).reshape((len(ids),3))
+      for kind_values in values]
+
+    # NaN never compares equal, so new entities are always written
+    changed = np.zeros(len(ids),dtype=bool)
+    for kind, kind_values in zip(kinds,values):
+      changed |= np.any(self.values[kind,ids] != kind_values,axis=1)
+    for kind, kind_values in zip(kinds,values):
+      self.values[kind,ids[changed]] = kind_values[changed]
+      self.__append(self.timestep,ids[changed],kind,kind_values[changed])
+
+  def record(self,kind,names,values):
+    '''
+    Records the values (one xyz or rgb triple per name) of the named entities
+    for the current timestep. Values which have not changed since they were
+    last recorded are skipped.
+    '''
+    self.__record((kind,),names,(values,))
+
+  def robots(self,names,locations,colors):
+    '''
+    Records the locations and colors of the named robots
+    '''
+    self.record(ROBOT,names,locations)
+    self.record(ROBOT_COLOR,names,colors)
+
+  def beams(self,names,i_ends,j_ends):
+    '''
+    Records the endpoints of the named beams
+    '''
+    self.__record((BEAM_I,BEAM_J),names,(i_ends,j_ends))
+
+  def beam_colors(self,names,colors):
+    '''
+    Records the colors of the named beams
+    '''
+    self.record(BEAM_COLOR,names,colors)
+
+  def keyframe(self):
+    '''
+    Records the full state of every entity at the current point of the
+    timestep
+    '''
+    self.__append(self.timestep,np.zeros(1,dtype=np.uint32),KEYFRAME,
+      np.full((1,3),np.nan,dtype=np.float32))
+    for kind in KINDS:
+      ids = np.flatnonzero(~np.isnan(self.values[kind]).any(axis=1))
+      self.__append(self.timestep,ids.astype(np.uint32),kind | KEY,
+        self.values[kind,ids])
+
+  def flush(self):
+    '''
+    Writes out the new names and the buffered records
+    '''
+    if self.new_names != []:
+      with open(names_path(self.path),'a') as names:
+        names.write(''.join(name + '\n' for name in self.new_names))
+      self.new_names = []
+    if self.count > 0:
+      with open(self.path,'ab') as trajectory:
+        trajectory.write(self.buffer[:self.count].tobytes())
+      self.count = 0
+
+  def close(self):
+    self.flush()
+
+class TrajectoryReader(object):
+  def __init__(self,path):
+    super(TrajectoryReader,self).__init__()
+
+    with open(path,'rb') as trajectory:
+      if trajectory.read(len(MAGIC)) != MAGIC:
+        raise ValueError("{} is not a trajectory file".format(path))
+
+    # The records are only read from disk when they are used
+    if os.path.getsize(path) - len(MAGIC) >= RECORD.itemsize:
+      self.records = np.memmap(path,dtype=RECORD,mode='r',offset=len(MAGIC))
+    else:
+      self.records = np.zeros(0,dtype=RECORD)
+    with open(names_path(path),'r') as names:
+      self.names = [line.rstrip('\n') for line in names]
+
+    # The first record of every timestep, followed by the number of records,
+    # and the KEYFRAME record of every keyframe
+    self.index, self.keyframes = self.__load_index(path)
+
+    # The first endpoints of every beam, found the first time they are needed
+    self.__endpoints = None
+
+  def __load_index(self,path):
+    '''
+    Returns the index of the timesteps and keyframes, building and saving it if
+    there is no saved index or the trajectory has grown since it was saved
+    '''
+    try:
+      with open(index_path(path),'rb') as index_file:
+        index = np.load(index_file)
+        keyframes = np.load(index_file)
+      if len(index) > 0 and index[-1] == len(self.records):
+        return index, keyframes
+    except (IOError,ValueError):
+      pass
+
+    index = np.searchsorted(self.records['timestep'],
+      np.arange(self.timesteps() + 2)).astype(np.int64)
+    keyframes = np.flatnonzero(self.records['kind'] == KEYFRAME).astype(np.int64)
+    try:
+      with open(index_path(path),'wb') as index_file:
+        np.save(index_file,index)
+        np.save(index_file,keyframes)
+    except IOError:
+      pass
+    return index, keyframes
+
+  def __len__(self):
+    '''
+    Returns the number of timesteps in the trajectory
+    '''
+    return self.timesteps() + 1
+
+  def timesteps(self):
+    '''
+    Returns the number of the last timestep (timesteps go from 0 to it)
+    '''
+    return int(self.records['timestep'][-1]) if len(self.records) > 0 else 0
+
+  def timestep(self,timestep):
+    '''
+    Returns the records of a timestep
+    '''
+    return self.records[self.index[timestep]:self.index[timestep + 1]]
+
+  def __frame(self,records):
+    '''
+    Returns the records as (robot locations, robot colors, beam endpoints, beam
+    colors). Each is a list of (name, [values]), where the values are one xyz
+    (or rgb) tuple, or the i and j endpoints of a beam.
+    '''
+    frame = {kind : [] for kind in KINDS}
+    endpoints = {}
+    for entity, kind, value in zip(records['entity'].tolist(),
+      records['kind'].tolist(),records['value'].tolist()):
+      if kind in (BEAM_I,BEAM_J):
+        if entity not in endpoints:
+          endpoints[entity] = [None,None]
+          frame[BEAM_I].append((self.names[entity],endpoints[entity]))
+        endpoints[entity][kind - BEAM_I] = tuple(value)
+      elif kind in KINDS and kind != STEP:
+        frame[kind].append((self.names[entity],[tuple(value)]))
+
+    return frame[ROBOT], frame[ROBOT_COLOR], frame[BEAM_I], frame[BEAM_COLOR]
+
+  def frame(self,timestep):
+    '''
+    Returns the changes at a timestep (see __frame for the format)
+    '''
+    return self.__frame(self.timestep(timestep))
+
+  def frames(self):
+    '''
+    Yields the changes at every timestep
+    '''
+    for timestep in range(len(self)):
+      yield self.frame(timestep)
+
+  def __first_endpoints(self):
+    '''
+    Returns the first endpoints recorded for every beam in the trajectory, as
+    (entities, the record of their first endpoints, i, j). They are found once
+    and kept, since the records are never changed.
+    '''
+    if self.__endpoints is None:
+      # Both endpoints of a beam are always written together, so both kinds
+      # hold the same entities
+      positions = []
+      for kind in (BEAM_I,BEAM_J):
+        records = np.flatnonzero(self.records['kind'] == kind)
+        entities, first = np.unique(self.records['entity'][records],
+          return_index=True)
+        positions.append(records[first])
+      self.__endpoints = (entities,np.maximum(*positions),
+        self.records['value'][positions[0]].tolist(),
+        self.records['value'][positions[1]].tolist())
+    return self.__endpoints
+
+  def origins(self,timestep):
+    '''
+    Returns the first endpoints recorded for every beam up to the end of a
+    timestep, as {name : [i, j]}
+    '''
+    entities, positions, i, j = self.__first_endpoints()
+    return {self.names[entities[k]] : [tuple(i[k]),tuple(j[k])] for k in
+      np.flatnonzero(positions < self.index[timestep + 1]).tolist()}
+
+  def state(self,timestep):
+    '''
+    Returns the state of every robot and beam at the end of a timestep, in the
+    same format as the changes of a timestep
+    '''
+    # The last keyframe before the end of the timestep and the changes since
+    end = self.index[timestep + 1]
+    keyframe = np.searchsorted(self.keyframes,end) - 1
+    start = self.keyframes[keyframe] if keyframe >= 0 else 0
+    records = np.array(self.records[start:end])
+    records['kind'] &= KEY - 1
+
+    # The last record of every kind and entity
+    keys = (records['kind'].astype(np.int64) * max(len(self.names),1) +
+      records['entity'])
+    _, last = np.unique(keys[::-1],return_index=True)
+    return self.__frame(records[np.sort(len(records) - 1 - last)])
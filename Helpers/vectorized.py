@@ -0,0 +1,230 @@
+'''
+NumPy implementation of the vector operations in algebra.py. Every function
+works on float64 arrays. The first section mirrors the tuple API of algebra.py
+(taking and returning tuples) so that it can be used as a drop-in backend for
+it (see PROGRAM['algebra_backend'] in variables.py). The second section
+contains batched versions of the same operations, which take arrays of points
+or segments and do the work for all of them in one pass:
+
+distances()       - N points vs one point
+dots()            - N vectors vs one vector
+crosses()         - N vectors vs one vector
+points_on_line()  - N points vs one line
+between_points()  - N points vs N pairs of bounds
+parallel_to()     - N segments vs one segment
+intersections()   - N segments vs one segment
+'''
+# Third party libraries
+import numpy as np
+
+# Constants for the simulation are stored in this file
+from variables import PROGRAM
+
+def as_array(v):
+  '''
+  Returns v (a tuple, list or array) as a float64 array
+  '''
+  return np.asarray(v,dtype=np.float64)
+
+def as_tuple(a):
+  '''
+  Returns the array a as a tuple of python floats
+  '''
+  return tuple(a.tolist())
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+Tuple API. These match the functions of the same name in algebra.py.
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+def distance(p1,p2):
+  '''
+  Returns the distance between p1 and p2
+  '''
+  return float(np.linalg.norm(as_array(p2) - as_array(p1)))
+
+def dot(v1,v2):
+  '''
+  Dots two vectors
+  '''
+  # checking the lenght of the tuples
+  assert len(v1) == len(v2)
+
+  return float(np.dot(as_array(v1),as_array(v2)))
+
+def sum_vectors(v1,v2):
+  '''
+  Sums two vectors
+  '''
+  return as_tuple(as_array(v1) + as_array(v2))
+
+def sub_vectors(v1,v2):
+  '''
+  Subtracts the second vector from the first
+  '''
+  return as_tuple(as_array(v1) - as_array(v2))
+
+def scale(k,v):
+  '''
+  Scales the vector v by k
+  '''
+  return as_tuple(k * as_array(v))
+
+def length(v):
+  '''
+  Returns the length of the vector v
+  '''
+  return float(np.linalg.norm(as_array(v)))
+
+def make_unit(v):
+  '''
+  Returns a unit vector in the same direction as v
+  '''
+  v = as_array(v)
+  dist = np.linalg.norm(v)
+  assert not abs(dist) < PROGRAM['epsilon']
+  return as_tuple(v / dist)
+
+def cross(v1,v2):
+  '''
+  Calculates the cross product between two vectors, v1 and v2
+  '''
+  return as_tuple(np.cross(as_array(v1),as_array(v2)))
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+Batched API. Points and vectors are passed in as arrays of shape (N,3) and
+segments as arrays of shape (N,2,3). Single points, vectors and lines can be
+anything that converts to an array.
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+def lengths(vectors):
+  '''
+  Returns the length of each of the vectors
+  '''
+  return np.linalg.norm(as_array(vectors),axis=-1)
+
+def distances(points,p):
+  '''
+  Returns the distance from each of the points to the point p
+  '''
+  return lengths(as_array(points) - as_array(p))
+
+def dots(vectors,v):
+  '''
+  Dots each of the vectors with the vector v
+  '''
+  return as_array(vectors) @ as_array(v)
+
+def crosses(vectors,v):
+  '''
+  Crosses each of the vectors with the vector v (in that order)
+  '''
+  return np.cross(as_array(vectors),as_array(v))
+
+def directions(segments):
+  '''
+  Returns the direction vector (i -> j) of each of the segments
+  '''
+  segments = as_array(segments)
+  return segments[:,1] - segments[:,0]
+
+def between(c1,c2,c3,inclusive=True,e=PROGRAM['epsilon']):
+  '''
+  Element-wise version of helpers.between. Returns whether or not c3 is between
+  c1 and c2 (taking epsilon into account when inclusive).
+  '''
+  low, high = np.minimum(c1,c2), np.maximum(c1,c2)
+  if inclusive:
+    return (c3 > low - e) & (c3 < high + e)
+  else:
+    return ((c3 > low) & ~(np.abs(low - c3) < e) & (c3 < high) &
+      ~(np.abs(c3 - high) < e))
+
+def between_points(p1,p2,p3,inclusive=True):
+  '''
+  Batched version of helpers.between_points. Returns, for each row, whether
+  the point p3 is between the points p1 and p2. Any of the arguments can also
+  be a single point.
+  '''
+  p1, p2, p3 = as_array(p1), as_array(p2), as_array(p3)
+  within = between(p1,p2,p3).all(axis=-1)
+  if not inclusive:
+    return within & between(p1,p2,p3,False).any(axis=-1)
+  else:
+    return within
+
+def points_on_line(l1,l2,points,segment=True):
+  '''
+  Batched version of helpers.on_line. Returns whether each of the points lies
+  close to the line l1 -> l2. The error allowed is epsilon
+  '''
+  l1, l2, points = as_array(l1), as_array(l2), as_array(points)
+
+  # Points that are the endpoint l1 are always on the line
+  at_endpoint = distances(points,l1) < PROGRAM['epsilon']
+
+  # The point is on the line if the vector to it is parallel to the line
+  on_line = lengths(crosses(points - l1,l2 - l1)) < PROGRAM['epsilon'] * 2
+  if segment:
+    on_line = on_line & between(l1,l2,points).all(axis=-1)
+
+  return at_endpoint | on_line
+
+def parallel_to(segments,v):
+  '''
+  Batched version of helpers.parallel. Returns whether the direction of each of
+  the segments is parallel to the vector v
+  '''
+  return lengths(crosses(directions(segments),v)) < 0.01
+
+def intersections(segments,segment):
+  '''
+  Batched version of helpers.intersection. Finds the point of intersection of 
+  each of the segments (l1) with the single segment (l2), using the same 
+  epsilon semantics. Returns a list with one entry per segment, which is either
+  the point of intersection (a tuple) or None if they do not intersect.
+  '''
+  segments = as_array(segments).reshape(-1,2,3)
+  if len(segments) == 0:
+    return []
+
+  # Get out coordinates
+  p1, ep1 = segments[:,0], segments[:,1]
+  p2, ep2 = as_array(segment[0]), as_array(segment[1])
+
+  # Obtain direction vectors
+  v1 = ep1 - p1
+  v2 = ep2 - p2
+
+  # Check whether or not the lines are coplanar (norm1 and norm2 must be 
+  # parallel) and not parallel (norm1 must be non-zero)
+  norm1 = crosses(v1,v2)
+  norm2 = crosses(p2 - p1,v2)
+  len1, len2 = lengths(norm1), lengths(norm2)
+  degenerate = ~(lengths(np.cross(norm1,norm2)) < 0.01) | (len1 == 0)
+
+  # Obtain the (signed) distance along each line travelled and the resulting
+  # intersection points
+  with np.errstate(divide='ignore',invalid='ignore'):
+    a = np.where(degenerate,0,len2 / np.where(len1 == 0,1,len1))
+  a = np.where((norm1 * norm2).sum(axis=1) > 0,a,-1 * a)
+  points = p1 + a[:,np.newaxis] * v1
+
+  # Verify that the point is in both line segments
+  found = (~degenerate & between_points(p1,ep1,points) & 
+    between_points(p2,ep2,points))
+
+  # Lines which are parallel or skew only intersect if they share an endpoint
+  same = lambda x, y: np.all(x == y,axis=-1)
+  start = (same(p1,p2) & ~same(ep1,ep2)) | (same(p1,ep2) & ~same(ep1,p2))
+  end = (same(ep1,ep2) & ~same(p1,p2)) | (same(ep1,p2) & ~same(p1,ep2))
+
+  results = []
+  for k in range(len(segments)):
+    if not degenerate[k]:
+      results.append(as_tuple(points[k]) if found[k] else None)
+    elif start[k]:
+      results.append(as_tuple(p1[k]))
+    elif end[k]:
+      results.append(as_tuple(ep1[k]))
+    else:
+      results.append(None)
+
+  return results
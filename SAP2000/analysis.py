@@ -1,4 +1,7 @@
 #!/usr/bin/env python
+import numpy as np
+
+from SAP2000.constants import ITEM_TYPES_ELM
 
 class SapAnalysis(object):
   def __init__(self, sap_com_object):
@@ -26,3 +29,234 @@ class SapAnalysis(object):
     """ Delete results for every load case. """
     return_value = self._obj.DeleteResults(Name="", All=True)
     assert return_value == 0        # Ensure that everything went as expected
+
+class SapProxy(object):
+  def __init__(self, sap_object, invalidate, resets = None, children = None):
+    """
+    Stands in for a SAP2000 object, forwarding every attribute to it. The 
+    methods named in resets (all of them if resets is None) call invalidate
+    before running, and the attributes in children are replaced by the given
+    objects.
+    """
+    super(SapProxy, self).__init__()
+
+    self._obj = sap_object
+    self._invalidate = invalidate
+    self._resets = resets
+    self._children = {} if children is None else children
+
+  def __getattr__(self, name):
+    if name.startswith('_'):
+      raise AttributeError(name)
+    if name in self._children:
+      return self._children[name]
+
+    attribute = getattr(self._obj, name)
+    if self._resets is None or name in self._resets:
+      invalidate = self._invalidate
+      def reset(*args, **kwargs):
+        invalidate()
+        return attribute(*args, **kwargs)
+      return reset
+
+    return attribute
+
+class SapResults(SapProxy):
+  def __init__(self, sap_results):
+    """
+    Memoizes the results read from SapModel.Results (FrameForce and 
+    JointDisplAbs, by name and item type) until they are invalidated, which
+    happens whenever an analysis is run, the model is unlocked or the cases
+    selected for output change. Robots often read the same few beams many 
+    times between analyses, and each read is a round-trip to SAP2000. version
+    counts the invalidations, so it identifies the analysis the results
+    belong to.
+    """
+    super(SapResults, self).__init__(sap_results, self.invalidate, ())
+
+    self.version = 0
+    self._cache = {}
+    self._children['Setup'] = SapProxy(sap_results.Setup, self.invalidate)
+
+  def invalidate(self):
+    """ Forgets every result read so far. """
+    self._cache = {}
+    self.version += 1
+
+  def _memoize(self, function, name, itemTypeElm, args):
+    """
+    Returns the cached results of the function for the name and item type, 
+    calling it if there are none. Failed calls are not cached.
+    """
+    key = (function, name, itemTypeElm)
+    if key in self._cache:
+      return self._cache[key]
+
+    results = getattr(self._obj, function)(name, itemTypeElm, *args)
+    if results[0] == 0:
+      self._cache[key] = results
+    return results
+
+  def _table(self, function, group, table_class):
+    """
+    Returns the results of the function for every object in the group, in one
+    call, as a table_class (None if they could not be read)
+    """
+    key = (function, group, table_class)
+    if key not in self._cache:
+      results = self._memoize(function, group, ITEM_TYPES_ELM["group"], ())
+      if results[0] != 0:
+        return None
+      self._cache[key] = table_class(results)
+    return self._cache[key]
+
+  def _from_table(self, function, name, itemTypeElm, args, table_class):
+    """
+    Returns the results of the function for a single object, reading them 
+    from the table of the "ALL" group if it has already been read
+    """
+    key = (function, "ALL", table_class)
+    if (itemTypeElm == ITEM_TYPES_ELM["object"] and key in self._cache and 
+      name in self._cache[key]):
+      return self._cache[key].object_results(name)
+    return self._memoize(function, name, itemTypeElm, args)
+
+  def FrameForce(self, name, itemTypeElm = 0, *args):
+    return self._from_table('FrameForce', name, itemTypeElm, args, 
+      SapFrameForces)
+
+  def JointDisplAbs(self, name, itemTypeElm = 0, *args):
+    return self._from_table('JointDisplAbs', name, itemTypeElm, args,
+      SapJointDisplacements)
+
+  def frame_forces(self, group = "ALL"):
+    """
+    Returns the forces along every frame in the group (a SapFrameForces), 
+    fetched in one call. Once the "ALL" group has been read, FrameForce is 
+    answered from it.
+    """
+    return self._table('FrameForce', group, SapFrameForces)
+
+  def joint_displacements(self, group = "ALL"):
+    """
+    Returns the displacements of every joint in the group (a 
+    SapJointDisplacements), fetched in one call. Once the "ALL" group has been
+    read, JointDisplAbs is answered from it.
+    """
+    return self._table('JointDisplAbs', group, SapJointDisplacements)
+
+class SapResultsTable(object):
+  def __init__(self, results, first):
+    """
+    The results returned by one of the functions of SapModel.Results for many
+    objects, as arrays. names holds the object name of every row, and values
+    the six numeric columns starting at results[first] (forces or 
+    displacements), as an array of shape (number of rows, 6). The rows of an
+    object are found with rows(name) or table[name], and values are reduced
+    per object with reduce().
+    """
+    super(SapResultsTable, self).__init__()
+
+    self.results = results
+    self.names = np.array(results[2], dtype=object)
+    self.values = np.array(results[first:first + 6], dtype=np.float64
+      ).reshape((6, -1)).T
+
+    # The rows sorted by object (keeping their original order within each 
+    # object), and where the rows of each object start
+    names, inverse, counts = np.unique(self.names, return_inverse = True,
+      return_counts = True)
+    self.objects = names.tolist()
+    self._order = np.argsort(inverse, kind = 'stable')
+    self._starts = np.cumsum(counts) - counts
+    self._positions = {name : position for position, name in 
+      enumerate(self.objects)}
+    self._rows = {name : self._order[start:start + count] for name, start, 
+      count in zip(self.objects, self._starts.tolist(), counts.tolist())}
+
+  def __contains__(self, name):
+    return name in self._rows
+
+  def __getitem__(self, name):
+    return self.values[self._rows[name]]
+
+  def rows(self, name):
+    return self._rows[name]
+
+  def positions(self, names):
+    """
+    Returns the position of each of the named objects in self.objects (-1 for
+    those without results)
+    """
+    return np.array([self._positions.get(name, -1) for name in names], 
+      dtype=int)
+
+  def reduce(self, ufunc, values):
+    """
+    Reduces values (one per row) over the rows of each object with ufunc (e.g.
+    numpy.maximum), returning one value per object in self.objects
+    """
+    if len(self._order) == 0:
+      return np.empty(0)
+    return ufunc.reduceat(np.asarray(values)[self._order], self._starts)
+
+  def first(self):
+    """
+    Returns the values of the first row of each object in self.objects
+    """
+    return self.values[self._order[self._starts]]
+
+  def object_results(self, name):
+    """
+    Returns the rows of a single object in the format returned by SAP2000 
+    (ret, number_results, column, column, ...)
+    """
+    rows = self._rows[name].tolist()
+    return (0, len(rows)) + tuple(tuple(column[row] for row in rows) 
+      for column in self.results[2:])
+
+class SapFrameForces(SapResultsTable):
+  def __init__(self, results):
+    """
+    Results of FrameForce. values holds (P, V2, V3, T, M2, M3) and stations
+    the distance of each row from the i-end of its frame.
+    """
+    super(SapFrameForces, self).__init__(results, 9)
+    self.stations = np.array(results[3], dtype=np.float64)
+
+class SapJointDisplacements(SapResultsTable):
+  def __init__(self, results):
+    """
+    Results of JointDisplAbs. values holds (U1, U2, U3, R1, R2, R3).
+    """
+    super(SapJointDisplacements, self).__init__(results, 7)
+
+class SapCachedModel(SapProxy):
+  def __init__(self, sap_model):
+    """
+    Stands in for SapModel, memoizing its results (see SapResults). Anything
+    that can change or delete the results (running or deleting the analysis,
+    unlocking, opening or creating a model) invalidates them. Saving the 
+    model does not.
+    """
+    results = SapResults(sap_model.Results)
+    super(SapCachedModel, self).__init__(sap_model, results.invalidate, 
+      ('SetModelIsLocked', 'InitializeNewModel'), {'Results' : results,
+      'Analyze' : SapProxy(sap_model.Analyze, results.invalidate), 
+      'File' : SapProxy(sap_model.File, results.invalidate, ('OpenFile',
+      'NewBlank', 'NewBeam', 'New2DFrame', 'New2DTruss', 'New3DFrame',
+      'New3DFrameWithOptions', 'NewGridOnly', 'NewSolidBlock', 'NewWall'))})
+
+class SapCachedObject(SapProxy):
+  def __init__(self, sap_com_object):
+    """
+    Stands in for the SAP2000 COM-object, so that its SapModel is a 
+    SapCachedModel.
+    """
+    super(SapCachedObject, self).__init__(sap_com_object, None, ())
+
+  @property
+  def SapModel(self):
+    if 'SapModel' not in self._children:
+      self._children['SapModel'] = SapCachedModel(self._obj.SapModel)
+    return self._children['SapModel']
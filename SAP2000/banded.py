@@ -0,0 +1,192 @@
+'''
+Sparse solver for the symmetric positive definite systems produced by the
+frame solver in stiffness.py. Joints are reordered with reverse Cuthill-McKee
+to make the bandwidth of the stiffness matrix small, and the matrix (given in
+COO form) is then factored as a block tridiagonal matrix, with blocks at least
+as large as the bandwidth. Factoring and solving cost O(n * b^2) and O(n * b),
+instead of O(n^3) and O(n^2) for the dense matrix.
+'''
+# Third party libraries
+import numpy as np
+
+# Smallest block used by BandedCholesky (small blocks spend most of their time
+# in python rather than in numpy)
+MIN_BLOCK = 48
+
+def reverse_cuthill_mckee(size,i,j):
+  '''
+  Returns the reverse Cuthill-McKee ordering (an array with the nodes in their
+  new order) of the graph with nodes 0..size-1 and edges i[k] - j[k].
+  '''
+  adjacency = [set() for node in range(size)]
+  for a, b in zip(np.asarray(i).tolist(),np.asarray(j).tolist()):
+    if a != b:
+      adjacency[a].add(b)
+      adjacency[b].add(a)
+  degree = [len(neighbours) for neighbours in adjacency]
+
+  def levels(start):
+    '''
+    Breadth first search from start, visiting neighbours in order of degree.
+    Returns the nodes in the order visited, the last level and the number of
+    levels.
+    '''
+    order, level, seen, depth = [start], [start], {start}, 1
+    while True:
+      next_level = []
+      for node in level:
+        for neighbour in sorted(adjacency[node] - seen,key=degree.__getitem__):
+          seen.add(neighbour)
+          next_level.append(neighbour)
+      if next_level == []:
+        return order, level, depth
+      order.extend(next_level)
+      level, depth = next_level, depth + 1
+
+  visited = np.zeros(size,dtype=bool)
+  order = []
+  for start in sorted(range(size),key=degree.__getitem__):
+    if visited[start]:
+      continue
+
+    # Move the start to a pseudo-peripheral node (one of the far ends of the
+    # component), which gives narrower levels
+    component, last, depth = levels(start)
+    for attempt in range(5):
+      candidate = min(last,key=degree.__getitem__)
+      candidate_component, candidate_last, candidate_depth = levels(candidate)
+      if candidate_depth <= depth:
+        break
+      component, last, depth = (candidate_component, candidate_last,
+        candidate_depth)
+
+    visited[component] = True
+    order.extend(component)
+
+  return np.array(order[::-1],dtype=int)
+
+def bandwidth(rows,cols):
+  '''
+  Returns the bandwidth of the matrix with entries at (rows, cols)
+  '''
+  return int(np.abs(rows - cols).max()) if len(rows) > 0 else 0
+
+class BandedCholesky(object):
+  '''
+  Cholesky factorization of a symmetric positive definite matrix in COO form
+  (duplicate entries are added up). Only the lower triangle is used. Raises
+  numpy.linalg.LinAlgError if the matrix is not positive definite.
+  '''
+  def __init__(self,size,rows,cols,values):
+    super(BandedCholesky,self).__init__()
+
+    rows, cols, values = self.__lower(rows,cols,values)
+
+    # The matrix is split into square blocks, which makes it block tridiagonal
+    self.size = size
+    self.bandwidth = bandwidth(rows,cols)
+    self.block = max(self.bandwidth,MIN_BLOCK)
+    self.count = 0
+
+    # The inverses of the diagonal blocks of the factor and the blocks below
+    # them. These are allocated with room to spare, so that update() can add
+    # blocks in amortized constant time.
+    self.inverse = np.empty((0,self.block,self.block))
+    self.below = np.empty((0,self.block,self.block))
+    self.__factor(size,rows,cols,values,0)
+
+  def __lower(self,rows,cols,values):
+    '''
+    Returns the entries in the lower triangle
+    '''
+    rows, cols = np.asarray(rows,dtype=int), np.asarray(cols,dtype=int)
+    values = np.asarray(values,dtype=np.float64)
+    lower = rows >= cols
+    return rows[lower], cols[lower], values[lower]
+
+  def __factor(self,size,rows,cols,values,first):
+    '''
+    Factors the blocks from first onwards, given the lower triangle entries in
+    the columns of those blocks
+    '''
+    B = self.block
+    count = max(1,-(-size // B))
+    if count > len(self.inverse):
+      extra = np.empty((max(count,2 * len(self.inverse)) - len(self.inverse),
+        B,B))
+      self.inverse = np.concatenate((self.inverse,extra))
+      self.below = np.concatenate((self.below,extra))
+    self.size, self.count = size, count
+    blocks = count - first
+
+    # Assemble the diagonal blocks and the blocks below them
+    block_rows, block_cols = rows // B - first, cols // B - first
+    same = block_rows == block_cols
+    diagonal = np.bincount((block_rows[same] * B + rows[same] % B) * B +
+      cols[same] % B,values[same],blocks * B * B).reshape((blocks,B,B))
+    below = np.bincount((block_cols[~same] * B + rows[~same] % B) * B +
+      cols[~same] % B,values[~same],blocks * B * B).reshape((blocks,B,B))
+
+    # The rows added to fill up the last block are the identity
+    padding = np.arange(size,count * B)
+    diagonal[-1,padding % B,padding % B] = 1
+
+    # Factor block by block: L[i,i] = chol(A[i,i] - L[i,i-1] L[i,i-1]^T) and
+    # L[i+1,i] = A[i+1,i] L[i,i]^-T. The inverses of the diagonal blocks are
+    # kept for the triangular solves.
+    previous = self.below[first - 1] if first > 0 else None
+    for k in range(first,count):
+      block = diagonal[k - first]
+      if previous is not None:
+        block = block - previous @ previous.T
+      factor = np.linalg.cholesky(block)
+      self.inverse[k] = np.linalg.inv(factor)
+      previous = self.below[k] = below[k - first] @ self.inverse[k].T
+
+  def update(self,size,rows,cols,values,first):
+    '''
+    Updates the factorization (in place) for a matrix of the given size (at
+    least the current one) that only changed in the rows and columns from first
+    onwards. Since the factor above the block containing first is not
+    affected, only the blocks from there on are factored again, and only the
+    entries in their columns (from the start of that block) are needed.
+    Returns False, without changing anything, if the bandwidth of the new
+    matrix no longer fits in the blocks. If the matrix is not positive
+    definite, numpy.linalg.LinAlgError is raised and the factorization is no
+    longer usable.
+    '''
+    rows, cols, values = self.__lower(rows,cols,values)
+    if bandwidth(rows,cols) > self.block:
+      return False
+
+    # The identity rows padding the last block must be replaced as well
+    if size > self.size:
+      first = min(first,self.size)
+    first = min(first,size - 1) // self.block
+    keep = cols >= first * self.block
+    self.__factor(size,rows[keep],cols[keep],values[keep],first)
+    return True
+
+  def solve(self,b):
+    '''
+    Solves A x = b, where b is a vector (or a matrix with one column per right
+    hand side)
+    '''
+    b = np.asarray(b,dtype=np.float64)
+    B, count = self.block, self.count
+    shape = b.shape
+    y = np.zeros((count * B,) + shape[1:])
+    y[:self.size] = b
+    y = y.reshape((count,B) + shape[1:])
+
+    # Forward substitution (L y = b) followed by back substitution (L^T x = y)
+    for k in range(count):
+      if k > 0:
+        y[k] -= self.below[k - 1] @ y[k - 1]
+      y[k] = self.inverse[k] @ y[k]
+    for k in reversed(range(count)):
+      if k < count - 1:
+        y[k] -= self.below[k].T @ y[k + 1]
+      y[k] = self.inverse[k].T @ y[k]
+
+    return y.reshape((count * B,) + shape[1:])[:self.size]
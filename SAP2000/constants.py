@@ -159,4 +159,11 @@ LOAD_PATTERN_TYPES = {
   'LTYPE_CONSTRUCTION' : 39,
 }
 
+# Values of ItemTypeElm for the analysis results functions
+ITEM_TYPES_ELM = {
+  "object": 0,
+  "element": 1,
+  "group": 2,
+  "selection": 3}
+
 PLACEHOLDER = 1
\ No newline at end of file
@@ -0,0 +1,563 @@
+#!/usr/bin/env python
+'''
+In-process stand-in for the SAP2000 COM-object. It implements the subset of the
+SapModel API used by the simulation, with the same arguments and return values,
+on top of the frame solver in stiffness.py. Use it through
+Sap2000(backend="local") (see PROGRAM['sap_backend'] in variables.py).
+
+Differences with SAP2000:
+  - The analysis is linear. Geometric nonlinearity (P-delta) is recorded but
+    ignored, and response combinations are not supported.
+  - Point loads must be forces (not moments) in the local, global or gravity
+    directions.
+  - Files are saved with pickle. They can only be opened by this backend.
+'''
+# Python default libraries
+import os
+import pickle
+
+# Third party libraries
+import numpy as np
+
+# Local frame solver
+from SAP2000.stiffness import FrameModel, STEEL, pipe_section
+from SAP2000.constants import ITEM_TYPES_ELM
+# Default section
+from variables import MATERIAL
+
+class LocalSapObject(object):
+  '''
+  Mimics the SAP2000 application object
+  '''
+  def __init__(self):
+    super(LocalSapObject, self).__init__()
+    self.SapModel = LocalSapModel()
+
+  def ApplicationStart(self, units = 3, visible = True, filename = ""):
+    self.SapModel.InitializeNewModel(units)
+    if filename != "" and os.path.exists(filename):
+      return self.SapModel.File.OpenFile(filename)
+    return 0
+
+  def ApplicationExit(self, save_file = True):
+    if save_file and self.SapModel.File.filename != "":
+      self.SapModel.File.Save()
+    return 0
+
+  def Hide(self):
+    return 0
+
+  def Unhide(self):
+    return 0
+
+class LocalSapModel(object):
+  '''
+  Mimics SapModel. Holds the state shared by all of the sub-objects.
+  '''
+  def __init__(self):
+    super(LocalSapModel, self).__init__()
+
+    self.PointObj = LocalPointObj(self)
+    self.FrameObj = LocalFrameObj(self)
+    self.Analyze = LocalAnalyze(self)
+    self.Results = LocalResults(self)
+    self.LoadPatterns = LocalLoadPatterns(self)
+    self.LoadCases = LocalLoadCases(self)
+    self.PropMaterial = LocalPropMaterial(self)
+    self.PropFrame = LocalPropFrame(self)
+    self.File = LocalFile(self)
+    self.View = LocalView(self)
+
+    # Objects which the simulation never uses, but which the wrappers in
+    # elements.py expect to exist
+    self.PointElm = LocalObjects()
+    self.LineElm = LocalObjects()
+    self.AreaElm = LocalObjects()
+    self.AreaObj = LocalObjects()
+    self.GroupDef = LocalObjects()
+    self.PropArea = LocalObjects()
+
+    self.InitializeNewModel()
+
+  def InitializeNewModel(self, units = 3):
+    '''
+    Clears the model. As in SAP2000, a new model has a DEAD load pattern with
+    self weight (and a DEAD load case for it).
+    '''
+    self.units = units
+    self.locked = False
+    self.results = None
+    self.frame_model = FrameModel()
+
+    # {name : {'A','I22','I33','J','material'}}, {name : material properties}
+    self.materials = {MATERIAL['material_property'] : dict(STEEL)}
+    self.sections = {"Default" : dict(pipe_section(MATERIAL['outside_diameter'],
+      MATERIAL['wall_thickness']),material=MATERIAL['material_property'])}
+
+    # {pattern : self weight multiplier}, {case : [(pattern, scale)]} and the
+    # cases which are run
+    self.patterns = {"DEAD" : 1}
+    self.cases = {"DEAD" : [("DEAD",1)]}
+    self.run_cases = set(self.cases)
+
+    # {frame : [(pattern, type, csys, direction, distance, value)]} and
+    # {frame : number of output segments}
+    self.point_loads = {}
+    self.stations = {}
+
+    return 0
+
+  def SetPresentUnits(self, units):
+    self.units = units
+    return 0
+
+  def GetModelIsLocked(self):
+    return self.locked
+
+  def SetModelIsLocked(self, lock = True):
+    '''
+    As in SAP2000, unlocking the model deletes the analysis results
+    '''
+    self.locked = lock
+    if not lock:
+      self.results = None
+    return 0
+
+  def state(self):
+    '''
+    Returns everything that is saved to a file
+    '''
+    return {key : getattr(self,key) for key in ('units','frame_model',
+      'materials','sections','patterns','cases','run_cases','point_loads',
+      'stations')}
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+Objects
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+class LocalObjects(object):
+  '''
+  An empty collection of objects
+  '''
+  def Count(self):
+    return 0
+
+  def GetNameList(self, *args):
+    return (0, 0, [])
+
+class LocalBase(object):
+  def __init__(self, model):
+    super(LocalBase, self).__init__()
+    self._model = model
+
+  def _new_name(self, names, name = ""):
+    '''
+    Returns name if it can be used, otherwise the first number not in use (the
+    way SAP2000 names new objects)
+    '''
+    if name != "" and name not in names:
+      return name
+    number = len(names) + 1
+    while str(number) in names:
+      number += 1
+    return str(number)
+
+class LocalPointObj(LocalBase):
+  def AddCartesian(self, x, y, z, name = "", userName = "", csys = "Global",
+    mergeOff = False, mergeNumber = 0):
+    '''
+    Adds a point, merging it with an existing point at the same location
+    '''
+    frame_model = self._model.frame_model
+    if self._model.locked:
+      return (1, name)
+
+    if not mergeOff:
+      existing = frame_model.find_joint((x,y,z))
+      if existing is not None:
+        return (0, existing)
+
+    name = self._new_name(frame_model.index,userName)
+    frame_model.add_joint(name,(x,y,z))
+    return (0, name)
+
+  def SetRestraint(self, name, DOF, itemType = 0):
+    if self._model.locked or name not in self._model.frame_model.index:
+      return (1, DOF)
+    self._model.frame_model.set_restraint(name,DOF)
+    return (0, DOF)
+
+  def GetRestraint(self, name, DOF = None):
+    restraints = self._model.frame_model.restraints
+    index = self._model.frame_model.index.get(name)
+    if index is None:
+      return (1, DOF)
+    return (0, restraints.get(index,(False,) * 6))
+
+  def GetCoordCartesian(self, name, *args):
+    index = self._model.frame_model.index.get(name)
+    if index is None:
+      return (1, 0, 0, 0)
+    x, y, z = self._model.frame_model.coords[index].tolist()
+    return (0, x, y, z)
+
+  def Count(self):
+    return len(self._model.frame_model.joints)
+
+  def GetNameList(self, *args):
+    names = list(self._model.frame_model.joints)
+    return (0, len(names), names)
+
+class LocalFrameObj(LocalBase):
+  def AddByPoint(self, point1, point2, name = "", propName = "Default",
+    userName = ""):
+    '''
+    Adds a frame between two existing points
+    '''
+    frame_model = self._model.frame_model
+    if (self._model.locked or point1 == point2 or propName not in
+      self._model.sections or point1 not in frame_model.index or point2 not in
+      frame_model.index):
+      return (1, "")
+
+    name = self._new_name(frame_model.frames,userName)
+    section = self._model.sections[propName]
+    frame_model.add_frame(name,point1,point2,section,
+      self._model.materials[section['material']])
+    return (0, name)
+
+  def AddByCoord(self, xi, yi, zi, xj, yj, zj, name = "", propName = "Default",
+    userName = "", csys = "Global"):
+    ret, point1 = self._model.PointObj.AddCartesian(xi,yi,zi)
+    ret, point2 = self._model.PointObj.AddCartesian(xj,yj,zj)
+    return self.AddByPoint(point1,point2,name,propName,userName)
+
+  def GetPoints(self, name, *args):
+    frames = self._model.frame_model.frames
+    if name not in frames:
+      return (1, "", "")
+    i, j, section, material = frames[name]
+    joints = self._model.frame_model.joints
+    return (0, joints[i], joints[j])
+
+  def GetLocalAxes(self, name, *args):
+    '''
+    Frames always use the default local axes
+    '''
+    if name not in self._model.frame_model.frames:
+      return (1, 0, False)
+    return (0, 0, False)
+
+  def SetOutputStations(self, name, myType, maxSegSize, minSections,
+    noOutPutAndDesignAtElementEnds = False,
+    noOutPutAndDesignAtPointLoads = False, itemType = 0):
+    '''
+    Sets the number of output segments of a frame, either from the maximum
+    segment size (myType = 1) or the minimum number of segments (myType = 2)
+    '''
+    frame_model = self._model.frame_model
+    if self._model.locked or name not in frame_model.frames:
+      return 1
+    if myType == 1:
+      segments = max(1,int(-(-frame_model.length(name) // maxSegSize)))
+    else:
+      segments = max(1,int(minSections))
+    self._model.stations[name] = segments
+    return 0
+
+  def SetLoadPoint(self, name, loadPat, myType, direction, dist, val,
+    csys = "Global", relDist = True, replace = True, itemType = 0):
+    '''
+    Adds a point force to the frame. Directions are 1-3 (local), 4-6 (global)
+    and 10 (gravity). When replace is True, the previous point loads of the
+    load pattern on the frame are deleted.
+    '''
+    frame_model = self._model.frame_model
+    if (self._model.locked or name not in frame_model.frames or loadPat not in
+      self._model.patterns or myType != 1 or direction not in
+      (1,2,3,4,5,6,10)):
+      return 1
+
+    # Absolute distance from the i-end, which must be on the frame
+    length = frame_model.length(name)
+    dist = dist * length if relDist else dist
+    if not -frame_model.tolerance < dist < length + frame_model.tolerance:
+      return 1
+    dist = min(max(dist,0),length)
+
+    loads = self._model.point_loads.setdefault(name,[])
+    if replace:
+      loads[:] = [load for load in loads if load[0] != loadPat]
+    loads.append((loadPat,myType,csys,direction,dist,val))
+    return 0
+
+  def GetLoadPoint(self, name, *args):
+    '''
+    Returns (ret, number_items, frame_names, loadpat_names, types, coordinates,
+    directions, rel_dists, dists, loads)
+    '''
+    if name not in self._model.frame_model.frames:
+      return (1, 0, [], [], [], [], [], [], [], [])
+    length = self._model.frame_model.length(name)
+    loads = self._model.point_loads.get(name,[])
+    return (0, len(loads), [name] * len(loads), [l[0] for l in loads],
+      [l[1] for l in loads], [l[2] for l in loads], [l[3] for l in loads],
+      [l[4] / length for l in loads], [l[4] for l in loads],
+      [l[5] for l in loads])
+
+  def DeleteLoadPoint(self, name, loadPat, itemType = 0):
+    if self._model.locked or name not in self._model.frame_model.frames:
+      return 1
+    loads = self._model.point_loads.get(name,[])
+    loads[:] = [load for load in loads if load[0] != loadPat]
+    return 0
+
+  def Count(self):
+    return len(self._model.frame_model.frames)
+
+  def GetNameList(self, *args):
+    names = list(self._model.frame_model.frames)
+    return (0, len(names), names)
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+Properties and loads
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+class LocalPropMaterial(LocalBase):
+  def AddQuick(self, name, matType, steelType = 0, *args):
+    '''
+    Adds a material. Only steel (matType = 1) is supported. The user name is
+    the last argument, as in SAP2000.
+    '''
+    userName = args[-1] if len(args) > 0 and args[-1] != "" else name
+    if matType != 1:
+      return (1, userName)
+    self._model.materials[userName] = dict(STEEL)
+    return (0, userName)
+
+class LocalPropFrame(LocalBase):
+  def SetPipe(self, name, matProp, t3, tw, color = -1, notes = "", guid = ""):
+    if matProp not in self._model.materials:
+      return 1
+    self._model.sections[name] = dict(pipe_section(t3,tw),material=matProp)
+    return 0
+
+class LocalLoadPatterns(LocalBase):
+  def Add(self, name, myType, selfWTMultiplier = 0, addLoadCase = True):
+    if name in self._model.patterns:
+      return 1
+    self._model.patterns[name] = selfWTMultiplier
+    if addLoadCase:
+      self._model.cases[name] = [(name,1)]
+      self._model.run_cases.add(name)
+    return 0
+
+  def GetNameList(self, *args):
+    names = list(self._model.patterns)
+    return (0, len(names), names)
+
+class LocalLoadCases(LocalBase):
+  def __init__(self, model):
+    super(LocalLoadCases, self).__init__(model)
+    self.StaticNonlinear = LocalStaticCase(model)
+    self.StaticLinear = LocalStaticCase(model)
+
+class LocalStaticCase(LocalBase):
+  def SetCase(self, name):
+    if name not in self._model.cases:
+      self._model.cases[name] = []
+      self._model.run_cases.add(name)
+    return 0
+
+  def SetGeometricNonlinearity(self, name, nlGeomType):
+    return 0 if name in self._model.cases else 1
+
+  def SetLoads(self, name, numberLoads, loadType, loadName, sf):
+    if (name not in self._model.cases or
+      any(pattern not in self._model.patterns for pattern in loadName)):
+      return (1, loadType, loadName, sf)
+    self._model.cases[name] = list(zip(loadName,sf))[:numberLoads]
+    return (0, loadType, loadName, sf)
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+Analysis and results
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+class LocalAnalyze(LocalBase):
+  def SetActiveDOF(self, DOF):
+    return (0, DOF)
+
+  def SetSolverOption_1(self, *args):
+    return 0
+
+  def SetRunCaseFlag(self, name, run, all = False):
+    cases = list(self._model.cases) if all else [name]
+    if not all and name not in self._model.cases:
+      return 1
+    for case in cases:
+      if run:
+        self._model.run_cases.add(case)
+      else:
+        self._model.run_cases.discard(case)
+    return 0
+
+  def CreateAnalysisModel(self):
+    return 0
+
+  def DeleteResults(self, Name = "", All = False):
+    self._model.results = None
+    return 0
+
+  def RunAnalysis(self):
+    '''
+    Solves every case that is set to run and locks the model
+    '''
+    model = self._model
+    frame_model = model.frame_model
+    results = {}
+    for case in model.run_cases:
+      # Add up the loads of all of the patterns in the case
+      loads, self_weight = {}, 0
+      for pattern, scale in model.cases[case]:
+        self_weight += scale * model.patterns[pattern]
+        for name, point_loads in model.point_loads.items():
+          axes = frame_model.axes(name)
+          for (loadPat,myType,csys,direction,dist,val) in point_loads:
+            if loadPat == pattern:
+              loads.setdefault(name,[]).append((dist,
+                scale * val * np.asarray(self.__direction(direction,axes))))
+
+      solution = frame_model.analyze(loads,self_weight,model.stations)
+      if solution is None:
+        model.results = None
+        return 1
+      results[case] = solution
+
+    model.results = results
+    model.locked = True
+    return 0
+
+  def __direction(self, direction, axes):
+    '''
+    Returns the global unit vector for the SAP2000 load direction
+    '''
+    if direction in (1,2,3):
+      return axes[direction - 1]
+    elif direction in (4,5,6):
+      unit = [0.,0.,0.]
+      unit[direction - 4] = 1.
+      return unit
+    else:
+      return (0.,0.,-1.)
+
+class LocalResults(LocalBase):
+  def __init__(self, model):
+    super(LocalResults, self).__init__(model)
+    self.Setup = LocalResultsSetup(model)
+
+  def _cases(self):
+    '''
+    Returns the analyzed cases selected for output
+    '''
+    results = self._model.results or {}
+    return [case for case in self.Setup.selected if case in results]
+
+  def _names(self, name, itemTypeElm, objects):
+    '''
+    Returns the names of the objects requested (a single object, or the "ALL"
+    group, which is the only group defined), or None if there are none
+    '''
+    if itemTypeElm == ITEM_TYPES_ELM["group"]:
+      return list(objects) if name == "ALL" else None
+    return [name] if name in objects else None
+
+  def FrameForce(self, name, itemTypeElm = 0, *args):
+    '''
+    Returns (ret, number_results, obj_names, obj_stations, elm_names,
+    elm_stations, load_cases, step_types, step_nums, P, V2, V3, T, M2, M3)
+    '''
+    cases = self._cases()
+    names = self._names(name,itemTypeElm,self._model.frame_model.frames)
+    if cases == [] or names is None:
+      return (1, 0) + ([],) * 13
+    rows = []
+    for frame in names:
+      for case in cases:
+        numbers, obj_stations, elm_stations, forces = (
+          self._model.results[case].frame_forces(frame))
+        rows.extend((frame, obj_station, "{}-{}".format(frame,number), 
+          elm_station, case, "", 0) + tuple(force) for number, obj_station, 
+          elm_station, force in zip(numbers.tolist(),obj_stations.tolist(),
+          elm_stations.tolist(),forces.tolist()))
+    return (0, len(rows)) + tuple(list(column) for column in zip(*rows))
+
+  def JointDisplAbs(self, name, itemTypeElm = 0, *args):
+    '''
+    Returns (ret, number_results, obj_names, elm_names, load_cases, step_types,
+    step_nums, U1, U2, U3, R1, R2, R3)
+    '''
+    cases = self._cases()
+    index = self._model.frame_model.index
+    names = self._names(name,itemTypeElm,index)
+    if cases == [] or names is None:
+      return (1, 0) + ([],) * 11
+    rows = [(joint, joint, case, "", 0) + tuple(
+      self._model.results[case].displacements[index[joint]].tolist())
+      for joint in names for case in cases]
+    return (0, len(rows)) + tuple(list(column) for column in zip(*rows))
+
+class LocalResultsSetup(LocalBase):
+  def __init__(self, model):
+    super(LocalResultsSetup, self).__init__(model)
+    self.selected = []
+
+  def DeselectAllCasesAndCombosForOutput(self):
+    self.selected = []
+    return 0
+
+  def SetCaseSelectedForOutput(self, name, selected = True):
+    if name not in self._model.cases:
+      return 1
+    if name in self.selected:
+      self.selected.remove(name)
+    if selected:
+      self.selected.append(name)
+    return 0
+
+  def SetComboSelectedForOutput(self, name, selected = True):
+    # Combinations are not supported
+    return 1
+
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+Files and views
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+class LocalFile(LocalBase):
+  def __init__(self, model):
+    super(LocalFile, self).__init__(model)
+    self.filename = ""
+
+  def NewBlank(self):
+    return self._model.InitializeNewModel(self._model.units)
+
+  def Save(self, filename = ""):
+    filename = filename if filename != "" else self.filename
+    if filename == "":
+      return 1
+    with open(filename,'wb') as f:
+      pickle.dump(self._model.state(),f)
+    self.filename = filename
+    return 0
+
+  def OpenFile(self, filename):
+    if not os.path.exists(filename):
+      return 1
+    with open(filename,'rb') as f:
+      state = pickle.load(f)
+    self._model.InitializeNewModel()
+    self._model.__dict__.update(state)
+    self.filename = filename
+    return 0
+
+class LocalView(LocalBase):
+  def RefreshView(self, window = 0, zoom = True):
+    return 0
+
+  def RefreshWindow(self, window = 0):
+    return 0
@@ -1,19 +1,36 @@
-# pyWin file
-import win32com.client as win32
+# pyWin file. Only needed for the SAP2000 (COM) backend, so that the local 
+# backend can run on machines without it
+try:
+  import win32com.client as win32
+except ImportError:
+  win32 = None
 
 # access to unit mappings
 from SAP2000.constants import UNITS
 # import SAP2000 element classes
 from SAP2000.elements import SapGroups, SapAreaObjects, SapAreaElements, SapLineElements, SapFrameObjects, SapPointObjects, SapPointElements
-# import SAP2000 analysis class
-from SAP2000.analysis import SapAnalysis
+# import SAP2000 analysis classes
+from SAP2000.analysis import SapAnalysis, SapCachedObject
+# in-process stand-in for the COM-object
+from SAP2000.local import LocalSapObject
 
 class Sap2000(object):
-  def __init__(self):
+  def __init__(self, backend = "com"):
     super(Sap2000, self).__init__()
 
-    # create the Sap2000 COM-object
-    sap_com_object = win32.Dispatch("SAP2000v15.sapobject")
+    # create the Sap2000 COM-object, or the local object which mimics it
+    # (see SAP2000/local.py)
+    if backend == "local":
+      sap_com_object = LocalSapObject()
+    elif win32 is None:
+      raise ImportError("The SAP2000 backend requires pywin32. Use the local " +
+        "backend instead.")
+    else:
+      sap_com_object = win32.Dispatch("SAP2000v15.sapobject")
+
+    # Results read from the model are memoized until the next analysis (see 
+    # SAP2000/analysis.py)
+    sap_com_object = SapCachedObject(sap_com_object)
     self.sap_com_object = sap_com_object
 
     # Each of the following attributes represents an object of the SAP2000 type 
@@ -29,6 +46,14 @@ class Sap2000(object):
     self.frame_objects = SapFrameObjects(sap_com_object)
     self.analysis = SapAnalysis(sap_com_object)
 
+  @property
+  def results(self):
+    """
+    The memoized results of the model (a SapResults object, see 
+    SAP2000/analysis.py)
+    """
+    return self.sap_com_object.SapModel.Results
+
   def reset(self, units="kip_in_F",template = None):
     if self.model != None:
       self.model.File.Save()
@@ -0,0 +1,658 @@
+'''
+Direct stiffness method for 3D frames made of Euler-Bernoulli beams. This is
+the physics behind the local SAP2000 stand-in (see local.py). Units are
+whatever the caller uses consistently (the simulation uses kip and inches).
+
+Every joint has six degrees of freedom (u1,u2,u3,r1,r2,r3 in global axes) and
+frames are split into elements at every joint lying on them, so that beams
+which cross are rigidly connected (as SAP2000 does when meshing at
+intermediate joints). Loads are point forces along frames and self weight.
+Results are the joint displacements and the internal forces at the output
+stations of every frame, in the same order as SAP2000 reports them.
+
+The element matrices are computed in batches and assembled in COO form. The
+system is then solved with the sparse banded solver in banded.py. The factor
+is kept between analyses: it is reused as is when only the loads change, and
+only its last blocks are factored again when frames are added next to the 
+newest joints (which is how the structures in the simulation grow).
+'''
+# Third party libraries
+import numpy as np
+
+# Sparse solver
+from SAP2000.banded import BandedCholesky, reverse_cuthill_mckee
+
+# Degrees of freedom per joint
+DOF = 6
+
+# Largest fraction of the blocks of a factorization that are factored again 
+# when frames are added (see BandedCholesky.update). Larger changes reorder the
+# joints and factor the whole model again.
+MAX_UPDATE = 0.5
+
+# Default material (structural steel, kip-in)
+STEEL = {
+  'E' : 29000,        # ksi
+  'poisson' : 0.3,
+  'weight' : 490 / (12**3) / 1000 # kip/in^3
+}
+
+def pipe_section(outside_diameter,wall_thickness):
+  '''
+  Returns the section properties (A, I22, I33, J) of a pipe
+  '''
+  ro = outside_diameter / 2
+  ri = ro - wall_thickness
+  area = np.pi * (ro**2 - ri**2)
+  inertia = np.pi * (ro**4 - ri**4) / 4
+  return {'A' : area, 'I22' : inertia, 'I33' : inertia, 'J' : 2 * inertia}
+
+def local_axes(i,j):
+  '''
+  Returns a 3x3 matrix whose rows are the default local axes (1,2,3) of a frame
+  going from i to j. As in SAP2000 (and Beam.global_default_axes), axis 1 goes
+  from i to j, axis 2 is in the plane of axis 1 and +Z with a positive Z
+  component (or +X for vertical frames), and axis 3 = 1 x 2.
+  '''
+  axis_1 = np.asarray(j,dtype=np.float64) - np.asarray(i,dtype=np.float64)
+  axis_1 = axis_1 / np.linalg.norm(axis_1)
+  z = np.array([0.,0.,1.])
+
+  # Vertical frames use the global x-axis for axis 2
+  if np.linalg.norm(np.cross(axis_1,z)) <= 0.001:
+    axis_2 = np.array([1.,0.,0.])
+  else:
+    axis_2 = z - axis_1[2] * axis_1
+    axis_2 = axis_2 / np.linalg.norm(axis_2)
+  axis_3 = np.cross(axis_1,axis_2)
+
+  return np.array([axis_1,axis_2,axis_3])
+
+def local_stiffness(length,section,E,G):
+  '''
+  Returns the 12x12 stiffness matrix of an element in its local axes. The
+  degrees of freedom are ordered (u1,u2,u3,r1,r2,r3) at i, then at j. All of 
+  the arguments (and the section properties) can also be arrays, in which case
+  one matrix is returned for each of their entries.
+  '''
+  L = np.asarray(length,dtype=np.float64)
+  E, G = E * np.ones_like(L), G * np.ones_like(L)
+  k = np.zeros(L.shape + (12,12))
+
+  # Axial and torsion
+  axial, torsion = E * section['A'] / L, G * section['J'] / L
+  k[...,0,0] = k[...,6,6] = axial
+  k[...,0,6] = k[...,6,0] = -axial
+  k[...,3,3] = k[...,9,9] = torsion
+  k[...,3,9] = k[...,9,3] = -torsion
+
+  # Bending in the 1-2 plane (about axis 3) and in the 1-3 plane (about axis 2)
+  for v, r, inertia, sign in ((1,5,section['I33'],1),(2,4,section['I22'],-1)):
+    EI = E * inertia
+    a, b, c, d = 12 * EI / L**3, 6 * EI / L**2, 4 * EI / L, 2 * EI / L
+    k[...,v,v] = k[...,v + 6,v + 6] = a
+    k[...,v,v + 6] = k[...,v + 6,v] = -a
+    k[...,r,r] = k[...,r + 6,r + 6] = c
+    k[...,r,r + 6] = k[...,r + 6,r] = d
+    k[...,v,r] = k[...,r,v] = k[...,v,r + 6] = k[...,r + 6,v] = sign * b
+    k[...,v + 6,r] = k[...,r,v + 6] = -sign * b
+    k[...,v + 6,r + 6] = k[...,r + 6,v + 6] = -sign * b
+
+  return k
+
+def transformation(axes):
+  '''
+  Returns the 12x12 matrix taking global element displacements to local ones
+  (one for each set of axes if an array of them is passed in)
+  '''
+  axes = np.asarray(axes)
+  t = np.zeros(axes.shape[:-2] + (12,12))
+  for n in range(4):
+    t[...,3 * n:3 * n + 3,3 * n:3 * n + 3] = axes
+  return t
+
+def coo(dofs,matrices):
+  '''
+  Returns the (rows, cols, values) of the element matrices (an array of 12x12
+  matrices) placed at their degrees of freedom (an array of 12 indeces per
+  element)
+  '''
+  rows = np.broadcast_to(dofs[:,:,np.newaxis],matrices.shape).ravel()
+  cols = np.broadcast_to(dofs[:,np.newaxis,:],matrices.shape).ravel()
+  return rows, cols, matrices.ravel()
+
+def uniform_end_forces(length,distributed):
+  '''
+  Returns the 12 forces the supports apply on a fully fixed element (local
+  axes) because of a uniform load (local vector per length). Both arguments
+  can be arrays.
+  '''
+  L = np.asarray(length,dtype=np.float64)
+  q = np.asarray(distributed,dtype=np.float64)
+  q1, q2, q3 = q[...,0], q[...,1], q[...,2]
+  f = np.zeros(L.shape + (12,))
+  f[...,0] = f[...,6] = -q1 * L / 2
+  f[...,1] = f[...,7] = -q2 * L / 2
+  f[...,2] = f[...,8] = -q3 * L / 2
+  f[...,5], f[...,11] = -q2 * L**2 / 12, q2 * L**2 / 12
+  f[...,4], f[...,10] = q3 * L**2 / 12, -q3 * L**2 / 12
+  return f
+
+def point_end_forces(length,a,force):
+  '''
+  Returns the 12 forces the supports apply on a fully fixed element (local
+  axes) because of a point force (local vector) at distance a from i
+  '''
+  L, b = length, length - a
+  p1, p2, p3 = force
+  f = np.zeros(12)
+  f[0], f[6] = -p1 * b / L, -p1 * a / L
+  f[1] = -p2 * b**2 * (3 * a + b) / L**3
+  f[7] = -p2 * a**2 * (a + 3 * b) / L**3
+  f[5], f[11] = -p2 * a * b**2 / L**2, p2 * a**2 * b / L**2
+  f[2] = -p3 * b**2 * (3 * a + b) / L**3
+  f[8] = -p3 * a**2 * (a + 3 * b) / L**3
+  f[4], f[10] = p3 * a * b**2 / L**2, -p3 * a**2 * b / L**2
+  return f
+
+class FrameModel(object):
+  '''
+  Joints, restraints and frames of a model. Frames are split into elements at
+  every joint lying on them (within tolerance). Call analyze() to solve for a
+  set of loads.
+  '''
+  def __init__(self,tolerance = 0.01):
+    super(FrameModel,self).__init__()
+
+    # Joint names in the order they were added, their indeces and coordinates.
+    # The coordinates (and the ends of the frames below) are stored in arrays
+    # that double in size when full, so that adding is amortized constant time
+    self.joints = []
+    self.index = {}
+    self._coords = np.zeros((16,3))
+
+    # {joint index : six booleans}
+    self.restraints = {}
+
+    # {name : (i index, j index, section, material)}, along with the indeces of
+    # the intermediate joints on each of the frames
+    self.frames = {}
+    self.intermediate = {}
+    self._frame_names = []
+    self._ends = np.zeros((16,2),dtype=int)
+
+    # Distance under which joints are merged and considered to lie on a frame
+    self.tolerance = tolerance
+
+    # Incremented whenever the joints, restraints or frames change. The 
+    # factored stiffness matrix is cached as (version, factor), and is only
+    # rebuilt when the version no longer matches.
+    self.version = 0
+    self._factored = None
+
+    # Element arrays (see element_table), the slice of them belonging to each
+    # frame, the number of elements in use and how many of them are left over
+    # from frames that changed. The elements are only recomputed for the 
+    # frames in _stale (new frames, or frames with a new joint on them, kept 
+    # as an ordered dictionary). _ordering is the order of the free degrees of
+    # freedom in the factorization (and the position of each of them), and
+    # _changed the frames whose elements changed since it was last updated.
+    # Adding frames and joints updates the factorization, while changing
+    # restraints recomputes it.
+    self._elements = None
+    self._slices = {}
+    self._count = self._dead = 0
+    self._stale = {}
+    self._ordering = None
+    self._changed = set()
+    self._refactor = False
+
+  # The attributes that are only caches of the factorization, which are not
+  # saved with the model (see __getstate__)
+  CACHES = ('_factored','_elements','_slices','_count','_dead','_stale',
+    '_ordering','_changed','_refactor')
+
+  def __getstate__(self):
+    '''
+    Only the definition of the model is pickled (when the model is saved to a
+    file). The factorization is rebuilt by the first analysis after loading.
+    '''
+    return {key : value for key, value in self.__dict__.items()
+      if key not in FrameModel.CACHES}
+
+  def __setstate__(self,state):
+    self.__dict__.update(state)
+    self._factored = self._elements = self._ordering = None
+    self._slices = {}
+    self._count = self._dead = 0
+    self._stale = dict.fromkeys(self._frame_names)
+    self._changed = set()
+    self._refactor = False
+
+  @property
+  def coords(self):
+    return self._coords[:len(self.joints)]
+
+  def find_joint(self,coord):
+    '''
+    Returns the name of the joint at coord (within tolerance) or None
+    '''
+    if len(self.joints) == 0:
+      return None
+    distances = np.linalg.norm(self.coords - np.asarray(coord),axis=1)
+    closest = int(np.argmin(distances))
+    return self.joints[closest] if distances[closest] < self.tolerance else None
+
+  def add_joint(self,name,coord):
+    '''
+    Adds a joint and registers it with every frame it lies on
+    '''
+    k = len(self.joints)
+    if k == len(self._coords):
+      self._coords = np.concatenate((self._coords,np.zeros_like(self._coords)))
+    self._coords[k] = coord
+    self.index[name] = k
+    self.joints.append(name)
+    self.version += 1
+
+    ends = self._ends[:len(self._frame_names)]
+    for f in np.flatnonzero(self.__on_frame(self._coords[k],ends[:,0],
+      ends[:,1])).tolist():
+      self.intermediate[self._frame_names[f]].add(k)
+      self._stale[self._frame_names[f]] = None
+
+  def set_restraint(self,name,restraint):
+    '''
+    Sets the restraint (six booleans, True is fixed) of the joint
+    '''
+    restraint = tuple(bool(r) for r in restraint)
+    if self.restraints.get(self.index[name]) != restraint:
+      self.restraints[self.index[name]] = restraint
+      self.version += 1
+      self._refactor = True
+
+  def add_frame(self,name,i_name,j_name,section,material):
+    '''
+    Adds a frame between two existing joints and finds the joints along it
+    '''
+    i, j = self.index[i_name], self.index[j_name]
+    f = len(self._frame_names)
+    if f == len(self._ends):
+      self._ends = np.concatenate((self._ends,np.zeros_like(self._ends)))
+    self._ends[f] = (i,j)
+    self._frame_names.append(name)
+    self.frames[name] = (i,j,section,material)
+    self.version += 1
+    on_frame = self.__on_frame(self.coords,i,j)
+    self.intermediate[name] = set(np.flatnonzero(on_frame).tolist())
+    self._stale[name] = None
+
+  def length(self,name):
+    '''
+    Returns the length of a frame
+    '''
+    i, j, section, material = self.frames[name]
+    return float(np.linalg.norm(self.coords[j] - self.coords[i]))
+
+  def axes(self,name):
+    '''
+    Returns the local axes of a frame
+    '''
+    i, j, section, material = self.frames[name]
+    return local_axes(self.coords[i],self.coords[j])
+
+  def __on_frame(self,points,i,j):
+    '''
+    Returns whether the points lie strictly inside the frames i -> j. Either 
+    the points or the frames can be arrays.
+    '''
+    start, end = self._coords[i], self._coords[j]
+    direction = end - start
+    length = np.linalg.norm(direction,axis=-1)
+    s = ((points - start) * direction).sum(axis=-1) / length
+    distance = np.linalg.norm(np.cross(points - start,direction),
+      axis=-1) / length
+    return ((distance < self.tolerance) & (s > self.tolerance) &
+      (s < length - self.tolerance))
+
+  def elements(self,name):
+    '''
+    Returns the elements of a frame as a list of (i index, j index, start, end)
+    where start and end are distances from the i-end of the frame
+    '''
+    i, j, section, material = self.frames[name]
+    start = self.coords[i]
+    direction = (self.coords[j] - start) / self.length(name)
+    stations = sorted((float((self.coords[k] - start) @ direction), k)
+      for k in self.intermediate[name])
+    stations = [(0.,i)] + stations + [(self.length(name),j)]
+
+    return [(a,b,s,e) for (s,a), (e,b) in zip(stations[:-1],stations[1:])]
+
+  def __element_arrays(self,names):
+    '''
+    Splits the frames into elements. Returns a dictionary of arrays with one
+    entry per element (number along the frame, i and j joints, start along the
+    frame, length, local axes, section properties, local stiffness matrix 'k', 
+    transformation 't', global stiffness matrix 'kg' and degrees of freedom
+    'dofs'), along with the number of elements of each frame.
+    '''
+    table = {key : [] for key in ('number','i','j','start','length',
+      'axes','A','I22','I33','J','E','G','weight')}
+    counts = []
+    for name in names:
+      i, j, section, material = self.frames[name]
+      axes = self.axes(name)
+      parts = self.elements(name)
+      counts.append(len(parts))
+      for number, (a,b,s,e) in enumerate(parts):
+        table['number'].append(number + 1)
+        table['i'].append(a)
+        table['j'].append(b)
+        table['start'].append(s)
+        table['length'].append(e - s)
+        table['axes'].append(axes)
+        for key in ('A','I22','I33','J'):
+          table[key].append(section[key])
+        table['E'].append(material['E'])
+        table['G'].append(material['E'] / (2 * (1 + material['poisson'])))
+        table['weight'].append(material['weight'] * section['A'])
+
+    table = {key : np.array(value) for key, value in table.items()}
+    table['i'], table['j'] = table['i'].astype(int), table['j'].astype(int)
+    table['axes'] = table['axes'].reshape((-1,3,3))
+    m = len(table['number'])
+
+    # Element matrices, in local and global axes
+    table['k'] = local_stiffness(table['length'],table,table['E'],table['G'])
+    table['t'] = transformation(table['axes'])
+    table['kg'] = np.einsum('eji,ejk,ekl->eil',table['t'],table['k'],
+      table['t'])
+    joints = np.stack((table['i'],table['j']),axis=1).reshape((m,2,1))
+    table['dofs'] = (joints * DOF + np.arange(DOF)).reshape((m,12))
+
+    return table, counts
+
+  def element_table(self):
+    '''
+    Returns the arrays of __element_arrays for every frame, along with the 
+    slice of the elements belonging to each frame. Only the frames which
+    changed since the last call are split again: their new elements are 
+    appended, and the old ones are left in place with no stiffness or weight
+    until more than half of the elements are such leftovers.
+    '''
+    if self._elements is not None and 2 * self._dead > self._count:
+      self._stale.update(dict.fromkeys(self.frames))
+      self._elements, self._slices = None, {}
+    if self._elements is None:
+      self._elements = self.__element_arrays([])[0]
+      self._count = self._dead = 0
+
+    stale = list(self._stale)
+    if stale != []:
+      table, counts = self.__element_arrays(stale)
+      for name in stale:
+        if name in self._slices:
+          old = self._slices[name]
+          self._elements['kg'][old] = 0
+          self._elements['weight'][old] = 0
+          self._dead += old.stop - old.start
+
+      # Append the new elements, doubling the arrays when they are full
+      start, end = self._count, self._count + len(table['number'])
+      if end > len(self._elements['number']):
+        capacity = max(end,2 * len(self._elements['number']))
+        self._elements = {key : np.concatenate((value[:start],np.zeros(
+          (capacity - start,) + value.shape[1:],dtype=value.dtype)))
+          for key, value in self._elements.items()}
+      for key, value in table.items():
+        self._elements[key][start:end] = value
+      for name, count in zip(stale,counts):
+        self._slices[name] = slice(start,start + count)
+        start += count
+
+      self._count = end
+      self._changed.update(stale)
+      self._stale = {}
+
+    elements = {key : value[:self._count] 
+      for key, value in self._elements.items()}
+    return elements, dict(self._slices)
+
+  def stiffness(self):
+    '''
+    Builds the global stiffness matrix in COO form. Returns (elements, slices,
+    rows, cols, values), where elements and slices are as in element_table.
+    '''
+    elements, slices = self.element_table()
+    return (elements, slices) + coo(elements['dofs'],elements['kg'])
+
+  def load_vector(self,elements,slices,loads,self_weight):
+    '''
+    Builds the global load vector P for the elements and slices returned by 
+    stiffness().
+      loads = {frame : [(distance from i, global force vector)]}
+      self_weight = multiplier of the weight of the frames (along -Z)
+    Returns (elements, P), where elements is a copy of the given elements with
+    the uniform loads 'q', the fixed end forces 'fixed' and the point loads 
+    'loads' ({element : [(distance from i, local force)]}) added.
+    '''
+    elements = dict(elements)
+
+    # Fixed end forces from the self weight and from the point loads
+    gravity = np.array([0.,0.,-1.])
+    elements['q'] = (self_weight * elements['weight'])[:,np.newaxis] * (
+      elements['axes'] @ gravity)
+    elements['fixed'] = uniform_end_forces(elements['length'],elements['q'])
+    elements['loads'] = {}
+    for name, frame_loads in loads.items():
+      part = slices[name]
+      starts = elements['start'][part]
+      for d, force in frame_loads:
+        # The element containing the load (the last one if it is at the j-end)
+        e = part.start + max(0,int(np.searchsorted(starts,d,side='right')) - 1)
+        a = min(max(d - elements['start'][e],0),elements['length'][e])
+        local = elements['axes'][e] @ np.asarray(force,dtype=np.float64)
+        elements['fixed'][e] += point_end_forces(elements['length'][e],a,local)
+        elements['loads'].setdefault(e,[]).append((a,local))
+
+    P = -1 * np.bincount(elements['dofs'].ravel(),np.einsum('eji,ej->ei',
+      elements['t'],elements['fixed']).ravel(),len(self.joints) * DOF)
+
+    return elements, P
+
+  def assemble(self,loads,self_weight):
+    '''
+    Builds the global system K u = P in COO form (see stiffness and 
+    load_vector). Returns (elements, slices, rows, cols, values, P).
+    '''
+    elements, slices, rows, cols, values = self.stiffness()
+    elements, P = self.load_vector(elements,slices,loads,self_weight)
+    return elements, slices, rows, cols, values, P
+
+  def __free_mask(self,elements):
+    '''
+    Returns whether each degree of freedom is free (not restrained, and
+    belonging to a joint connected to at least one element)
+    '''
+    connected = np.zeros(len(self.joints),dtype=bool)
+    connected[elements['i']] = connected[elements['j']] = True
+
+    free = np.repeat(connected,DOF)
+    for k, restraint in self.restraints.items():
+      free[k * DOF:(k + 1) * DOF] &= ~np.array(restraint)
+    return free
+
+  def free(self,elements):
+    '''
+    Returns the free degrees of freedom in the order in which they are solved
+    for: joints are ordered with reverse Cuthill-McKee so that the stiffness
+    matrix has a small bandwidth, in the direction that puts the newest joints
+    last (frames are usually added next to them, so this keeps updates to the
+    factorization small).
+    '''
+    order = reverse_cuthill_mckee(len(self.joints),elements['i'],elements['j'])
+    if len(order) > 0 and np.argmax(order) < len(order) // 2:
+      order = order[::-1]
+    free = self.__free_mask(elements)
+    dofs = (order[:,np.newaxis] * DOF + np.arange(DOF)).ravel()
+    return dofs[free[dofs]]
+
+  def factor(self):
+    '''
+    Returns (elements, slices, free, factor) for the current geometry, where
+    free lists the free degrees of freedom in the order used by factor, which
+    solves the stiffness matrix restricted to them (None if the structure is
+    unstable). The result is cached until the version changes. When only
+    frames and joints were added since the last factorization, it is updated
+    instead of being recomputed.
+    '''
+    if self._factored is not None and self._factored[0] == self.version:
+      return self._factored[1]
+
+    elements, slices = self.element_table()
+    factor = None
+    if self._ordering is not None and not self._refactor:
+      try:
+        factor = self.__update(elements)
+      except np.linalg.LinAlgError:
+        factor = None
+
+    if factor is None:
+      free = self.free(elements)
+      rows, cols, values = coo(elements['dofs'],elements['kg'])
+
+      # Number the free degrees of freedom and keep the entries between them
+      index = np.full(len(self.joints) * DOF,-1)
+      index[free] = np.arange(len(free))
+      keep = (index[rows] >= 0) & (index[cols] >= 0) & (values != 0)
+      try:
+        factor = BandedCholesky(len(free),index[rows[keep]],index[cols[keep]],
+          values[keep])
+        self._ordering = (free,index,factor)
+      except np.linalg.LinAlgError:
+        self._ordering = None
+    self._changed = set()
+    self._refactor = False
+
+    free = self._ordering[0] if self._ordering is not None else None
+    self._factored = (self.version,(elements,slices,free,factor))
+    return self._factored[1]
+
+  def __update(self,elements):
+    '''
+    Updates the last factorization for the frames that changed since then. The
+    new degrees of freedom are numbered after the existing ones. Returns the
+    factor, or None if the change is too large for an update.
+    '''
+    free, index, factor = self._ordering
+
+    # Number the degrees of freedom added since
+    mask = self.__free_mask(elements)
+    index = np.concatenate((index,np.full(len(mask) - len(index),-1)))
+    added = np.flatnonzero(mask & (index < 0))
+    index[added] = len(free) + np.arange(len(added))
+    free = np.concatenate((free,added))
+
+    # The first position touched by the changed elements
+    touched = np.concatenate([elements['dofs'][self._slices[name]].ravel()
+      for name in self._changed] + [added])
+    touched = index[touched]
+    first = int(touched[touched >= 0].min()) if len(touched) > 0 else len(free)
+    if first // factor.block < (1 - MAX_UPDATE) * factor.count:
+      return None
+
+    # Only the entries in the blocks that are factored again are needed
+    start = min(first,factor.size) // factor.block * factor.block
+    dofs = elements['dofs']
+    near = index[dofs].max(axis=1) >= start
+    rows, cols, values = coo(dofs[near],elements['kg'][near])
+    keep = (index[rows] >= start) & (index[cols] >= start) & (values != 0)
+    if not factor.update(len(free),index[rows[keep]],index[cols[keep]],
+      values[keep],first):
+      return None
+
+    self._ordering = (free,index,factor)
+    return factor
+
+  def analyze(self,loads,self_weight,stations):
+    '''
+    Solves the model for the loads and self weight (see load_vector). stations
+    is {frame : number of output segments}. Returns a FrameSolution, or None 
+    if the structure is unstable. When the geometry has not changed since the
+    last analysis only the load vector is rebuilt, and the cached factor is 
+    reused.
+    '''
+    elements, slices, free, factor = self.factor()
+    if factor is None:
+      return None
+    elements, P = self.load_vector(elements,slices,loads,self_weight)
+    U = np.zeros(len(P))
+    U[free] = factor.solve(P[free])
+
+    return FrameSolution(elements,slices,U,stations)
+
+class FrameSolution(object):
+  '''
+  Results of an analysis. The forces along the frames are only calculated when
+  they are requested.
+  '''
+  def __init__(self,elements,slices,U,stations):
+    super(FrameSolution,self).__init__()
+    self.elements = elements
+    self.slices = slices
+    self.U = U
+    self.displacements = U.reshape((-1,DOF))
+    self.stations = stations
+    self.forces = {}
+
+  def frame_forces(self,name):
+    '''
+    Returns (element numbers, distances from i of the frame, distances from i
+    of the element, forces) at the output stations of the frame. forces is an
+    array with columns (P,V2,V3,T,M2,M3): the forces acting on the positive
+    face of the cut (the part of the element between i and the station), in
+    the local axes, so P is positive in tension.
+    '''
+    if name in self.forces:
+      return self.forces[name]
+    elements, part = self.elements, self.slices[name]
+
+    # End forces of each element
+    t, k = elements['t'][part], elements['k'][part]
+    u = self.U[elements['dofs'][part]]
+    end_forces = (np.einsum('eij,ejk,ek->ei',k,t,u) + elements['fixed'][part])
+
+    # Output stations, along with the ends of every element
+    starts, lengths = elements['start'][part], elements['length'][part]
+    total = starts[-1] + lengths[-1]
+    segments = self.stations.get(name,2)
+    output = total * np.arange(segments + 1) / segments
+    which, x = [], []
+    for e, (s,l) in enumerate(zip(starts.tolist(),lengths.tolist())):
+      inside = output[(output > s) & (output < s + l)] - s
+      which.extend([e] * (len(inside) + 2))
+      x.extend([0.] + inside.tolist() + [l])
+    which, x = np.array(which), np.array(x)
+
+    def moment(s,force):
+      '''
+      Moments about the stations of local forces applied at distances s
+      '''
+      return (s - x)[:,np.newaxis] * np.stack((np.zeros(len(x)),-force[:,2],
+        force[:,1]),axis=1)
+
+    # Statics of the part of each element between i and the station
+    q = elements['q'][part][which]
+    F_i, M_i = end_forces[which,0:3], end_forces[which,3:6]
+    force = F_i + q * x[:,np.newaxis]
+    couple = M_i + moment(0,F_i) + moment(x / 2,q * x[:,np.newaxis])
+    for e in range(part.start,part.stop):
+      for a, p in elements['loads'].get(e,[]):
+        before = (which == e - part.start) & (a < x)
+        force[before] += p
+        couple[before] += moment(a,np.tile(p,(len(x),1)))[before]
+
+    self.forces[name] = (elements['number'][part][which],starts[which] + x,x,
+      -1 * np.concatenate((force,couple),axis=1))
+    return self.forces[name]
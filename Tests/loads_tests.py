@@ -0,0 +1,68 @@
+'''
+Checks that the LoadManager (World/loads.py) pushes the robot loads to the
+model, using the local backend (SAP2000/local.py) as the model. Run with
+"python -m pytest Tests/loads_tests.py" or "python -m unittest
+Tests.loads_tests".
+'''
+import unittest
+
+from SAP2000.local import LocalSapModel
+from World.loads import LoadManager
+from variables import PROGRAM
+
+class Program(object):
+  '''
+  Stands in for the SapProgram (and its COM object), which only need to hold
+  the model
+  '''
+  def __init__(self,model):
+    super(Program,self).__init__()
+    self.sap_com_object = self
+    self.SapModel = model
+
+def new_model(model,frames):
+  '''
+  Clears the model and adds the robot load pattern and the given number of
+  frames to it, named "1", "2", ... and each 120 inches long
+  '''
+  model.InitializeNewModel()
+  model.LoadPatterns.Add(PROGRAM['robot_load_case'],3)
+  for k in range(frames):
+    model.FrameObj.AddByCoord(0,0,120 * k,0,0,120 * (k + 1))
+
+def point_loads(model,beam):
+  '''
+  Returns the sorted (distance, weight) of the robot loads on a frame
+  '''
+  ret, number, frames, patterns, types, csys, directions, rel, dists, values = (
+    model.FrameObj.GetLoadPoint(beam))
+  return sorted((dist,value) for pattern, dist, value in zip(patterns,dists,
+    values) if pattern == PROGRAM['robot_load_case'])
+
+class ResetTests(unittest.TestCase):
+  '''
+  After a reset, the loads are pushed to the new model as if the manager had
+  just been created
+  '''
+  def test_flush_after_reset(self):
+    model = LocalSapModel()
+    new_model(model,2)
+    manager = LoadManager(Program(model))
+    manager.move('robot-1','1',30.,0.2)
+    manager.move('robot-2','2',60.,0.2)
+    manager.flush()
+    self.assertEqual(point_loads(model,'1'),[(30.,0.2)])
+    self.assertEqual(point_loads(model,'2'),[(60.,0.2)])
+
+    # The new model only has frame "1" (so deleting the loads of frame "2"
+    # would fail), and robot-1 stands where it stood in the old model
+    new_model(model,1)
+    manager.reset()
+    manager.move('robot-1','1',30.,0.2)
+    manager.flush()
+    self.assertEqual(manager.error_data,'')
+    self.assertEqual(point_loads(model,'1'),[(30.,0.2)])
+    self.assertEqual(manager.changed(),[])
+
+if __name__ == '__main__':
+  unittest.main()
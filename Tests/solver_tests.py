@@ -0,0 +1,250 @@
+'''
+Checks the local frame solver (SAP2000/stiffness.py) against textbook results,
+and the banded Cholesky factorization (SAP2000/banded.py) against a dense
+solve. Run with "python -m pytest Tests/solver_tests.py" or
+"python -m unittest Tests.solver_tests".
+'''
+import pickle
+import unittest
+
+import numpy as np
+
+from SAP2000.banded import BandedCholesky, MIN_BLOCK
+from SAP2000.stiffness import FrameModel, pipe_section, STEEL
+
+# Section of the frames in the tests (inches)
+SECTION = pipe_section(2.0,0.1)
+
+# Length of the cantilevers (inches) and the load at their tip (kip)
+LENGTH = 120.
+LOAD = 0.5
+
+def cantilever(joints = 2):
+  '''
+  Returns a FrameModel of a cantilever along x, fixed at x = 0, with the given
+  number of evenly spaced joints along it (the intermediate ones split the
+  frame into elements)
+  '''
+  model = FrameModel()
+  for k in range(joints):
+    model.add_joint(k,(LENGTH * k / (joints - 1),0,0))
+  model.set_restraint(0,[True] * 6)
+  model.add_frame('cantilever',0,joints - 1,SECTION,STEEL)
+  return model
+
+def tip(model,solution):
+  '''
+  Returns the displacements (u1,u2,u3,r1,r2,r3) of the free end of a cantilever
+  '''
+  return solution.displacements[model.index[len(model.joints) - 1]]
+
+def spd(size,bandwidth,seed = 0):
+  '''
+  Returns a random symmetric positive definite matrix with the given bandwidth
+  '''
+  random = np.random.RandomState(seed)
+  A = random.uniform(-1,1,(size,size))
+  A = np.tril(np.triu(A + A.T,-bandwidth),bandwidth)
+  return A + np.diag(np.abs(A).sum(axis=1) + 1)
+
+def entries(A):
+  '''
+  Returns the (rows, cols, values) of the nonzero entries of A
+  '''
+  rows, cols = np.nonzero(A)
+  return rows, cols, A[rows,cols]
+
+def tower(model,first,last,analyze = False):
+  '''
+  Adds the storeys first to last to a FrameModel: four columns, the beams
+  around the top of each storey and a diagonal on one side. If analyze is
+  True, the model is analyzed (with a load on the newest frame) after every
+  frame is added. Returns the names of the frames added.
+  '''
+  corners = [(0,0),(1,0),(1,1),(0,1)]
+  spacing = 60.
+  names = []
+
+  def add(name,i,j):
+    model.add_frame(name,i,j,SECTION,STEEL)
+    names.append(name)
+    if analyze:
+      model.analyze({name : [(1.,(0.1,0,-0.2))]},1,{})
+
+  if first == 1:
+    for x, y in corners:
+      model.add_joint((x,y,0),(x * spacing,y * spacing,0))
+      model.set_restraint((x,y,0),[True] * 6)
+  for z in range(first,last + 1):
+    for x, y in corners:
+      model.add_joint((x,y,z),(x * spacing,y * spacing,z * spacing))
+      add("column-{}-{}-{}".format(x,y,z),(x,y,z - 1),(x,y,z))
+    for (x,y), (u,v) in zip(corners,corners[1:] + corners[:1]):
+      add("beam-{}-{}-{}".format(x,y,z),(x,y,z),(u,v,z))
+    add("diagonal-{}".format(z),(0,0,z - 1),(1,0,z))
+  return names
+
+class CantileverTests(unittest.TestCase):
+  '''
+  A cantilever with a point load P at its tip deflects P L^3 / 3 E I there and
+  rotates by P L^2 / 2 E I, and its own weight w per length deflects the tip by
+  w L^4 / 8 E I. Euler-Bernoulli elements are exact at the joints for these
+  loads, however many elements the frame is split into.
+  '''
+  EI = STEEL['E'] * SECTION['I33']
+
+  def test_tip_load(self):
+    for joints in (2,5):
+      model = cantilever(joints)
+      solution = model.analyze({'cantilever' : [(LENGTH,(0,0,-LOAD))]},0,{})
+      u = tip(model,solution)
+      self.assertAlmostEqual(u[2] / (-LOAD * LENGTH**3 / (3 * self.EI)),1,
+        places=8)
+      self.assertAlmostEqual(u[4] / (LOAD * LENGTH**2 / (2 * self.EI)),1,
+        places=8)
+      np.testing.assert_allclose(u[[0,1,3,5]],0,atol=1e-12)
+
+  def test_tip_load_across(self):
+    model = cantilever()
+    solution = model.analyze({'cantilever' : [(LENGTH,(0,LOAD,0))]},0,{})
+    self.assertAlmostEqual(tip(model,solution)[1] / (LOAD * LENGTH**3 / (3 *
+      self.EI)),1,places=8)
+
+  def test_axial_load(self):
+    model = cantilever()
+    solution = model.analyze({'cantilever' : [(LENGTH,(LOAD,0,0))]},0,{})
+    self.assertAlmostEqual(tip(model,solution)[0] / (LOAD * LENGTH / (
+      STEEL['E'] * SECTION['A'])),1,places=8)
+
+  def test_self_weight(self):
+    w = STEEL['weight'] * SECTION['A']
+    for joints in (2,4):
+      model = cantilever(joints)
+      solution = model.analyze({},1,{})
+      self.assertAlmostEqual(tip(model,solution)[2] / (-w * LENGTH**4 / (8 *
+        self.EI)),1,places=8)
+
+  def test_root_moment(self):
+    '''
+    The moment at the fixed end is P L, and it goes to zero at the tip
+    '''
+    model = cantilever()
+    solution = model.analyze({'cantilever' : [(LENGTH,(0,0,-LOAD))]},0,
+      {'cantilever' : 4})
+    numbers, distances, x, forces = solution.frame_forces('cantilever')
+    np.testing.assert_allclose(np.abs(forces[0,5]),LOAD * LENGTH,rtol=1e-8)
+    np.testing.assert_allclose(forces[-1,5],0,atol=1e-8)
+    np.testing.assert_allclose(np.abs(forces[:,1]),LOAD,rtol=1e-8)
+
+  def test_unstable(self):
+    model = cantilever()
+    model.set_restraint(0,[False] * 6)
+    self.assertIsNone(model.analyze({},1,{}))
+
+class BandedCholeskyTests(unittest.TestCase):
+  def check(self,factor,A):
+    b = np.random.RandomState(1).uniform(-1,1,(len(A),3))
+    np.testing.assert_allclose(factor.solve(b),np.linalg.solve(A,b),rtol=1e-9,
+      atol=1e-12)
+    np.testing.assert_allclose(factor.solve(b[:,0]),np.linalg.solve(A,b[:,0]),
+      rtol=1e-9,atol=1e-12)
+
+  def test_solve(self):
+    for size, bandwidth in ((1,0),(10,3),(5 * MIN_BLOCK + 7,12),
+      (300,MIN_BLOCK + 20)):
+      A = spd(size,bandwidth)
+      self.check(BandedCholesky(size,*entries(A)),A)
+
+  def test_duplicates_and_upper_triangle(self):
+    '''
+    Duplicate entries are added up and only the lower triangle is used
+    '''
+    A = spd(100,5)
+    rows, cols, values = entries(np.tril(A))
+    rows = np.concatenate((rows,rows,[0]))
+    cols = np.concatenate((cols,cols,[99]))
+    values = np.concatenate((values / 2,values / 2,[1e6]))
+    self.check(BandedCholesky(100,rows,cols,values),A)
+
+  def test_not_positive_definite(self):
+    A = spd(60,4)
+    A[30,30] = -1
+    with self.assertRaises(np.linalg.LinAlgError):
+      BandedCholesky(60,*entries(A))
+
+  def test_update(self):
+    '''
+    Updating the factor for a matrix that grew and changed in its last rows
+    and columns gives the same solutions as factoring the new matrix
+    '''
+    size, grown, first = 4 * MIN_BLOCK, 4 * MIN_BLOCK + 30, 3 * MIN_BLOCK + 5
+    A = spd(grown,8)
+    old = A[:size,:size].copy()
+    old[first:,first:] += np.eye(size - first)
+    factor = BandedCholesky(size,*entries(old))
+    self.check(factor,old)
+
+    # Only the columns from the start of the block containing first are used
+    rows, cols, values = entries(A)
+    keep = cols >= first // factor.block * factor.block
+    self.assertTrue(factor.update(grown,rows[keep],cols[keep],values[keep],
+      first))
+    self.check(factor,A)
+    fresh = BandedCholesky(grown,*entries(A))
+    b = np.arange(grown,dtype=np.float64)
+    np.testing.assert_allclose(factor.solve(b),fresh.solve(b),rtol=1e-10)
+
+  def test_update_outside_band(self):
+    '''
+    An update whose entries do not fit in the blocks is refused
+    '''
+    A = spd(200,4)
+    factor = BandedCholesky(200,*entries(A))
+    self.assertFalse(factor.update(200,[199],[0],[0.5],0))
+    self.check(factor,A)
+
+class UpdateTests(unittest.TestCase):
+  '''
+  A model analyzed after every frame is added (which updates the factor in
+  place) gives the same displacements as a model factored once at the end
+  '''
+  def test_growing_tower(self):
+    grown = FrameModel()
+    tower(grown,1,20)
+    grown.analyze({},1,{})
+    factor = grown.factor()[3]
+    added = tower(grown,21,24,analyze=True)
+    self.assertIs(grown.factor()[3],factor)
+
+    full = FrameModel()
+    tower(full,1,24)
+
+    loads = {name : [(10.,(0.2,-0.1,-0.3))] for name in added[::5]}
+    np.testing.assert_allclose(grown.analyze(loads,1,{}).displacements,
+      full.analyze(loads,1,{}).displacements,rtol=1e-7,atol=1e-12)
+
+class SaveTests(unittest.TestCase):
+  '''
+  A pickled model (as saved by the local backend) holds only its definition,
+  and solves and grows as before once it is loaded
+  '''
+  def test_pickle(self):
+    model = FrameModel()
+    tower(model,1,10)
+    loads = {'beam-0-0-5' : [(3.,(0,0,-1))]}
+    before = model.analyze(loads,1,{}).displacements
+
+    saved = pickle.dumps(model)
+    for cache in FrameModel.CACHES:
+      self.assertNotIn(cache.encode(),saved)
+    loaded = pickle.loads(saved)
+    np.testing.assert_array_equal(loaded.analyze(loads,1,{}).displacements,
+      before)
+
+    tower(model,11,12)
+    tower(loaded,11,12)
+    np.testing.assert_allclose(loaded.analyze(loads,1,{}).displacements,
+      model.analyze(loads,1,{}).displacements,rtol=1e-10,atol=1e-14)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,91 @@
+'''
+Keeps track of the point loads that the robots of a swarm apply to the
+structure. Robots only record where they stand (beam, distance from the i-end
+of the beam and weight), which is done in python. The loads that changed since
+the last time are then pushed to the SAP2000 model in one batch right before
+the model is analyzed or saved, so moving along a beam costs no calls to
+SAP2000.
+'''
+# Importing helper functions
+from Helpers import helpers
+# importing simulation constants
+from variables import PROGRAM
+
+class LoadManager(object):
+  def __init__(self,program):
+    super(LoadManager,self).__init__()
+
+    # Accesss to the SapModel from SAP 2000
+    self.model = program.sap_com_object.SapModel
+
+    # The load of each robot on the structure, {robot : (beam, distance, weight)}
+    self.loads = {}
+
+    # The robot loads currently assigned in the model, as sorted lists of
+    # (distance, weight) for every beam {beam : loads}
+    self.assigned = {}
+
+    # Contains Errors from SAP 2000
+    self.error_data = ''
+
+  def move(self,robot,beam,distance,weight):
+    '''
+    Records that the named robot now stands on the named beam, at the given
+    distance from its i-end. This replaces the previous load of the robot.
+    '''
+    self.loads[robot] = (beam,distance,weight)
+
+  def remove(self,robot):
+    '''
+    Records that the named robot is no longer on the structure
+    '''
+    self.loads.pop(robot,None)
+
+  def reset(self):
+    '''
+    Removes the loads of all robots. The model is replaced when the simulation
+    is reset, so none of the loads are assigned in it any more.
+    '''
+    self.loads = {}
+    self.assigned = {}
+
+  def beam_loads(self):
+    '''
+    Returns the loads that should be on each beam, {beam : loads}, in the same
+    format as self.assigned
+    '''
+    loads = {}
+    for beam, distance, weight in self.loads.values():
+      loads.setdefault(beam,[]).append((distance,weight))
+    return {beam : sorted(beam_loads) for beam, beam_loads in loads.items()}
+
+  def changed(self):
+    '''
+    Returns the names of the beams whose loads in the model are out of date
+    '''
+    loads = self.beam_loads()
+    return sorted(beam for beam in set(loads) | set(self.assigned)
+      if loads.get(beam) != self.assigned.get(beam))
+
+  def flush(self):
+    '''
+    Pushes the changes since the last flush to the model. The robot loads of
+    every beam that changed are deleted and assigned again. The model must be
+    unlocked if anything changed.
+    '''
+    loads = self.beam_loads()
+    for beam in self.changed():
+      ret = self.model.FrameObj.DeleteLoadPoint(beam,PROGRAM['robot_load_case'])
+      helpers.check(ret,self,"deleting loads",return_val=ret,beam=beam,
+        previous_loads=self.assigned.get(beam))
+
+      for distance, weight in loads.get(beam,[]):
+        ret = self.model.FrameObj.SetLoadPoint(beam,PROGRAM['robot_load_case'],
+          1,10,distance,weight,"Global",False,False,0)
+        helpers.check(ret,self,"adding new load",return_val=ret,beam=beam,
+          distance=distance,value=weight)
+
+      if beam in loads:
+        self.assigned[beam] = loads[beam]
+      else:
+        self.assigned.pop(beam,None)
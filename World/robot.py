@@ -14,6 +14,7 @@ from construction import HOME, CONSTRUCTION
 
 class BaseBody:
   __metaclass__=ABCMeta
+  __slots__ = ()
   '''
   These are the methods that need to be implemented in order for the
   current brains to continue functioning correctly. Look at comments on
@@ -110,7 +111,12 @@ class BaseBody:
 
 # Basic class for any automatic object that needs access to the SAP program
 class Body(BaseBody):
-  def __init__(self,name,structure,location,program):
+  # Swarms can be large, so bodies do not get a __dict__
+  __slots__ = ('program','model','simulation_model','loads','scheduler',
+    'structure','name','step','location','beam','weight','num_beams','memory',
+    'error_data','repair_data','read_moment')
+
+  def __init__(self,name,structure,location,program,loads,scheduler):
 
     '''''''''''''''''''''''''''''
     SAP 2000 API Access Variables
@@ -124,6 +130,11 @@ class Body(BaseBody):
     # Storage of the sphere model
     self.simulation_model = None
 
+    # The LoadManager of the swarm, which places our load on the structure, and
+    # the AnalysisScheduler of the swarm, which analyzes the structure for us
+    self.loads = loads
+    self.scheduler = scheduler
+
     '''''''''''''''''''''''''''''
     Local Information Variables and Python Structure
     '''''''''''''''''''''''''''''
@@ -370,76 +381,18 @@ class Body(BaseBody):
     SAP2000 program. Removes the current load from the previous location (ie,
     the previous beam), and shifts it to the new beam (specified by the new 
     location). It also updates the current beam. If the robot moves off the 
-    structure, this also takes care of it.
+    structure, this also takes care of it. The load is only recorded in the 
+    LoadManager, which updates SAP2000 before the next analysis.
     '''
-    def removeload(location):
-      '''
-      Removes the load assigned to a specific location based on where the robot 
-      existed (assumes the robot is on a beam)
-      '''
-      # Sanity check
-      assert not self.model.GetModelIsLocked()
-
-      # obtain current values.
-      # values are encapsulated in a list as follows: ret, number_items, 
-      # frame_names, loadpat_names, types, coordinates, directions, rel_dists, 
-      # dists, loads
-      data = self.model.FrameObj.GetLoadPoint(self.beam.name)
-     
-      # Sanity check with data
-      assert data[0] == 0 
-      if data[1] == 0:
-        helpers.check(1,self,"getting loads",beam=self.beam.name,
-          return_data=data,state=self.currentState())
-        return;
-
-      # Find location of load
-      i, j = self.beam.endpoints
-      curr_dist = helpers.distance(i,self.location)
-
-      # Loop through distances to find our load (the one in self.location) and 
-      # remove all reference to it. Additionally remove loads not related to our
-      # load pattern
-      indeces = []
-      index = 0
-      for ab_dist in data[8]:  # this provides acces to the absolute_distance 
-        if ((helpers.compare(ab_dist,curr_dist) and PROGRAM['robot_load_case'] == 
-          data[3][index]) or data[3][index] != PROGRAM['robot_load_case']):
-          indeces.append(index)
-        index += 1
-
-      # Delete the loads off the beam
-      ret = self.model.FrameObj.DeleteLoadPoint(self.beam.name,
-        PROGRAM['robot_load_case'])
-      helpers.check(ret,self,"deleting loads",return_val=ret,
-        beam=self.beam.name,distance=curr_dist,previous_loads=data,
-        state=self.currentState())
-
-      # add the loads we want back to the frame (automatically deletes all 
-      # previous loads)
-      for i in range(data[1]):
-        if i not in indeces:
-          ret = self.model.FrameObj.SetLoadPoint(self.beam.name, 
-            data[3][i], data[4][i], data[6][i], data[7][i], data[9][i],"Global",
-            True,False)
-          helpers.check(ret,self,"adding back loads",return_val=ret,
-            beam=self.beam.name,load_pat=data[3][i],type=data[4][i],
-            direction=data[6][i],rel_dist=data[7][i],load_val=data[9][i],
-            state=self.currentState())
-
     # Move the load off the current location and to the new one (if still on 
     # beam), then change the locations
-    if self.beam is not None:
-      removeload(self.location)
-
-    # Don't add the load if there is no beam
     if new_beam is not None:
       # Jump on beam
       self.beam = new_beam
       self.addLoad(new_beam, new_location, self.weight)
     else:
       self.beam = new_beam
-
+      self.loads.remove(self.name)
 
     # Update local location
     self.location = new_location
@@ -502,15 +455,17 @@ class Body(BaseBody):
         state=self.currentState())
       return 0
 
+    # Get beam endpoints to calculate global position of moment
+    i_end,j_end = self.structure.get_endpoints(name,self.location)
+    beam_direction = helpers.make_unit(helpers.make_vector(i_end,j_end))
+
     # Find index of closest data_point
     close_index, i = 0, 0
     shortest_distance = None
     distances = results[3]
     for i_distance in distances:
 
-      # Get beam endpoints to calculate global position of moment
-      i_end,j_end = self.structure.get_endpoints(name,self.location)
-      beam_direction = helpers.make_unit(helpers.make_vector(i_end,j_end))
+      # Global position of the output station
       point = helpers.sum_vectors(i_end,helpers.scale(i_distance,
         beam_direction))
       distance = helpers.distance(pivot,point)
@@ -541,10 +496,10 @@ class Body(BaseBody):
     robot can detect (though, this should only be used for finding a connection,
     as the robot itself SHOULD only measure the stresses on its current beam)
     '''
-    # Run analysis before deciding to get the next direction
-    if not self.model.GetModelIsLocked() and self.needData():
+    # Obtain analysis results before deciding to get the next direction
+    if self.needData():
       if self.atJoint():
-        errors = helpers.run_analysis(self.model)
+        errors = self.scheduler.request()
         if errors != '':
           self.error_data += "getAvailableDirections(): " + errors + "\n"
 
@@ -552,7 +507,6 @@ class Body(BaseBody):
     # This is done so that floating-point arithmethic errors don't add up.
     (e1, e2) = self.beam.endpoints
     if not (helpers.on_line (e1,e2,self.location)):
-      self.model.SetModelIsLocked(False) #added in to prevent assertion error FIX?
       self.changeLocationOnStructure(helpers.correct(e1,e2,self.location), self.beam)
 
     # Obtain all local objects
@@ -736,10 +690,7 @@ class Body(BaseBody):
       if distances[name] > ROBOT['local_radius']:
         return None
       else:
-        # All the same beans 
-        beams = [box[name] for box in boxes if name in box]
-
-        return {  'beam'  : beams[0],
+        return {  'beam'  : self.structure.find_beam(name),
                   'distance' : distances[name],
                   'direction' : vectors[name]}
 
@@ -749,18 +700,12 @@ class Body(BaseBody):
   '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
   def addLoad(self,beam,location,value):
     '''
-    Adds a load of the specified value to the named beam at the specific 
-    location
+    Places our load, of the specified value, on the named beam at the specific
+    location (replacing our previous load)
     '''
-    # Sanity check
-    assert not self.model.GetModelIsLocked()
-
-    # Find distance and add load
+    # Find distance and record the load
     distance = helpers.distance(beam.endpoints.i,location)
-    ret = self.model.FrameObj.SetLoadPoint(beam.name,PROGRAM['robot_load_case'],
-      1,10,distance,value,"Global", False, True,0)
-    helpers.check(ret,self,"adding new load",beam=beam.name,distance=distance,
-      value=value,state=self.currentState())
+    self.loads.move(self.name,beam.name,distance,value)
 
   def addBeam(self,p1,p2):
     '''
@@ -786,9 +731,9 @@ class Body(BaseBody):
       else:
         return name
 
-    # Unlock the program if necessary
-    if self.model.GetModelIsLocked():
-      self.model.SetModelIsLocked(False)
+    # Unlock the program if necessary, since we are about to change it
+    self.scheduler.unlock()
+    self.scheduler.changed()
 
     # Add points to SAP Program
     p1_name, p2_name = addpoint(p1), addpoint(p2)
@@ -0,0 +1,84 @@
+'''
+Decides when the SAP2000 model needs to be analyzed. The swarm shares one
+AnalysisScheduler, and robots (and the simulation) ask it for results instead
+of running the analysis themselves. The scheduler keeps a version of the model,
+which changes whenever beams or loads change, and only analyzes the model when
+the results it holds are for an older version. Several requests in the same
+state of the model therefore cost one analysis. Every change to the model
+must go through the scheduler (see unlock and changed) for this to hold.
+'''
+# Importing helper functions
+from Helpers import helpers
+# importing simulation constants
+from variables import PROGRAM
+
+class AnalysisScheduler(object):
+  def __init__(self,program,loads):
+    super(AnalysisScheduler,self).__init__()
+
+    # Accesss to the SapModel from SAP 2000
+    self.model = program.sap_com_object.SapModel
+
+    # The LoadManager of the swarm, whose changes are pushed before analyzing
+    self.loads = loads
+
+    # The version of the model, and the version and output case the current
+    # results are for (None if there are none)
+    self.version = 0
+    self.analyzed = None
+
+    # Number of requests received and of analyses actually run
+    self.requests = 0
+    self.analyses = 0
+
+  def changed(self):
+    '''
+    Records that the model was changed, so the results are out of date
+    '''
+    self.version += 1
+
+  def unlock(self):
+    '''
+    Unlocks the model so that it can be changed. This deletes the results.
+    '''
+    if self.model.GetModelIsLocked():
+      self.model.SetModelIsLocked(False)
+    self.analyzed = None
+
+  def dirty(self,output = PROGRAM['robot_load_case']):
+    '''
+    Returns whether the model has changed since it was last analyzed for the
+    output case (or was never analyzed). The model is only ever changed or
+    unlocked through the scheduler, so this needs no call to SAP2000.
+    '''
+    return self.analyzed != (self.version,output) or self.loads.changed() != []
+
+  def flush(self):
+    '''
+    Pushes the pending changes of the loads to the model (unlocking it if
+    necessary)
+    '''
+    if self.loads.changed() != []:
+      self.unlock()
+      self.loads.flush()
+      self.changed()
+
+  def request(self,output = PROGRAM['robot_load_case']):
+    '''
+    Makes sure the results for the current state of the model are available,
+    analyzing it only if necessary. Returns a string of explanations for any
+    errors that occurred during the analysis process (see helpers.run_analysis)
+    '''
+    self.requests += 1
+    if not self.dirty(output):
+      return ''
+
+    self.flush()
+    errors = helpers.run_analysis(self.model,output)
+
+    # Nothing is analyzed when the physics are turned off, so there are no
+    # results to keep
+    if helpers.SAP_PHYSICS:
+      self.analyzed = (self.version,output)
+      self.analyses += 1
+    return errors
@@ -0,0 +1,111 @@
+'''
+Snapshots of the state of the robots of a swarm, for the logs. Instead of a
+dictionary (and a copy of the memory) per robot, a snapshot keeps the numbers
+of every robot in one numpy record array, along with their names and beams.
+Memories are only copied when they have changed since the last snapshot, so
+snapshots share the copies of memories that have not changed. Snapshots are
+never modified, so they can be handed to the writer thread (see
+Helpers/output.py), where they are turned back into dictionaries.
+'''
+# Third party libraries
+import numpy as np
+
+# The state of a robot which is stored in arrays. step and num_beams are always
+# ints, and weight a float. The coordinates of the locations and read_moment
+# can be either (a robot on the ground is at z = 0, and read_moment is 0 until
+# a moment is read), so integral marks which of them (in the order location,
+# deflected_location, read_moment) were python ints, so that the logs show
+# them as they were.
+FIELDS = np.dtype([('step','<i8'),('location','<f8',(3,)),
+  ('deflected_location','<f8',(3,)),('weight','<f8'),('num_beams','<i8'),
+  ('read_moment','<f8'),('integral','?',(7,))])
+
+class SwarmState(object):
+  '''
+  The state of every robot of a swarm at one point in time
+  '''
+  __slots__ = ('names','values','beams','memories')
+
+  def __init__(self,names,values,beams,memories):
+    # The names of the robots, their numbers (one FIELDS record per robot),
+    # the names of the beams they are on (None if on the ground) and their
+    # memories
+    self.names = names
+    self.values = values
+    self.beams = beams
+    self.memories = memories
+
+  def __len__(self):
+    return len(self.names)
+
+  def state(self,row):
+    '''
+    Returns the state of a robot as a dictionary (as Body.currentState does)
+    '''
+    values = self.values[row]
+    numbers = [int(number) if integral else float(number) for number, integral
+      in zip(values['location'].tolist() + values['deflected_location'].tolist()
+      + [values['read_moment']],values['integral'].tolist())]
+    return {'name'              : self.names[row],
+            'step'              : int(values['step']),
+            'location'          : numbers[0:3],
+            'deflected_location': numbers[3:6],
+            'beam'              : self.beams[row],
+            'weight'            : float(values['weight']),
+            'num_beams'         : int(values['num_beams']),
+            'read_moment'       : numbers[6],
+            'memory'            : self.memories[row] }
+
+  def items(self):
+    '''
+    Yields the name and the state (see state()) of every robot
+    '''
+    for row, name in enumerate(self.names):
+      yield name, self.state(row)
+
+class RobotStates(object):
+  '''
+  Takes snapshots of the state of the robots of a swarm
+  '''
+  def __init__(self):
+    super(RobotStates,self).__init__()
+
+    # The last copy of the memory of each robot, {name : memory}
+    self.memories = {}
+
+  def snapshot(self,bodies):
+    '''
+    Returns a SwarmState with the current state of the bodies
+    '''
+    names = [body.name for body in bodies]
+    beams = [body.beam.name if body.beam is not None else None for body in
+      bodies]
+    locations = [tuple(body.location) for body in bodies]
+    deflected = [tuple(body.getGenuineLocation()) for body in bodies]
+    read_moments = [body.read_moment for body in bodies]
+
+    # Fill the numbers one field at a time. Locations are rounded to prevent
+    # decimal runoff in the logs.
+    values = np.zeros(len(bodies),dtype=FIELDS)
+    values['step'] = [body.step for body in bodies]
+    values['location'] = np.round(np.reshape(locations,(-1,3)),2)
+    values['deflected_location'] = np.round(np.reshape(deflected,(-1,3)),2)
+    values['weight'] = [body.weight for body in bodies]
+    values['num_beams'] = [body.num_beams for body in bodies]
+    values['read_moment'] = read_moments
+    values['integral'] = np.reshape([type(number) is int for location,
+      deflection, read_moment in zip(locations,deflected,read_moments) for
+      number in location + deflection + (read_moment,)],(-1,7))
+
+    # Copy the memories only if they have changed
+    memories = []
+    for body in bodies:
+      memory = self.memories.get(body.name)
+      if memory is None or memory != body.memory:
+        memory = self.memories[body.name] = body.memory.copy()
+      memories.append(memory)
+
+    return SwarmState(names,values,beams,memories)
+
+  def reset(self):
+    self.memories = {}
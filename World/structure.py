@@ -9,9 +9,11 @@ import sys
 # allows easy implementation of Coord and EndPoints
 from collections import namedtuple
 
+# Third party libraries
+import numpy as np
+
 # Importing helper functions
-from Helpers import helpers
-from Helpers.errors import OutofBox
+from Helpers import helpers, vectorized
 # importing simulation constants
 from variables import BEAM, MATERIAL, PROGRAM, VISUALIZATION, WORLD
 
@@ -26,6 +28,9 @@ EndPoints = namedtuple("Endpoints", ["i","j"])
 Beam Object Definition
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 class BeamBase(object):
+  # Beams are stored by the thousands, so they do not get a __dict__
+  __slots__ = ('endpoints','joints','name','weight','visual_model')
+
   def __init__(self, name, endpoints,visual_model = None):
     # Each beam has two endpoints (i and j)
     self.endpoints = EndPoints(i=endpoints[0], j=endpoints[1])
@@ -106,6 +111,9 @@ class Beam(BeamBase):
   This class keeps track of both the original design location of the tubes and 
   of the deflected location based on the analysis results
   '''
+  __slots__ = ('endpoint_names','deflection','deflected_endpoints',
+    'previous_write_endpoints')
+
   def __init__(self, name, endpoints,endpoint_names, visual_model = None):
     super(Beam,self).__init__(name,endpoints,visual_model)
 
@@ -114,8 +122,8 @@ class Beam(BeamBase):
     # Keeps track of the amoung of deflection
     self.deflection = None
 
-    # Deflected enpoints
-    self.deflected_enpoints = self.get_true_endpoints()
+    # Deflected endpoints
+    self.deflected_endpoints = self.get_true_endpoints()
 
     # Keeps track of the deflected endpoint we last wrote out 
     # This makes a faster visualization (we only change the visualization) when
@@ -128,7 +136,7 @@ class Beam(BeamBase):
     '''
     state = super(Beam,self).current_state()
 
-    state.update({ 'deflected_enpoints'        : self.deflected_enpoints,
+    state.update({ 'deflected_endpoints'       : self.deflected_endpoints,
                   'deflection'                : self.deflection,
                   'previous_write_endpoints'  : self.previous_write_endpoints,
                   'endpoint_names'            : self.endpoint_names })
@@ -206,11 +214,99 @@ class Beam(BeamBase):
       return EndPoints(i=helpers.sum_vectors(self.endpoints.i,self.deflection.i),
        j=helpers.sum_vectors(self.endpoints.j,self.deflection.j))
 
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+Struct-of-Arrays Beam Store
+'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+class BeamTable(object):
+  '''
+  Keeps the numbers of every beam of the structure in contiguous arrays, so
+  that questions about the whole structure are answered with numpy instead of
+  by visiting every Beam. Each beam gets a dense integer id when it is added,
+  which indexes every column. Ids are not reused, beams that are removed are
+  only marked as no longer alive.
+  '''
+  def __init__(self,capacity = 256):
+    super(BeamTable,self).__init__()
+
+    # Ids of the beams {name : id}, and the names of the ids
+    self.ids = {}
+    self.names = []
+
+    # The columns, of which the first self.count rows are used. Endpoints and
+    # deflections are (i,j) pairs of (x,y,z), and written holds the deflected
+    # endpoints last written to the trajectory (NaN if they never were)
+    self.count = 0
+    self.endpoints = np.zeros((capacity,2,3))
+    self.deflections = np.zeros((capacity,2,3))
+    self.written = np.zeros((capacity,2,3))
+    self.moments = np.zeros(capacity)
+    self.weights = np.zeros(capacity)
+    self.joints = np.zeros(capacity,dtype=np.int64)
+    self.alive = np.zeros(capacity,dtype=bool)
+
+  def __grow(self):
+    '''
+    Doubles the capacity of the columns
+    '''
+    for column in ('endpoints','deflections','written','moments','weights',
+      'joints','alive'):
+      old = getattr(self,column)
+      new = np.zeros((2 * len(old),) + old.shape[1:],dtype=old.dtype)
+      new[:len(old)] = old
+      setattr(self,column,new)
+
+  def add(self,name,endpoints,weight):
+    '''
+    Adds the beam and returns its id
+    '''
+    if self.count == len(self.alive):
+      self.__grow()
+    beam_id = self.count
+    self.count += 1
+    self.ids[name] = beam_id
+    self.names.append(name)
+    self.endpoints[beam_id] = endpoints
+    self.written[beam_id] = np.nan
+    self.weights[beam_id] = weight
+    self.alive[beam_id] = True
+    return beam_id
+
+  def remove(self,name):
+    self.alive[self.ids[name]] = False
+
+  def lookup(self,names):
+    '''
+    Returns the ids of the named beams, as an array
+    '''
+    return np.array([self.ids[name] for name in names],dtype=np.int64)
+
+  def live(self):
+    '''
+    Returns the ids of the beams in the structure
+    '''
+    return np.flatnonzero(self.alive[:self.count])
+
+  def height(self):
+    '''
+    Returns the height of the highest endpoint in the structure (0 if empty)
+    '''
+    ids = self.live()
+    return float(self.endpoints[ids,:,2].max()) if len(ids) > 0 else 0
+
+  def near(self,ids,location,radius):
+    '''
+    Returns which of the beams (by id) have an endpoint within the radius of
+    the location
+    '''
+    d = self.endpoints[ids] - np.asarray(location,dtype=np.float64)
+    distances = np.sqrt(d[:,:,0]**2 + d[:,:,1]**2 + d[:,:,2]**2)
+    return (distances <= radius).any(axis=1)
+
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 Python Structure Object
 '''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
 class Structure(object):
-  def __init__(self, visualization):
+  def __init__(self, visualization, trajectory = None):
 
     super(Structure,self).__init__()
 
@@ -226,9 +322,18 @@ class Structure(object):
     # size of the entire structure
     self.size = WORLD['properties']['dim_x'], WORLD['properties']['dim_y'], WORLD['properties']['dim_z']
 
-    # Storage of information
-    self.model =  ([[[{} for k in range(WORLD['properties']['num_z'])] for j in 
-      range(WORLD['properties']['num_y'])] for i in range(WORLD['properties']['num_x'])])
+    # Storage of information. This is a sparse spatial hash keyed by the 
+    # (xi,yi,zi) indeces of a box, so only boxes that contain part of a beam are
+    # ever stored. Memory and full-structure iteration therefore scale with the 
+    # size of the structure, not the size of the world.
+    self.model = {}
+
+    # Primary index of the beams in the structure, {name : beam}, along with 
+    # the indeces of all the boxes each beam is stored in, {name : set(indeces)}.
+    # These are kept consistent with self.model by add_beam and remove_beam
+    # so that any lookup by name is constant time.
+    self.beams = {}
+    self.cells = {}
 
     # Keeps track of how many tubes we have in the structure
     self.tubes = 0
@@ -236,17 +341,15 @@ class Structure(object):
     # Keeps track of whether the decesion to start it has occured
     self.started = False
 
-    # Maximum height of the strucutre
-    self.height = 0
+    # The numbers of the beams, by integer id
+    self.table = BeamTable()
 
     # Whether or not we should display the structure
     self.visualization = visualization
 
-    # Keeps track of the visualization data
-    self.visualization_data = ''
-
-    # Keeps track of the colors of each beam based on its current max_moment
-    self.color_data = ''
+    # Records the beams and their colors for the visualization (see
+    # Helpers/trajectory.py), if there is a TrajectoryWriter
+    self.trajectory = trajectory
 
     # Stores information on the beams' max moments
     self.structure_data = []
@@ -262,118 +365,69 @@ class Structure(object):
     '''
     Returns the indeces of the box containing the specified point 
     '''
-    def get_index(coord,axis):
+    def get_index(coord,axis,num):
       '''
-      Returns index associated with the coord.
+      Returns index associated with the coord. Coordinates within epsilon of 
+      the boundaries of the world belong to the boxes on that boundary.
       '''
-      return int(math.floor(coord / axis))
+      index = int(math.floor(coord / axis))
+      if index < 0 and helpers.compare(coord,0):
+        return 0
+      elif index >= num and helpers.compare(coord,num * axis):
+        return num - 1
+      else:
+        return index
 
     x,y,z = point
 
     dim_x, dim_y, dim_z = self.box_size
-    xi, yi, zi = get_index(x,dim_x), get_index(y,dim_y), get_index(z,dim_z)
+    num_x, num_y, num_z = self.num
+    xi, yi, zi = (get_index(x,dim_x,num_x), get_index(y,dim_y,num_y), 
+      get_index(z,dim_z,num_z))
     return xi, yi, zi
 
-  def __path(self,coord1, coord2):
+  def __valid_indeces(self,indeces):
     '''
-    Traverses the line formed between coord1 and coord2. Returns a list of 
-    points on the line that lie in different boxes. This will NOT miss any 
-    points that are in different boxes. The basic method is to find the 
-    intersection of the line with one of the faces of the cube formed by the 
-    box. There should not be multiple points, but this has not been proven. It 
-    might return two points that are in the same box.
+    Returns whether or not the indeces refer to a box inside the world
     '''
-    def get_sign(n):
-      '''
-      Returns the sign of the number
-      '''
-      if n == 0:
-        return None
-      else:
-        return n > 0
+    return all(0 <= index < num for index, num in zip(indeces,self.num))
 
-    # move from coord1 to coord2. Here, we determine the sign of the change 
-    # (pos = True, neg = False, or None)
-    signs = (get_sign(coord2[0] - coord1[0]), get_sign(coord2[1] - coord1[1]),
-      get_sign(coord2[2] - coord1[2]))
+  def __path(self,coord1, coord2):
+    '''
+    Traverses the line formed between coord1 and coord2 (a 3D-DDA, as in 
+    Amanatides and Woo). Returns the ordered list of the indeces of every box 
+    the line passes through, starting with the box containing coord1 and ending
+    with the box containing coord2. Each box appears exactly once.
+    '''
+    start, end = self.__get_indeces(coord1), self.__get_indeces(coord2)
     line = helpers.make_vector(coord1,coord2)
 
-    def crawl(point):
-      # get the current box boundaries (bottom left corner-(0,0,0) is starting)
-      # and coordinates
-      xi, yi, zi = self.__get_indeces(point)
-      bounds = xi*self.box_size[0], yi*self.box_size[1], zi*self.box_size[2]
-
-      # This is defined here to have access to the above signs and bounds
-      def closest(p):
-        '''
-        Returns which coordinate in p is closest to the boundary of a box 
-        (x = 0, y = 1, z = 2) if moving along the line, and the absolute change
-        in that coordinate.
-        '''
-        def distance(i):
-          '''
-          i is 0,1,2 for x,y,z
-          '''
-          if signs[i] == None:
-            # This will never be the minimum. Makes later code easier
-            return None
-          elif signs[i]:
-            return abs(p[i] - (bounds[i] + self.box_size[i]))
-          else:
-            return abs(p[i] - bounds[i])
-
-        # Find the shortest time distance (ie, distance/velocity)
-        index = None
-        for i in range(3):
-          dist, vel = distance(i), abs(line[i])
-          if dist is not None and vel != 0:
-            if index is None:
-              index = i
-            else:
-              min_time = distance(index) / abs(line[index])
-              index = i if dist / vel < min_time else index
-
-        return index, distance(index)
-
-      # In crawl, we obtain the coordinate closests to an edge (index), and its 
-      # absolute distance from that edge
-      index, distance = closest(point)
-
-      # The change is the line scaled so that the right coordinate changes the 
-      # amount necessary to cross into the next box. This means that we scale it
-      # and also add a teeny bit so as to push it into the right box. This is 
-      # the scaled version, exactly the distance we need to move
-      move = helpers.scale(distance / abs(line[index]), line)
-      # Here we scale the line again by epsilon/2. This is our push
-      push = helpers.scale(PROGRAM['epsilon'] / 2, line)
-      # The total change is the addition of these two
-      change = helpers.sum_vectors(move,push)
-
-      # make sure we are changing the right amount
-      assert helpers.compare(abs(move[index]), distance)
-
-      # The new initial coordinate in the next box
-      new_point = helpers.sum_vectors(point,change)
-
-      return new_point
-
-    points, passed,temp = [coord2], False, coord1
-    while not passed:
-      points.append(temp)
-      temp = crawl(temp)
-
-      # Check the next coordinate to see if we have moved past the endpoint
-      for i in range(3):
-        if signs[i] != None:
-          # Movings positively, so set to True if our new_point has a larger 
-          # positive coordinate
-          # Moving negatively, so set to True if our new_point has a smaller 
-          # positive coordinate
-          passed = (temp[i] > coord2[i] + PROGRAM['epsilon'] / 2 if signs[i] 
-            else temp[i] < coord2[i] - PROGRAM['epsilon'] / 2)
-
-    return points
+    # For each axis, the direction we step in, the parameter t (0 at coord1 and
+    # 1 at coord2) at which the line crosses into the next box, and how much t
+    # changes when crossing an entire box
+    step, t_max, t_delta = [0,0,0], [None,None,None], [None,None,None]
+    for i in range(3):
+      if start[i] != end[i]:
+        step[i] = 1 if line[i] > 0 else -1
+        boundary = (start[i] + (step[i] > 0)) * self.box_size[i]
+        t_max[i] = (boundary - coord1[i]) / line[i]
+        t_delta[i] = self.box_size[i] / abs(line[i])
+
+    # Cross the closest face among the axes that still need to move. If the 
+    # line passes exactly through an edge or corner, the axes that tie are 
+    # crossed together, since the line never enters the boxes in between
+    current = list(start)
+    indeces = [start]
+    while tuple(current) != end:
+      moving = [i for i in range(3) if current[i] != end[i]]
+      t = min(t_max[i] for i in moving)
+      for i in moving:
+        if t_max[i] == t:
+          current[i] += step[i]
+          t_max[i] += t_delta[i]
+      indeces.append(tuple(current))
+
+    return indeces
 
   def load_model(self,program):
     '''
@@ -401,15 +455,9 @@ class Structure(object):
 
   def find_beam(self,beam):
     '''
-    Cycles through the structure, looking for the beam specified by name
+    Returns the beam specified by name, or None if it is not in the structure
     '''
-    for wall in self.model:
-      for column in wall:
-        for cell in column:
-          if beam in cell:
-            return cell[beam]
-
-    return None
+    return self.beams.get(beam)
 
   def get_endpoints(self,beam_name,location,deflected=False):
     '''
@@ -425,21 +473,11 @@ class Structure(object):
 
   def get_beam(self,beam_name,location):
     '''
-    Returns the beam object with the specified name. Uses location to quickly
-    find the box that contains it. If it is not found in that box, None is 
-    returned. This doesn't mean the beam doesn't exists, just that the location
-    specified a box which does not contain the beam\
+    Returns the beam object with the specified name, or None if no such beam 
+    exists. The location is no longer needed since beams are indexed by name, 
+    but it is kept for compatibility with existing callers.
     '''
-    box = self.get_box(location)
-
-    for name,beam in box.items():
-      if beam_name == name:
-        return beam
-
-    if self.find_beam(beam_name) is not None:
-      return self.find_beam(beam_name)
-    else:
-      return None
+    return self.find_beam(beam_name)
 
   def get_box(self,point):
     '''
@@ -447,17 +485,17 @@ class Structure(object):
     containing the named and point coordinates of the objects for which any part
     is contained within the box
     '''
-    xi, yi, zi = self.__get_indeces(point)
-    num_x, num_y, num_z = self.num
+    indeces = self.__get_indeces(point)
 
     # Catch Errors 
-    try:
-      return (self.model[xi][yi][zi])
-    except IndexError:
+    if not self.__valid_indeces(indeces):
       print ("The coordinate, {}, is not in the structure and should never have\
         been. Please check the add function in structure.py".format(point))
       return None
 
+    # Empty boxes are not stored, so return a new (empty) one for those
+    return self.model.get(indeces,{})
+
   def get_boxes(self,location,radius=BEAM['length']):
     '''
     Returns all of the boxes that are within the sphere specified by location
@@ -475,11 +513,10 @@ class Structure(object):
     for i in range(-x,x+1):
       for j in range(-y,y+1):
         for k in range(0,z+1):
-          ix,iy,iz = xi+i,yi+j,zi+k
-          try:
-            boxes.append(self.model[ix][iy][iz])
-          except IndexError:
-            pass
+          # Only occupied boxes are stored, so the rest are skipped
+          box = self.model.get((xi+i,yi+j,zi+k))
+          if box is not None:
+            boxes.append(box)
 
     return boxes
 
@@ -489,61 +526,62 @@ class Structure(object):
     to all of the boxes that contain it. Returns the number of boxes (which 
     should be at least 1)
     '''
-    def addbeam(beam,p):
+    def addbeam(beam,indeces):
       '''
-      Function to add an arbitrary beam to its respective box. Returns number of
-      boxes changed. Also takes care of finding intersecting beams to the added
-      beam and adding the joints to both beams. Uses the point p (which should 
-      be on the beam), to calculate the box it should be added to
+      Function to add an arbitrary beam to the box with the specified indeces. 
+      Returns number of boxes changed. The beams already in the box are 
+      collected into candidates, so that the joints can be found afterwards.
       '''
-      # Getting indeces
-      xi,yi,zi = self.__get_indeces(p)
-
       # Getting the box and all of the other beams in the box
-      try:
-        box = self.model[xi][yi][zi]
-      except IndexError:
+      if not self.__valid_indeces(indeces):
         print ("Addbeam is incorrect. Accessing box not defined.")
         return False
-
-      # Finding intersection points with other beams
+      box = self.model.setdefault(indeces,{})
       for key in box:
-        point = helpers.intersection(box[key].endpoints, beam.endpoints)
+        if key != beam.name:
+          candidates.setdefault(key,box[key])
+
+      # Adding beam to boxes that contain it based on the point p.
+      if beam.name in box:
+        return 0
+      else:
+        box[beam.name] = beam
+        self.cells[beam.name].add(indeces)
+        return 1
+
+    def addjoints(beam):
+      '''
+      Finds the intersection points of the beam with all of the candidates in a
+      single batched pass, and adds the joints to both beams.
+      '''
+      others = list(candidates.values())
+      points = vectorized.intersections([other.endpoints for other in others],
+        beam.endpoints)
+      for other, point in zip(others,points):
         # If they intersect, add the joint to both beams
-        if point != None:
-          assert key == box[key].name
-          if not beam.addjoint(point, box[key]):
+        if point is not None:
+          if not beam.addjoint(point, other):
             sys.exit("Could not add joint to {} at {}".format(beam.name,
               str(point)))
-          if not box[key].addjoint(point, beam):
-            sys.exit("Could not add joint to {} at {}".format(box[key].name,
+          if not other.addjoint(point, beam):
+            sys.exit("Could not add joint to {} at {}".format(other.name,
               str(point)))
+          self.table.joints[self.table.ids[other.name]] = len(other.joints)
+      self.table.joints[self.table.ids[beam.name]] = len(beam.joints)
 
-      # update the box
-      self.model[xi][yi][zi] = box
-
-      # Adding beam to boxes that contain it based on the point p.
-      try:
-        if beam.name in self.model[xi][yi][zi]:
-          return 0
-        else:
-          self.model[xi][yi][zi][beam.name] = beam
-          return 1
-      except IndexError:
-        raise OutofBox ("The coordinate {}, is not in the structure. Something\
-          went wront in addpoint()".format(p))
-
-    # Create the beam
+    # Create the beam and index it by name
     new_beam = Beam(name,(p1,p2),(p1_name,p2_name))
+    self.beams[name] = new_beam
+    self.cells[name] = set()
+    self.table.add(name,(p1,p2),new_beam.weight)
 
-    # Add to all boxes it is located in
+    # Add to all boxes it is located in, keeping track of the (unique) beams 
+    # that share a box with it
+    candidates = {}
     total_boxes = 0
-    try:
-      for point in self.__path(p1, p2):
-        total_boxes += addbeam(new_beam,point)
-    except OutofBox as e:
-      print (e)
-      return False
+    for indeces in self.__path(p1, p2):
+      total_boxes += addbeam(new_beam,indeces)
+    addjoints(new_beam)
 
     # If something went wrong, kill the program
     assert total_boxes > 0
@@ -554,23 +592,22 @@ class Structure(object):
         radius=MATERIAL['outside_diameter'])
       temp.color = (0,1,1)
 
-    # Safe visualization data
-    self.visualization_data += "{}:{}-{}<>".format(str(new_beam.name),str(
-      helpers.round_tuple(p1,3)),str(helpers.round_tuple(p2,3)))
+    # Save visualization data
+    if self.trajectory is not None:
+      self.trajectory.beams([new_beam.name],[p1],[p2])
 
-    # Add a beam to the structure count and increase height if necessary
+    # Add a beam to the structure count
     self.tubes += 1
-    self.height = max(p1[2],p2[2],self.height)
 
     return total_boxes
 
   def remove_beam(self,name,point=None):
     '''
     This function removes the beam element referred to by the specified name 
-    from all the boxes that contained it. If a point contained by the element is
-    given, then it makes the removal faster. Otherwise, the entire structure is
-    searched for the name, and all references removed. Returns true if the 
-    removal is successfull, false otherwise (ie, cannot find the element) 
+    from all the boxes that contained it. The point is no longer needed since
+    the boxes containing each beam are indexed by name, but it is kept for 
+    compatibility with existing callers. Returns true if the removal is 
+    successfull, false otherwise (ie, cannot find the element) 
     Furthermore, it removes itself from all of the beams with which it 
     previously intersected.
     '''
@@ -579,46 +616,27 @@ class Structure(object):
         for other_beam in beam.joints[coord]:
           if not other_beam.removejoint(coord,beam):
             return False
+          self.table.joints[self.table.ids[other_beam.name]] = len(
+            other_beam.joints)
       return True
 
+    # The beam isn't in the structure
+    beam = self.beams.pop(name,None)
+    if beam is None:
+      return False
 
-    # no point given, so cycle through entire structure
-    deleted = False
-    if point == None:
-      for wall in self.model:
-        for column in wall:
-          for box in column:
-            if name in box:
-              value = remove_joints(box[name])
-              del box[name]
-              deleted = value
-      self.tubes -= 1
-      return value
-
-    # point is given, so no need to cycle. Just find endpoints.
-    else:
-      xi, yi, zi = self.__get_indeces(point)
-      # found the beam, now get endpoints to find rest of it
-      if name in self.model[xi][yi][zi]:
-        beam = self.model[xi][yi][zi][name]
-        p1,p2 = beam.endpoints
-
-        # find the boxes it crosses
-        for p in self.__path(p1,p2):
-          x,y,z = self.__get_indeces(p)
-
-          # check for the beam being in the box, otherwise raise an error
-          if name in self.model[x][y][z]:
-            del self.model[x][y][z][name]
-            deleted = True
-        self.tubes -= 1
-        return remove_joints(beam)
-
-      # the beam isn't located in the specified box
-      else: 
-        print ("The beam was not found with the specified point. Attempting to\
-          remove it anyway.")
-        return remove_beam(name)
+    # Remove it from every box it was stored in
+    for indeces in self.cells.pop(name):
+      box = self.model[indeces]
+      del box[name]
+
+      # Keep the storage sparse
+      if box == {}:
+        del self.model[indeces]
+
+    self.table.remove(name)
+    self.tubes -= 1
+    return remove_joints(beam)
 
   def available(self,e1,e2):
     '''
@@ -667,142 +685,128 @@ class Structure(object):
     Returns whether or not the beam defined by the endpoints e1 -> e2 exists
     '''
     # Let's get the box
-    xi, yi, zi = self.__get_indeces(e1)
+    box = self.model.get(self.__get_indeces(e1),{})
 
     # Cycle through the box and compare endpoints
-    for name in self.model[xi][yi][zi]:
-      beam = self.model[xi][yi][zi][name]
+    for name, beam in box.items():
       if ((helpers.compare_tuple(beam.endpoints.i,e1,0.5) and helpers.compare_tuple(
         beam.endpoints.j,e2,0.5)) or (helpers.compare_tuple(beam.endpoints.i,e2,0.5) and
         helpers.compare_tuple(beam.endpoints.j,e1,0.5))):
         return True
     return False
 
+  @property
+  def height(self):
+    '''
+    Maximum height of the structure
+    '''
+    return self.table.height()
+
+  def density(self,location,radius=BEAM['length']):
+    '''
+    Returns the number of beams in the boxes around the location (see
+    get_boxes) with an endpoint within the radius of it
+    '''
+    names = set()
+    for box in self.get_boxes(location,radius):
+      names.update(box)
+    return int(np.count_nonzero(self.table.near(self.table.lookup(names),
+      location,radius)))
+
   def get_information(self):
     '''
     Returns the name of each beam along with it's endpoints
     '''
-    beams = {}
-    for wall in self.model:
-      for column in wall:
-        for box in column:
-          for name, beam in box.items():
-            if name not in beams:
-              beams[name] = beam.current_state()
-
-    return beams
+    return {name : beam.current_state() for name, beam in self.beams.items()}
 
   def reset(self):
     # Reset the storage
-    self.model =  ([[[{} for k in range(self.num[0])] for j in 
-      range(self.num[1])] for i in range(self.num[2])])
+    self.model = {}
+    self.beams = {}
+    self.cells = {}
+    self.table = BeamTable()
 
     # Reset the tubes
     self.tubes = 0
 
   def failed(self,program):
     '''
-    Checks the entire SAP2000 structure for any possible structural errors.
+    Checks the entire SAP2000 structure for any possible structural errors. The
+    results for all beams and joints are read at once, and the largest moments
+    and the deflections of all beams are computed together.
     '''
-    def get_max_moment(beam):
-      '''
-      Returns the largest moment along a beam
-      '''
-      results = program.model.Results.FrameForce(beam.name,0)
-      if results[0] != 0:
-        #pdb.set_trace()
-        return 0
+    names = list(self.beams)
+    beams = list(self.beams.values())
+    ids = self.table.lookup(names)
 
-      def total(index):
-        '''
-        Calculates the total moment for a specified index
-        '''
-        m22 = results[13][index]
-        m33 = results[14][index]
-        return math.sqrt(m22**2 + m33**2)
-
-      # Calculate individual moments, and from them choose maximum
-      moments = [total(i) for i in range(results[1])]
-      max_val = max(moments)
-
-      # Store max value along with beam name 
-      if (beam.name,max_val) not in self.structure_data[-1]:
-        self.structure_data[-1].append((beam.name,max_val))
-
-      # Calculate gradiant color and store
-      ratio = round(max_val/PROGRAM['structure_check'],2)
-      color = (ratio,round(max(1-ratio,0),2),0)
-      try:
-        self.color_data += "{}:{}<>".format(beam.name,str(color)) 
-      except MemoryError:
-        pass
-
-      # Return maximum value
-      return max_val
-
-    def update_deflection(beam):
-      '''
-      Updates the deflection of the specified beam
-      '''
-      # Assert that the local axes are still the default
-      results = program.model.FrameObj.GetLocalAxes(beam.name)
-      if not (results[0] == 0 and results[1] == 0 and not results[2]):
-        pdb.set_trace()
-        return (0,0,0)
-
-      # Obtain joint axes - these are, by default, the global axes
-      axis_1,axis_2,axis_3 = beam.global_joint_axes()
-
-      # Placed here for access to local axes
-      def get_deflection(joint_name):
-        '''
-        Returns the correct displacement in absolute coordinates for the named
-        joint
-        '''
-        # Get displacements
-        results = program.model.Results.JointDisplAbs(joint_name,0)
-        if results[0] != 0:
-          #pdb.set_trace()
-          return (0,0,0)
-        u1,u2,u3 = results[7][0], results[8][0], results[9][0]
-
-        # Return the total deflection based on the local axes
-        return helpers.sum_vectors(helpers.scale(u1,axis_1),helpers.sum_vectors(
-          helpers.scale(u2,axis_2),helpers.scale(u3,axis_3)))
-
-      return beam.update_deflection(get_deflection(beam.endpoint_names.i),
-        get_deflection(beam.endpoint_names.j))
-
-    bool_data = False
-    seen = []
-    data = ''
-    for wall in self.model:
-      for column in wall:
-        for cell in column:
-          for name,beam in cell.items():
-            # Only if this is the first time we are collecting data 
-            if name not in seen:
-              moment = get_max_moment(beam)
-              if moment > PROGRAM['structure_check']:
-                data += "Beam {} is structurally unstable with moment {}.\n".format(
-                  name,str(moment))
-                bool_data = True
-
-              # Update deflection of beams :)
-              if update_deflection(beam) and VISUALIZATION['deflection']:
-                # Add the deflection data for the beam if it's changed significantly
-                # since last time we updated it
-                try:
-                  self.visualization_data += "{}:{}-{}<>".format(str(name),str(
-                    helpers.round_tuple(beam.deflected_endpoints.i,3)),str(
-                    helpers.round_tuple(beam.deflected_endpoints.j,3)))
-                except MemoryError:
-                  pdb.set_trace()
-
-                # Update the previous endpoints
-                beam.previous_write_endpoints = beam.deflected_endpoints
-
-              seen.append(name)
+    # Largest moment along each beam (0 for beams without results)
+    forces = program.results.frame_forces()
+    if forces is None:
+      found, maxima = np.zeros(len(names),dtype=bool), np.zeros(len(names))
+    else:
+      positions = forces.positions(names)
+      moments = np.sqrt(forces.values[:,4]**2 + forces.values[:,5]**2)
+      found = positions >= 0
+      maxima = np.append(forces.reduce(np.maximum,moments),0)[positions]
+    self.table.moments[ids] = maxima
+    ratios = maxima / PROGRAM['structure_check']
+    maxima = maxima.tolist()
+
+    # Store max value along with beam name (once)
+    seen = set(self.structure_data[-1])
+    for name, max_val, has_results in zip(names,maxima,found.tolist()):
+      if has_results and (name,max_val) not in seen:
+        seen.add((name,max_val))
+        self.structure_data[-1].append((name,max_val))
+
+    # Calculate the gradient color of the beams with results
+    if self.trajectory is not None:
+      ratios = np.round(ratios[found],2)
+      colors = np.column_stack((ratios,np.round(np.maximum(1 - ratios,0),2),
+        np.zeros(len(ratios))))
+      self.trajectory.beam_colors([name for name, has_results in zip(names,
+        found.tolist()) if has_results],colors)
+
+    # Deflection of the i and j endpoints of every beam (none for joints
+    # without results). The joint axes are the global axes, and the local axes
+    # of the frames are never changed from the default.
+    displacements = program.results.joint_displacements()
+    deflections = np.zeros((len(beams),2,3))
+    if displacements is not None and beams != []:
+      positions = displacements.positions([joint for beam in beams for joint in
+        beam.endpoint_names])
+      deflections = np.vstack((displacements.first()[:,:3],np.zeros((1,3))))[
+        positions].reshape((len(beams),2,3))
+    self.table.deflections[ids] = deflections
+    deflected = self.table.endpoints[ids] + deflections
+
+    # The beams whose moment is too large
+    unstable = np.flatnonzero(self.table.moments[ids] > 
+      PROGRAM['structure_check']).tolist()
+    bool_data = unstable != []
+    data = ''.join("Beam {} is structurally unstable with moment {}.\n".format(
+      names[k],str(maxima[k])) for k in unstable)
+
+    # The beams which moved noticeably since they were last written out (NaN
+    # never compares, so beams never written out have moved)
+    moved = deflected - self.table.written[ids]
+    moved = np.sqrt(moved[:,:,0]**2 + moved[:,:,1]**2 + moved[:,:,2]**2)
+    changed = ~(moved < VISUALIZATION['step']).all(axis=1)
+
+    # Update the deflection of the Beam objects
+    for beam, (i_val,j_val), (i_end,j_end) in zip(beams,deflections.tolist(),
+      deflected.tolist()):
+      beam.deflection = EndPoints(i=tuple(i_val),j=tuple(j_val))
+      beam.deflected_endpoints = EndPoints(i=tuple(i_end),j=tuple(j_end))
+
+    # Write out the beams that moved, and remember where they were written
+    if VISUALIZATION['deflection'] and changed.any():
+      self.table.written[ids[changed]] = deflected[changed]
+      for k in np.flatnonzero(changed).tolist():
+        beams[k].previous_write_endpoints = beams[k].deflected_endpoints
+      if self.trajectory is not None:
+        self.trajectory.beams([names[k] for k in np.flatnonzero(
+          changed).tolist()],deflected[changed,0],deflected[changed,1])
 
     if not bool_data:
       return bool_data
@@ -6,6 +6,9 @@ from Helpers import helpers
 # import brain module, we need it to add into the robot body when making robots
 from Behaviour import brain_v1 as Brains
 from World import robot as Robot
+from World.loads import LoadManager
+from World.scheduler import AnalysisScheduler
+from World.states import RobotStates
 
 # import construction constants and robot/visualization constants
 from construction import HOME
@@ -49,7 +52,7 @@ class BaseSwarm:
     pass
 
 class SmartSwarm(BaseSwarm):
-  def __init__(self,size, structure, program):
+  def __init__(self,size, structure, program, trajectory = None):
     # The number of robots in the swarm
     self.size = size
 
@@ -67,6 +70,15 @@ class SmartSwarm(BaseSwarm):
     # Access to the program
     self.model = program
 
+    # Keeps track of the loads of the robots, and places them on the structure
+    self.loads = LoadManager(program)
+
+    # Decides when the structure needs to be analyzed for the robots
+    self.scheduler = AnalysisScheduler(program,self.loads)
+
+    # Takes the snapshots of the robots for the logs
+    self.states = RobotStates()
+
     # create repairers
     self.repairers = {}
     for i in range(size):
@@ -76,15 +88,14 @@ class SmartSwarm(BaseSwarm):
       location = helpers.sum_vectors(self.home,(120*i,0,0)) 
       self.repairers[name] = self.create(name,structure,location,program)
 
-    # Keeps track of visualization data
-    self.visualization_data = ''
-
-    # Keeps track of the color each robot should be at each timestep
-    self.color_data = ''
+    # Records the location and color of each robot at each timestep for the
+    # visualization (see Helpers/trajectory.py), if there is a TrajectoryWriter
+    self.trajectory = trajectory
 
   #####################################################
   def create(self,name,structure,location,program):
-    body = Robot.Body(name,structure,location,program)
+    body = Robot.Body(name,structure,location,program,self.loads,
+      self.scheduler)
     BrainBot = Brains.Brain(body)
 
     return BrainBot
@@ -92,25 +103,24 @@ class SmartSwarm(BaseSwarm):
 
   def decide(self):
     # Tell each robot to make the decion
+    locations, colors = [], []
     for repairer in self.repairers:
       self.repairers[repairer].performDecision()
 
       # Add location data for visualization of simulation
       loc = self.repairers[repairer].Body.getGenuineLocation()
-      location = (loc[0], loc[1], 0) if helpers.compare(loc[2],0) else loc
-      self.visualization_data += "{}:{}<>".format(repairer,str(
-        helpers.round_tuple(location,3)))
+      locations.append((loc[0], loc[1], 0) if helpers.compare(loc[2],0) else loc)
 
       # Get color data based on what the robot is doing
       try:
         color = (1,0,1) if not self.repairers[repairer].Body.readFromMemory('repair_mode') else (0,1,0)
       except:
-        color = (0,1,0)\
+        color = (0,1,0)
 
-      self.color_data += "{}:{}<>".format(repairer,str(color))
+      colors.append(color)
 
-    self.visualization_data += "\n"
-    self.color_data += "\n"
+    if self.trajectory is not None:
+      self.trajectory.robots(list(self.repairers),locations,colors)
 
   def act(self):
     # Tell each robot to act
@@ -118,14 +128,17 @@ class SmartSwarm(BaseSwarm):
       self.repairers[repairer].performAction()
 
   def get_information(self):
-    information = {}
-    for name, repairer in self.repairers.items():
-      information[name] = repairer.Body.currentState()
-
-    return information
+    '''
+    Returns a snapshot of the state of every robot (see World/states.py)
+    '''
+    return self.states.snapshot([repairer.Body for repairer in
+      self.repairers.values()])
 
   def get_errors(self):
     data = ''
+    if self.loads.error_data != '':
+      data += "{}\n".format(self.loads.error_data)
+      self.loads.error_data = ''
     for name,repairer in self.repairers.items():
       if repairer.Body.error_data != '':
         data += "{}\n".format(repairer.Body.error_data)
@@ -162,6 +175,8 @@ class SmartSwarm(BaseSwarm):
     Create a spanking new army of repairers the size of the original army!
     '''
     self.repairers = {}
+    self.loads.reset()
+    self.states.reset()
     for i in range(self.original_size):
       name = "SwarmRobot" + str(i)
       location = helpers.sum_vectors(self.home,(i,0,0)) 
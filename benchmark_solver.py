@@ -0,0 +1,128 @@
+'''
+Compares the time taken by the frame solver in SAP2000/stiffness.py to solve
+a lattice tower when using a dense solve of the full stiffness matrix and when
+using the sparse banded solver (reverse Cuthill-McKee + BandedCholesky). Then
+times building towers one beam at a time, analyzing after every beam, with
+and without updating the factorization. Run with "python benchmark_solver.py".
+'''
+import time
+
+import numpy as np
+
+from SAP2000 import stiffness
+from SAP2000.banded import BandedCholesky, bandwidth
+from SAP2000.stiffness import FrameModel, pipe_section, STEEL
+from variables import BEAM, MATERIAL
+
+# Number of beams in each of the towers solved
+sizes = [100, 500, 1000, 2000, 5000, 10000, 20000]
+
+# The dense solve is skipped above this number of degrees of freedom
+dense_limit = 8000
+
+# Number of beams in the towers built one beam at a time
+growth_sizes = [500, 1000, 2000, 5000]
+
+# Building with a full factorization after every beam is skipped above this 
+# number of beams
+refactor_limit = 2000
+
+# Footprint of the tower (in joints along x and y) and spacing of the joints
+grid = 3
+spacing = BEAM['length']
+
+def tower(beams,analyze = False):
+  '''
+  Returns a FrameModel of a tower with at least the given number of beams.
+  Every storey has a column at each joint of the grid, beams along x and y and
+  one diagonal in each cell. If analyze is True, the model is analyzed (with
+  a load on the new beam) after every beam is added.
+  '''
+  section = pipe_section(MATERIAL['outside_diameter'],
+    MATERIAL['wall_thickness'])
+  model = FrameModel()
+  name = lambda x,y,z: "{}_{}_{}".format(x,y,z)
+  for x in range(grid):
+    for y in range(grid):
+      model.add_joint(name(x,y,0),(x * spacing,y * spacing,0))
+      model.set_restraint(name(x,y,0),[True] * 6)
+
+  count, z = 0, 0
+  while count < beams:
+    z += 1
+    for x in range(grid):
+      for y in range(grid):
+        model.add_joint(name(x,y,z),(x * spacing,y * spacing,z * spacing))
+        frames = [(name(x,y,z - 1),name(x,y,z))]
+        if x > 0:
+          frames.append((name(x - 1,y,z),name(x,y,z)))
+        if y > 0:
+          frames.append((name(x,y - 1,z),name(x,y,z)))
+        if x > 0 and y > 0:
+          frames.append((name(x - 1,y - 1,z - 1),name(x,y,z)))
+        for i, j in frames:
+          count += 1
+          model.add_frame(str(count),i,j,section,STEEL)
+          if analyze:
+            load = (spacing / 2,np.array([0.,0.,-1.]))
+            model.analyze({str(count) : [load]},1,{})
+
+  return model
+
+def reduced_system(model):
+  '''
+  Returns the stiffness matrix (in COO form) and load vector restricted to the
+  free degrees of freedom, in the order chosen by the solver
+  '''
+  loads = {name : [(model.length(name) / 2,np.array([1.,0.5,-1.]))]
+    for name in model.frames}
+  elements, slices, rows, cols, values, P = model.assemble(loads,1)
+  free = model.free(elements)
+  index = np.full(len(P),-1)
+  index[free] = np.arange(len(free))
+  keep = (index[rows] >= 0) & (index[cols] >= 0)
+  return len(free), index[rows[keep]], index[cols[keep]], values[keep], P[free]
+
+print("{:>7} {:>7} {:>7} {:>6} {:>10} {:>10} {:>10} {:>10}".format("beams",
+  "joints","dofs","band","assemble","dense","banded","error"))
+for size in sizes:
+  model = tower(size)
+
+  start = time.time()
+  n, rows, cols, values, P = reduced_system(model)
+  assemble = time.time() - start
+
+  start = time.time()
+  x = BandedCholesky(n,rows,cols,values).solve(P)
+  banded = time.time() - start
+
+  if n <= dense_limit:
+    start = time.time()
+    K = np.zeros((n,n))
+    np.add.at(K,(rows,cols),values)
+    expected = np.linalg.solve(K,P)
+    dense = time.time() - start
+    error = np.abs(x - expected).max() / np.abs(expected).max()
+    dense, error = "{:.3f}s".format(dense), "{:.1e}".format(error)
+  else:
+    dense, error = "-", "-"
+
+  print("{:>7} {:>7} {:>7} {:>6} {:>9.3f}s {:>10} {:>9.3f}s {:>10}".format(
+    len(model.frames),len(model.joints),n,bandwidth(rows,cols),assemble,dense,
+    banded,error))
+
+print()
+print("{:>7} {:>12} {:>12}".format("beams","updated","refactored"))
+update = stiffness.MAX_UPDATE
+for size in growth_sizes:
+  times = []
+  for max_update in (update,0):
+    if max_update == 0 and size > refactor_limit:
+      times.append("-")
+      continue
+    stiffness.MAX_UPDATE = max_update
+    start = time.time()
+    tower(size,True)
+    times.append("{:.2f}s".format(time.time() - start))
+  print("{:>7} {:>12} {:>12}".format(size,*times))
+stiffness.MAX_UPDATE = update
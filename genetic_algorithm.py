@@ -1,110 +1,215 @@
+'''
+Tunes the rules of the swarm (the parameters in Behaviour/constants.py) with a
+genetic algorithm. Each genome holds one value per gene in GENES. Its fitness
+is the average score (see scorer.py) of the towers built by full simulations
+run with those parameters, one per seed. Simulations are run in parallel over
+a pool of worker processes (see run_batch.py), and the fitness of every genome
+is remembered, so genomes that survive or reappear are never simulated again.
+
+Scoring needs SAP2000 (see scorer.py). A genome whose simulations or scores
+fail is reported and left out of the population, rather than given a fitness
+of 0, and the algorithm stops if none of the genomes it evaluates succeed.
+'''
 from random import *
 from math import *
-from time import sleep
-import sys
-import subprocess
-
-# genome encoding: [x, y]
-
-def create_base():
-	return random()*10 - 5
-
-def initialize_population(size):
-	population = []
-	for individual in range(size):
-		x = create_base()
-		y = create_base()
-		population.append([x, y])
-	return population
-
-def display(population):
-	global mutation_rate
-	print('Mutation Rate: ' + str(mutation_rate) + '\n')
-	for rank in range(POP_SIZE):
-		print('{:2d})\t({: 5.3f}, {: 5.3f})\tCost: {: 6.4f}'.format(\
-			rank+1, population[rank][0], population[rank][1], cost(population[rank])))
-
-def get_coordinates(genome):
-	return genome[0], genome[1]
-
-def cost(genome):
-	# minimize Rastrigin Function
-	x, y = get_coordinates(genome)
-	cost = 20 + x**2 - 10*cos(2*pi*x) + y**2 - 10*cos(2*pi*y)
-	return cost
-
-def rank(population):
-	population.sort(key = cost) #sort coordinates by f(x,y) = cost from min to max
-
-def breed(population):
-	new_population = []
-	# elitism for top 10%
-	for elite in range(POP_SIZE//10):
-		new_population.append(population[elite])
-	#population_spread = cost(population[POP_SIZE]) - cost(population[0])
-	for elite_parent_index in range(POP_SIZE//10):
-		for num_children in range(1,10):
-			baby = cross(population[elite_parent_index], population[elite_parent_index+num_children])
-			new_population.append(baby)
-
-	return new_population
-
-def cross(genome_1, genome_2):
-	cross_point = randint(0,GENOME_LENGTH)
-	new_genome = genome_1[0:cross_point] + genome_2[cross_point:]
-	new_genome = mutate(new_genome)
-	return new_genome
-
-def mutate(genome):
-	global convergence
-	global mutation_rate
-	# ~80% mutation rate at threshold, ~20% baseline, see plot in Mathematica
-	mutation_rate = sigmoid(convergence[1]-CONVERGENCE_THRESHOLD)**(1/3)
-	for base_num in range(len(genome)):
-		coin_flip = random()
-		if coin_flip <= mutation_rate: genome[base_num] = create_base()
-	return genome
+from concurrent.futures import ProcessPoolExecutor
+import traceback
+
+import run_batch
+
+# genome encoding: one value per gene, (setting, minimum, maximum, integer)
+GENES = [
+	('Behaviour.constants.prob.random_beam', 0, 1, False),
+	('Behaviour.constants.prob.tripod', 0, 1, False),
+	('Behaviour.constants.prob.ground_beam', 0, 1, False),
+	('Behaviour.constants.prob.add_base', 0, 1, False),
+	('Behaviour.constants.prob.steep_climb', 0, 1, False),
+	('Behaviour.constants.beam.ground_angle', 45, 90, False),
+	('Behaviour.constants.beam.beam_angle', 0, 90, False),
+	('Behaviour.constants.beam.max_beam_density', 1, 10, True)]
+
+def create_base(gene):
+	_, minimum, maximum, integer = GENES[gene]
+	if integer:
+		return randint(minimum, maximum)
+	return uniform(minimum, maximum)
+
+def overrides(genome):
+	'''
+	Returns the settings encoded by the genome (see run_batch.override)
+	'''
+	return {gene[0] : value for gene, value in zip(GENES, genome)}
+
+def simulate(settings, seed, robots, timesteps, run):
+	'''
+	Runs one simulation with the settings and returns the score of the tower it
+	built. The run number must be unique, since it names the folder of the run.
+	Raises an error if the simulation could not be run or scored. Runs in a
+	worker process.
+	'''
+	configuration = run_batch.grid([seed], [robots], [settings], timesteps)[0]
+	configuration['run'] = run
+	row = run_batch.run(configuration)
+	if row['folder'] is None:
+		raise RuntimeError("Run {} could not be started: {}".format(run,
+			row['failure']))
+
+	# Imported here since it starts its own copy of SAP2000
+	from scorer import scorer
+	return scorer(row['folder'])
+
+class GeneticAlgorithm(object):
+	def __init__(self, seeds, robots = 5, timesteps = 1000, workers = None):
+		super(GeneticAlgorithm, self).__init__()
+
+		# The simulations run to evaluate every genome
+		self.seeds = seeds
+		self.robots = robots
+		self.timesteps = timesteps
+		self.pool = ProcessPoolExecutor(max_workers = workers)
+
+		# Fitness of every genome evaluated so far, {tuple(genome) : fitness}, and
+		# the number of simulations submitted so far (which numbers the runs)
+		self.fitnesses = {}
+		self.runs = 0
+
+		# [fitness, num_generations], if num_generations is high, local/global
+		# max has been reached
+		self.convergence = [0, 0]
+		self.mutation_rate = 0
+
+	def initialize_population(self, size):
+		return [[create_base(gene) for gene in range(GENOME_LENGTH)]
+			for individual in range(size)]
+
+	def submit(self, genome, seed):
+		self.runs += 1
+		return self.pool.submit(simulate, overrides(genome), seed, self.robots,
+			self.timesteps, self.runs)
+
+	def evaluate(self, population):
+		'''
+		Computes the fitness of the genomes of the population that have not been
+		seen before, running all of their simulations at the same time. Genomes
+		whose simulations fail are reported and not given a fitness. Raises the
+		last error if none of the genomes could be evaluated.
+		'''
+		genomes = list(set(tuple(genome) for genome in population) -
+			set(self.fitnesses))
+		futures = {genome : [self.submit(genome, seed) for seed in self.seeds]
+			for genome in genomes}
+		error = None
+		for genome, scores in futures.items():
+			try:
+				scores = [future.result() for future in scores]
+			except Exception as e:
+				print("Could not evaluate {}:".format(overrides(genome)))
+				traceback.print_exception(type(e), e, e.__traceback__)
+				error = e
+				continue
+			self.fitnesses[genome] = sum(scores) / len(scores)
+
+		if error is not None and not any(genome in self.fitnesses
+			for genome in genomes):
+			raise RuntimeError("None of the genomes could be evaluated") from error
+
+	def fitness(self, genome):
+		return self.fitnesses[tuple(genome)]
+
+	def rank(self, population):
+		# drop the genomes that could not be evaluated, and sort the others by
+		# fitness from max to min
+		self.evaluate(population)
+		population[:] = [genome for genome in population
+			if tuple(genome) in self.fitnesses]
+		population.sort(key = self.fitness, reverse = True)
+
+	def display(self, population):
+		print('Mutation Rate: ' + str(self.mutation_rate) + '\n')
+		for rank in range(len(population)):
+			print('{:2d})\t{}\tFitness: {: 6.4f}'.format(rank+1, ', '.join(
+				'{: 5.3f}'.format(base) for base in population[rank]),
+				self.fitness(population[rank])))
+
+	def breed(self, population):
+		new_population = []
+		# elitism for top 10%
+		elites = max(1, len(population)//10)
+		for elite in range(elites):
+			new_population.append(population[elite])
+		for elite_parent_index in range(elites):
+			for num_children in range(1,10):
+				baby = self.cross(population[elite_parent_index],
+					population[(elite_parent_index+num_children) % len(population)])
+				new_population.append(baby)
+
+		# replace the genomes that could not be evaluated with new ones
+		return new_population + self.initialize_population(POP_SIZE -
+			len(new_population))
+
+	def cross(self, genome_1, genome_2):
+		cross_point = randint(0,GENOME_LENGTH)
+		new_genome = genome_1[0:cross_point] + genome_2[cross_point:]
+		new_genome = self.mutate(new_genome)
+		return new_genome
+
+	def mutate(self, genome):
+		# ~80% mutation rate at threshold, ~20% baseline, see plot in Mathematica
+		self.mutation_rate = sigmoid(self.convergence[1]-CONVERGENCE_THRESHOLD)**(1/3)
+		for base_num in range(len(genome)):
+			coin_flip = random()
+			if coin_flip <= self.mutation_rate: genome[base_num] = create_base(base_num)
+		return genome
+
+	def update_convergence(self, fitness):
+		if abs(self.convergence[0] - fitness) <= CHANGE_IN_FITNESS_THRESHOLD:
+			self.convergence[1] += 1
+		else:
+			self.convergence[1] = 0; self.convergence[0] = fitness
+
+	def run(self, generations):
+		'''
+		Evolves a random population for the given number of generations and
+		returns the final population, fittest first
+		'''
+		population = self.initialize_population(POP_SIZE)
+		self.rank(population)
+		self.convergence = [self.fitness(population[0]), 0]
+		self.mutation_rate = 0
+		print('GENERATION 0:\n')
+		self.display(population)
+
+		for generation in range(generations):
+			population = self.breed(population)
+			self.rank(population)
+			self.update_convergence(self.fitness(population[0]))
+			print('\nGENERATION '+str(generation+1) + ':\n')
+			self.display(population)
+
+		print('\nNatural Selection picks ' + str(overrides(population[0])) +
+			' as most fit with fitness ' + str(self.fitness(population[0]))+'\n')
+		return population
 
 def sigmoid(x):
 	return 1/(1+e**(-x))
 
-def update_convergence(cost, generation):
-	global convergence
-	if abs(convergence[0] - cost) <= CHANGE_IN_COST_THRESHOLD: convergence[1] += 1
-	else: convergence[1] = 0; convergence[0] = cost
-
 # CONSTANTS
-GENOME_LENGTH = 2
+GENOME_LENGTH = len(GENES)
 POP_SIZE = 100 # divisible by 10
 GENERATIONS = 20
-CHANGE_IN_COST_THRESHOLD = 0.1
+CHANGE_IN_FITNESS_THRESHOLD = 0.01
 CONVERGENCE_THRESHOLD = 5
 
-def main():	
-
-	theproc = subprocess.Popen([sys.executable, "run_test.py"])
-	theproc.communicate()
+# Simulations run for every genome
+SEEDS = ["r@nd0M{}".format(i) for i in range(3)]
+ROBOTS = 5
+TIMESTEPS = 1000
 
+def main():
+	algorithm = GeneticAlgorithm(SEEDS, ROBOTS, TIMESTEPS)
+	try:
+		algorithm.run(GENERATIONS)
+	finally:
+		algorithm.pool.shutdown()
 
-	global convergence
-	global mutation_rate
-	convergence = [] #[cost, num_generations], if num_generations is high, local/global min has been reached
-	'''
-	population = initialize_population(POP_SIZE)
-	rank(population)
-	convergence = [cost(population[0]), 0]
-	mutation_rate = 0
-	print('GENERATION 0:\n')
-	display(population)
-
-	for generation in range(GENERATIONS):
-		if generation%100 == 0: sleep(1)
-		population = breed(population)
-		rank(population)
-		update_convergence(cost(population[0]), generation)
-		print('\nGENERATION '+str(generation+1) + ':\n')
-		display(population)
-
-	print('\nNatural Selection picks ' + str(population[0]) + ' as most fit with cost ' + str(cost(population[0]))+'\n')
-	'''
 if __name__== '__main__': main()
@@ -3,16 +3,15 @@ import os
 import random
 import sys
 import pdb
-import pprint
 from time import strftime
 
-# for data output to Excel File
-from xlsxwriter.workbook import Workbook
-
 # import local libraries
 # Commandline provides access to functions for running simulation from commandline
 from Helpers import commandline
 from Helpers import helpers
+from Helpers import metrics
+from Helpers import output
+from Helpers.trajectory import TrajectoryWriter
 # import simulation objects
 #from oldCode.colony import SmartSwarm
 from World.swarm import SmartSwarm
@@ -38,10 +37,15 @@ class Simulation(object):
     self.folder = None
     self.run = False
 
-    # Keeps track of the excel data since we can only write it in one go
-    self.excel = {}
-    self.excel['headers'] = []
-    self.excel['data'] = [[]]
+    # Records the simulation for the visualization (see Helpers/trajectory.py)
+    self.trajectory = None
+
+    # Stores the location and read moment of the robots at every timestep (see
+    # Helpers/metrics.py)
+    self.metrics = None
+
+    # Writes the text files of the run (see Helpers/output.py)
+    self.output = None
 
     # Seed the simulation
     self.seed = seed
@@ -49,6 +53,10 @@ class Simulation(object):
     # Stores the template
     self.template = template
 
+    # The reason the last run ended early because the structure failed (None
+    # if it did not)
+    self.failure = None
+
   def __setup_general(self):
     '''
     Function to setup the general settigns for the SAP2000 program
@@ -160,7 +168,7 @@ class Simulation(object):
 
     return True
 
-  def __push_information(self,file_obj):
+  def __push_information(self):
     '''
     Writes out the data from variables and construction
     '''
@@ -184,74 +192,40 @@ class Simulation(object):
       data += '\n\n'
 
     # Write out the data and you are now done
-    file_obj.write(data)
+    self.output.write('run_data.txt',data)
 
-  def __push_data(self,data,file_obj,i):
+  def __push_data(self,data,i):
     '''
-    Writes a set of data to a data file in specified format
+    Stores a set of data from the swarm in the metrics and writes it to the
+    robot data file (both on the writer thread)
     '''
-    to_write = "Data for Timestep: {}\n\n\n".format(str(i))
-    for name, state in data.items():
-      to_write += "{} = \n\n".format(name)
-      for key, temp_data in state.items():
-        to_write += "{} : {}\n".format(str(key),pprint.pformat(temp_data))
-      to_write += "\n"
-    file_obj.write(to_write + "\n")
+    self.output.call(self.metrics.add,i,data)
+    self.output.submit('robot_data.txt',output.robot_data,data,i)
 
-  def __add_excel(self,data):
+  def __close_sinks(self):
     '''
-    Stores timestep data in the simulation
+    Writes out and closes the trajectory, metrics and output files of the
+    current run, if there are any. The output goes first, since its writer
+    thread may still be adding metrics.
     '''
-    timestep = []
-    for name, state in data.items():
-
-      # Add names to headers if not already there
-      if name not in self.excel['headers']:
-        self.excel['headers'].append(name)
-        self.excel['headers'].append("{}-height".format(name))
-        self.excel['headers'].append("{}-measured moment".format(name))
-
-      # Add the location to a list
-      timestep.append(state['location'])
-      timestep.append(state['location'][2])
-      timestep.append(state['read_moment'])
+    for sink in (self.output,self.metrics,self.trajectory):
+      if sink is not None:
+        sink.close()
+    self.output = self.metrics = self.trajectory = None
 
-    # Add the location list to a list of rows
-    self.excel['data'].append(timestep)
-
-
-  def __push_excel(self,file_name):
+  def __open_sinks(self,outputfolder):
     '''
-    Writes a set of data to an excel file
+    Closes the files of the current run and opens those of a new run in the
+    folder
     '''
-    # Open work book
-    workbook = Workbook(file_name)
-    worksheet = workbook.add_worksheet()
-
-    # start at top left corner and write headers
-    row, col = 0, 0
-    for header in self.excel['headers']:
-      worksheet.write(row,col, str(header))
-      col += 1
-
-    # start in second row and write data
-    row, col = 1, 0
-    for row_data in self.excel['data']:
-      for cell_data in row_data:
-        worksheet.write(row, col, str(cell_data))
-        col += 1
-      row += 1
-      col = 0
-
-    workbook.close()
-
-    # Empty memory (this usually happens every 4000 timesteps)
-    self.excel['header'] = []
-    self.excel['data'] = [[]]
+    self.__close_sinks()
+    self.trajectory = TrajectoryWriter(outputfolder + 'trajectory.bin')
+    self.metrics = metrics.MetricsSink(outputfolder)
+    self.output = output.OutputSink(outputfolder,PROGRAM['output_thread'])
 
   def makeOutputFolder(self,comment):
-    return (PROGRAM['root_folder'] + "\\" + strftime("%Y-%b") + "\\" +
-        strftime("%b-%d") + "\\" + strftime("%H_%M_%S") + comment + "\\")
+    return os.path.join(PROGRAM['root_folder'],strftime("%Y-%b"),
+      strftime("%b-%d"),strftime("%H_%M_%S") + comment,"")
 
   def reset(self, comment = ""):
     '''
@@ -278,6 +252,10 @@ class Simulation(object):
       self.Structure.reset()
       self.Swarm.reset()
 
+      # Record the new run in its own folder
+      self.__open_sinks(outputfolder)
+      self.Structure.trajectory = self.Swarm.trajectory = self.trajectory
+
       self.folder = outputfolder
       self.run = False
 
@@ -305,8 +283,10 @@ class Simulation(object):
       self.started = True
 
     # Make python structure and start up the colony
-    self.Structure = Structure(visualization)
-    self.Swarm = SmartSwarm(robots, self.Structure, self.SapProgram)
+    self.__open_sinks(outputfolder)
+    self.Structure = Structure(visualization, self.trajectory)
+    self.Swarm = SmartSwarm(robots, self.Structure, self.SapProgram,
+      self.trajectory)
 
     # If we started with a previous model, we have to add all of the beams 
     # to our own model in python
@@ -323,6 +303,7 @@ class Simulation(object):
     if self.started:
       ret = self.SapProgram.exit()
       assert ret == 0
+      self.__close_sinks()
       self.started = False
       self.run = False
       self.folder = None
@@ -372,8 +353,9 @@ class Simulation(object):
 
     # Make sure that the model is not locked so that we can change properties. 
     # Unlock it if it is
-    if self.SapModel.GetModelIsLocked():
-      self.SapModel.SetModelIsLocked(False)
+    self.Swarm.scheduler.unlock()
+
+    self.failure = None
 
     # Set everything up.
     if not self.__setup_general():
@@ -383,22 +365,26 @@ class Simulation(object):
     if not self.__setup_analysis():
       sys.exit("Analysis Setup Failed.")
 
-    # Open files for writing if debugging
-    with open(outputfolder + 'repair_info.txt', 'a') as repair_file, open(outputfolder + "robot_data.txt", 'a') as loc_text, open(outputfolder + "sap_failures.txt", 'a') as sap_failures, open(outputfolder + "run_data.txt", 'a') as run_text, open(outputfolder + "structure.txt", "a") as struct_data:
-      loc_text.write("This file contains information on the robots at each" +
+    # Write the files of the run (making sure everything is written out, even
+    # if the simulation fails)
+    try:
+      self.output.open('repair_info.txt','robot_data.txt','sap_failures.txt',
+        'run_data.txt','structure.txt')
+      self.output.write('robot_data.txt',"This file contains information on the robots at each" +
         " timestep if debugging.\n\n")
-      sap_failures.write("This file contains messages created when SAP 2000 does"
+      self.output.write('sap_failures.txt',"This file contains messages created when SAP 2000 does"
        + " not complete a function successfully if debugging.\n\n")
-      struct_data.write("This file contains the data about the Pythonic" +
+      self.output.write('structure.txt',"This file contains the data about the Pythonic" +
         " structure.\n\nCurrently unused do to space issues.")
-      run_text.write("This file contains the variables used in the run of the" +
+      self.output.write('run_data.txt',"This file contains the variables used in the run of the" +
         " simulation.\n\nTotal timesteps: " + str(timesteps) + "\nStart time of"
         + " simumation: " + start_time + "\nSeed:" + str(self.seed) + "\n\n")
 
-      run_text.write("Folder: {}\n\n".format(str(self.folder)))
+      self.output.write('run_data.txt',"Folder: {}\n\n".format(str(
+        self.folder)))
 
       # Write variables
-      self.__push_information(run_text)
+      self.__push_information()
 
       if debug:
         print(PROGRAM['debug_message'])
@@ -412,47 +398,42 @@ class Simulation(object):
         if visualization:
           self.Swarm.show()
 
-        # Add number and new line to structure visualization data
-        self.Structure.visualization_data += "\n"
+        # Start the next timestep of the visualization data
+        self.trajectory.step()
         self.Structure.structure_data.append([])
-        
-        try:
-          self.Structure.color_data += '\n'
-        except MemoryError:
-          self.Structure.color_data = ''
-
 
         # Save to a different filename every now and again
         try:
           if (i+1) % PROGRAM['analysis_timesteps'] == 0 and i != 0:
             filename = "tower-" + str(i+1) + ".sdb"
+            self.Swarm.scheduler.flush()
             self.SapModel.File.Save(outputfolder + filename)
         except:
           print("Simulation ended when saving output.")
           if writeOut:
             swarm_data = self.Swarm.get_information()
-            self.__add_excel(swarm_data)
-            self.__push_data(swarm_data,loc_text,i+1)
-          self.exit(run_text)
+            self.__push_data(swarm_data,i+1)
+          self.exit()
           raise
 
         # Run the analysis if there is a structure to analyze and there are \
         # robots on it (ie, we actually need the information)
         if self.Structure.tubes > 0 and self.Swarm.need_data():
           try:
-            sap_failures.write(helpers.run_analysis(self.SapModel))
+            self.output.write('sap_failures.txt',
+              self.Swarm.scheduler.request())
           except:
             if writeOut:
               swarm_data = self.Swarm.get_information()
-              self.__add_excel(swarm_data)
-              self.__push_data(swarm_data,loc_text,i+1)
-            self.exit(run_text)
+              self.__push_data(swarm_data,i+1)
+            self.exit()
             raise
 
           # Check the structure for stability
           failed = self.Structure.failed(self.SapProgram)
           if failed:
             print(failed)
+            self.failure = failed
             break
 
         # debuggin here for quick access to decide/act methods
@@ -466,15 +447,10 @@ class Simulation(object):
           print("Simulation ended at decision.")
           if writeOut:
             swarm_data = self.Swarm.get_information()
-            self.__add_excel(swarm_data)
-            self.__push_data(swarm_data,loc_text,i+1)
-          self.exit(run_text)
+            self.__push_data(swarm_data,i+1)
+          self.exit()
           raise
 
-        # Make sure that the model has been unlocked, and if not, unlock it
-        if self.SapModel.GetModelIsLocked():
-          self.SapModel.SetModelIsLocked(False)
-          
         # Change the model based on decisions made (act on your decisions)
         try:
           self.Swarm.act()
@@ -482,22 +458,22 @@ class Simulation(object):
           print("Simulation ended at act.")
           if writeOut:
             swarm_data = self.Swarm.get_information()
-            self.__add_excel(swarm_data)
-            self.__push_data(swarm_data,loc_text,i+1)
-          self.exit(run_text)
+            self.__push_data(swarm_data,i+1)
+          self.exit()
           raise
 
         # Write out errors on movements
         errors = self.Swarm.get_errors()
         if errors != '':
-          sap_failures.write("Errors that occurred in timestep {}. {}\n\n".format(
-            str(i+1),errors))
+          self.output.write('sap_failures.txt',
+            "Errors that occurred in timestep {}. {}\n\n".format(str(i+1),errors))
 
         # Write out repair information
         repair_data = self.Swarm.get_repair_data()
         if repair_data != '':
-            repair_file.write("Repairs for begun at timestep {}:\n {}\n".format(
-              str(i+1),repair_data))
+            self.output.write('repair_info.txt',
+              "Repairs for begun at timestep {}:\n {}\n".format(str(i+1),
+              repair_data))
 
         # Give a status update if necessary
         commandline.status("Finished timestep {}.".format(str(i + 1)))
@@ -505,17 +481,18 @@ class Simulation(object):
 
         # Sort beam data
         if self.Structure.structure_data[-1] != []:
-          self.Structure.structure_data[-1].sort(key=lambda t: int(t[0]))
+          self.Structure.structure_data[-1].sort(
+            key=lambda t: self.Structure.table.ids[t[0]])
 
         # Check height of structure and break out if we will reach maximum
         if self.Structure.height > WORLD['properties']['dim_z'] - 2* BEAM['length']:
           break
 
-        with open(self.folder + 'random_seed_results.txt', 'a') as rand_tex:
-          rand_tex.write("{},".format(str(random.randint(0,i+1))))
+        self.output.write('random_seed_results.txt',"{},".format(str(
+          random.randint(0,i+1))))
 
-        with open(self.folder + 'structure_height.txt', 'a') as str_height:
-          str_height.write("{},\n".format(str(self.Structure.height)))
+        self.output.write('structure_height.txt',"{},\n".format(str(
+          self.Structure.height)))
 
         # We run out of mememory is we don't do this every once in a while
         if i % 100 == 0 and i != 0:
@@ -525,27 +502,24 @@ class Simulation(object):
           # Write out structure physics
           self.structure_physics()
 
-        # We run out of memory for Excel information if we don't clean it out
-        # everynow and again
-        if i % 5000 == 0 and i != 0:
-          self.__push_excel(self.folder + "locations-{}.xlsx".format(str(i)))
-
         # This section writes the robots decisions out to a file
         if writeOut:
           swarm_data = self.Swarm.get_information()
-          self.__add_excel(swarm_data)
-          self.__push_data(swarm_data,loc_text,i+1)
+          self.__push_data(swarm_data,i+1)
           
         # END OF LOOOP
 
       # Clean up
-      self.exit(run_text)
+      self.exit()
+    finally:
+      self.output.flush()
 
-  def exit(self,run_text):
+  def exit(self):
 
     # Sort beam data
     if self.Structure.structure_data[-1] != []:
-      self.Structure.structure_data[-1].sort(key=lambda t: int(t[0]))
+      self.Structure.structure_data[-1].sort(
+        key=lambda t: self.Structure.table.ids[t[0]])
 
     # Finish up run_data (add ending time and maximum height)
     run_data = ("\n\nStop time : " + strftime("%H:%M:%S") + 
@@ -555,47 +529,39 @@ class Simulation(object):
       self.Structure.height) + "."
 
     # Write out simulation data
-    run_text.write(run_data)
+    self.output.write('run_data.txt',run_data)
 
-    # Write out locations to excel
-    self.__push_excel(self.folder + "locations-end.xlsx")
+    # Write out the locations, and export them to excel if requested
+    self.output.flush()
+    self.metrics.close()
+    if PROGRAM['excel_export']:
+      metrics.export_excel(self.folder,self.folder + "locations-end.xlsx")
 
     # Write out visualization data
     self.visualization_data()
 
     # Write out structure moments
     self.structure_physics()
+    self.output.flush()
 
     self.run = True
 
   def visualization_data(self):
     '''
-    Writes out the data for the visualization currently stored and clears the
-    buffers
+    Writes out the data for the visualization currently stored, along with a
+    keyframe of the current state so that playback can jump here directly (see
+    Helpers/trajectory.py)
     '''
-    # Write data
-    with open(self.folder + 'structure_color_data.txt','a') as c_struct, open(self.folder + 'swarm_color_data.txt', 'a') as c_swarm, open(self.folder + 'swarm_visualization.txt', 'a') as v_swarm, open(self.folder + 'structure_visualization.txt','a') as v_struct:
-      v_swarm.write(self.Swarm.visualization_data)
-      c_swarm.write(self.Swarm.color_data)
-      v_struct.write(self.Structure.visualization_data)
-      c_struct.write(self.Structure.color_data)
-
-    # Clear buffers
-    self.Swarm.visualization_data = ''
-    self.Swarm.color_data = ''
-    self.Structure.visualization_data = ''
-    self.Structure.color_data = ''
+    self.trajectory.keyframe()
+    self.trajectory.flush()
 
   def structure_physics(self):
     '''
     Writes out the physical data for the structure and clears the buffer.
     '''
     # Write data
-    with open(self.folder + 'structure_physics.txt',"a") as struct_phys:
-      for timestep in self.Structure.structure_data:
-        for beam,moment in timestep:
-          struct_phys.write("{},{},".format(beam,str(moment)))
-        struct_phys.write("\n")
+    self.output.submit('structure_physics.txt',output.structure_physics,
+      self.Structure.structure_data)
 
     # Clear buffers
     self.Structure.structure_data = []
@@ -0,0 +1,210 @@
+'''
+Runs many simulations in parallel. A batch is the grid of every combination of
+seeds, robot counts and overrides of the settings in variables.py,
+Behaviour/constants.py (or any other module). Runs are spread over a process
+pool, so each worker drives its own analysis program (SAP2000 or the local
+solver, see PROGRAM['sap_backend']). One row per run is written to a CSV
+index as runs finish, with the seed, the final height, the number of beams,
+the wall time and the reason the run failed, if it did.
+
+Overrides are dictionaries of {path : value}, where the path is a module,
+followed by an attribute and the keys within it, such as
+"variables.PROGRAM.sap_backend" or "Behaviour.constants.prob.steep_climb".
+Values are replaced where they are stored, so settings computed from them
+when the modules were imported (like MATERIAL['beam_load']) are not updated.
+
+Edit the settings at the bottom of this file and run "python run_batch.py".
+'''
+# Python default libraries
+import contextlib
+import csv
+import importlib
+import itertools
+import json
+import os
+import random
+import time
+import traceback
+import types
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Columns of the index written for every batch
+COLUMNS = ["run", "seed", "robots", "overrides", "timesteps", "height", "beams",
+  "time", "failure", "folder"]
+
+# Marks settings which did not exist before they were overridden
+MISSING = object()
+
+def grid(seeds, robots, overrides = ({},), timesteps = 1000, model = ""):
+  '''
+  Returns the configurations (dictionaries) of every combination of seed,
+  number of robots and overrides, numbered in order
+  '''
+  return [{ 'run'       : run,
+            'seed'      : seed,
+            'robots'    : robot_number,
+            'overrides' : dict(override),
+            'timesteps' : timesteps,
+            'model'     : model }
+    for run, (override, robot_number, seed) in enumerate(itertools.product(
+      overrides, robots, seeds))]
+
+def locate(path):
+  '''
+  Returns the object holding the setting at the path, and the attribute or
+  key of the setting in that object
+  '''
+  parts = path.split(".")
+
+  # The module is the longest prefix of the path that can be imported
+  for end in range(len(parts) - 1, 0, -1):
+    try:
+      container = importlib.import_module(".".join(parts[:end]))
+      break
+    except ImportError:
+      continue
+  else:
+    raise ValueError("No module found in setting {}".format(path))
+
+  name = parts[end]
+  for part in parts[end + 1:]:
+    container = (getattr(container, name) if isinstance(container,
+      types.ModuleType) else container[name])
+    name = part
+  return container, name
+
+def override(settings):
+  '''
+  Applies the settings ({path : value}). Returns the previous values, which
+  restore() puts back.
+  '''
+  previous = []
+  for path, value in settings.items():
+    container, name = locate(path)
+    if isinstance(container, types.ModuleType):
+      previous.append((container, name, getattr(container, name, MISSING)))
+      setattr(container, name, value)
+    else:
+      previous.append((container, name, container.get(name, MISSING)))
+      container[name] = value
+  return previous
+
+def restore(previous):
+  '''
+  Puts back the values returned by override()
+  '''
+  for container, name, value in reversed(previous):
+    if isinstance(container, types.ModuleType):
+      if value is MISSING:
+        delattr(container, name)
+      else:
+        setattr(container, name, value)
+    elif value is MISSING:
+      container.pop(name, None)
+    else:
+      container[name] = value
+
+def run(configuration, logs = "", runs = ""):
+  '''
+  Runs the simulation described by a configuration (see grid()) and returns
+  its row of the index. The output of the simulation is written to a log file
+  in the logs folder (or discarded if there is none). The files of the run are
+  written to a new folder inside the runs folder (PROGRAM['root_folder'] if
+  there is none).
+  '''
+  settings = dict(configuration['overrides'])
+  if runs != "":
+    settings['variables.PROGRAM.root_folder'] = runs
+  previous = override(settings)
+  row = dict(configuration, overrides = json.dumps(configuration['overrides'],
+    sort_keys = True), height = None, beams = None, time = None,
+    failure = None, folder = None)
+  log_name = (os.path.join(logs, "run-{}.txt".format(configuration['run']))
+    if logs != "" else os.devnull)
+  row.pop('model')
+
+  try:
+    with open(log_name, 'w') as log, contextlib.redirect_stdout(log):
+      # The simulation is imported here so that it sees the overridden
+      # settings that are read when it is used
+      from main import Simulation
+
+      # Each run is seeded, so it can be repeated on its own
+      random.seed(configuration['seed'])
+
+      comment = "-run{}".format(configuration['run'])
+      sim = Simulation(configuration['seed'])
+      start = time.time()
+      try:
+        sim.start(False, configuration['robots'], comment = comment,
+          model = configuration['model'])
+        row['folder'] = sim.folder
+        sim.run_simulation(False, configuration['timesteps'], 0, comment)
+        row['failure'] = sim.failure
+      except SystemExit as e:
+        row['failure'] = "Exited: {}".format(e)
+      except Exception:
+        row['failure'] = traceback.format_exc().strip().split("\n")[-1]
+        traceback.print_exc(file = log)
+      finally:
+        row['time'] = round(time.time() - start, 3)
+        if sim.Structure is not None:
+          row['height'], row['beams'] = sim.Structure.height, sim.Structure.tubes
+        if sim.started:
+          sim.stop()
+  finally:
+    restore(previous)
+
+  return row
+
+def run_batch(configurations, index, workers = None, logs = "", runs = ""):
+  '''
+  Runs the configurations over a pool of the given number of worker processes
+  (one per cpu by default), writing the row of each run to the CSV index as
+  soon as it finishes. Returns the rows, in the order of the configurations.
+  The logs and the files of the runs are written to the logs and runs folders
+  (see run()).
+  '''
+  if logs != "" and not os.path.isdir(logs):
+    os.makedirs(logs)
+
+  rows = {}
+  with open(index, 'w', newline = '') as index_file, ProcessPoolExecutor(
+    max_workers = workers) as pool:
+    writer = csv.DictWriter(index_file, COLUMNS)
+    writer.writeheader()
+
+    futures = {pool.submit(run, configuration, logs, runs) : configuration
+      for configuration in configurations}
+    for future in as_completed(futures):
+      configuration = futures[future]
+      try:
+        row = future.result()
+      except Exception as e:
+        # The worker itself failed (for example, it could not be started)
+        row = dict((column, configuration.get(column)) for column in COLUMNS)
+        row['overrides'] = json.dumps(configuration['overrides'],
+          sort_keys = True)
+        row['failure'] = "Worker failed: {!r}".format(e)
+      writer.writerow(row)
+      index_file.flush()
+      rows[row['run']] = row
+      print("Finished run {} of {} (seed {}, {} robots): height {}, {}.".format(
+        len(rows), len(futures), row['seed'], row['robots'], row['height'],
+        row['failure'] or "no failure"))
+
+  return [rows[configuration['run']] for configuration in configurations]
+
+if __name__ == '__main__':
+  # Settings for the batch (see grid() and run_batch())
+  seeds = ["r@nd0M{}".format(i) for i in range(100)]
+  robots = [5, 10]
+  overrides = [{ 'variables.PROGRAM.sap_backend' : 'local' }]
+  timesteps = 1000
+  workers = None
+  folder = os.path.join(os.getcwd(), "batch-" + time.strftime("%Y%m%d-%H%M%S"))
+
+  configurations = grid(seeds, robots, overrides, timesteps)
+  os.makedirs(folder)
+  run_batch(configurations, os.path.join(folder, "index.csv"), workers,
+    os.path.join(folder, "logs"), os.path.join(folder, "runs"))
@@ -95,6 +95,17 @@ PROGRAM = {
   # structure
   'epsilon' : 0.0001,
 
+  # Backend used for the vector operations in Helpers/algebra.py. Either 
+  # 'python' (plain tuples) or 'numpy' (float64 arrays, see 
+  # Helpers/vectorized.py). Both expose the same tuple API, so runs on the same
+  # seed can be compared between the two.
+  'algebra_backend' : 'python',
+
+  # Program used for the structural analysis. Either 'com' (SAP2000, through 
+  # its COM interface, Windows only) or 'local' (the in-process frame solver 
+  # in SAP2000/local.py, which mimics the parts of SAP2000 we use)
+  'sap_backend' : 'com',
+
   # Name of the load case for the robots
   'robot_load_case' : "DEAD",
   'wind_case' : "Wind",
@@ -109,6 +120,14 @@ PROGRAM = {
   # the output folder for saving files
   'root_folder' : 'C:\SAP 2000\\',
 
+  # whether the locations of the robots are also exported to an excel file at
+  # the end of a run (they are always stored in the metrics folder of the run)
+  'excel_export' : True,
+
+  # whether the files of a run are formatted and written by a background
+  # thread, so the simulation does not wait on the disk (see Helpers/output.py)
+  'output_thread' : True,
+
   # mesagge instructions for debugging
   'debug_message' :   ("You are in debugging mode. Press n to continue to the next line.\n"+
             "Press s to step into the current function. Press c to go to next timestep.\n"+ 
@@ -135,6 +154,9 @@ VISUALIZATION = {
 
   # should the visualization record data for deflection?
   'deflection' : True,
+
+  # number of timesteps skipped when seeking with the arrow keys in playback
+  'seek'        : 100,
 } 
 
 # This stores information for the simulation - for example, output folder
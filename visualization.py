@@ -1,4 +1,5 @@
 # python libraries
+import os
 import time
 import re
 
@@ -7,6 +8,7 @@ import visual
 
 #local libraries
 from Helpers import helpers
+from Helpers.trajectory import TrajectoryReader
 from construction import HOME, CONSTRUCTION
 from variables import BEAM, MATERIAL, PROGRAM, VISUALIZATION, WORLD
 
@@ -59,10 +61,42 @@ def setup_base():
   temp = visual.box(pos=center, length=dim[0],height=dim[1],width=0.1)
   temp.color = (0,1,0)
 
+class LoadedTrajectory(object):
+  '''
+  Data loaded from the text logs written before Helpers/trajectory.py, with
+  the same interface as a TrajectoryReader
+  '''
+  def __init__(self,data):
+    super(LoadedTrajectory,self).__init__()
+
+    # The changes at every timestep
+    self.data = data
+
+  def __len__(self):
+    return len(self.data)
+
+  def frame(self,timestep):
+    return self.data[timestep]
+
+  def origins(self,timestep):
+    origins = {}
+    for frame in self.data[:timestep + 1]:
+      for name, coords in frame[2]:
+        origins.setdefault(name,coords)
+    return origins
+
+  def state(self,timestep):
+    state = ({},{},{},{})
+    for frame in self.data[:timestep + 1]:
+      for values, changes in zip(state,frame):
+        values.update(changes)
+    return tuple(list(values.items()) for values in state)
+
 class Visualization(object):
   def __init__(self,outputfolder):
-    # Stores the loaded data in mememory
-    self.data = []
+    # Gives access to the data of each timestep (a TrajectoryReader or a
+    # LoadedTrajectory)
+    self.trajectory = None
 
     # Folder storage
     self.folder = outputfolder
@@ -73,15 +107,24 @@ class Visualization(object):
     # Keeps track of beams to update color with each timestep
     self.beams = {}
 
+    # The endpoints each beam was first shown at, {name : (i, j)}. Deflections
+    # are scaled from these (see scaled).
+    self.origins = {}
+
     # Keeps track of the simulation (inverse) speed
     self.inverse_speed = None
 
   def load_data(self,swarm='swarm_visualization.txt',
     structure='structure_visualization.txt',color_swarm='swarm_color_data.txt',
-    color_structure='structure_color_data.txt'):
+    color_structure='structure_color_data.txt',trajectory='trajectory.bin'):
     '''
-    Loads the data from the files specified
+    Loads the data from the trajectory file (see Helpers/trajectory.py), or
+    from the text files specified for folders written before it existed
     '''
+    if os.path.exists(self.folder + trajectory):
+      self.trajectory = TrajectoryReader(self.folder + trajectory)
+      return
+
     def load_file(file_obj,two=True):
       '''
       Loads the date from one file. If the bool both is true, then it loads two
@@ -131,10 +174,18 @@ class Visualization(object):
       swarm_colors = load_file (sc_file,False)
       struct_loc = load_file(st_file,True)
       struct_color = load_file(stc_file,False)
-      self.data = list(zip(swarm_loc,swarm_colors,struct_loc,struct_color))
+      self.trajectory = LoadedTrajectory(list(zip(swarm_loc,swarm_colors,
+        struct_loc,struct_color)))
 
-  def run(self,fullscreen = True, inverse_speed=.25):
-    if self.data == []:
+  def run(self,fullscreen = True, inverse_speed=.25, start = 0):
+    '''
+    Plays the loaded data from the start timestep. While playing, the keys
+      f, s        = play faster, or more slowly
+      space       = pause or continue
+      left, right = jump VISUALIZATION['seek'] timesteps backwards or forwards
+      home, end   = jump to the first or the last timestep
+    '''
+    if self.trajectory is None or len(self.trajectory) == 0:
       print("No data has been loaded. Cannot run simulation.")
     else:
       # Store inverse speed
@@ -146,68 +197,11 @@ class Visualization(object):
       # Setup basic
       setup_base()
 
-      # Cycle through timestep data
-      timestep = 1
-      for swarm_step, swarm_color,structure_step,struct_color in self.data:
-        for name, locations in swarm_step:
-
-          # Create the object
-          if name not in self.workers:
-            self.workers[name] = visual.sphere(pos=locations[0],
-              radius=VISUALIZATION['robot_size']/2,make_trail=False)
-            self.workers[name].color = (1,0,1)
-
-          # Change the objects position
-          else:
-            self.workers[name].pos = locations[0]
-
-        # Set the color
-        for name, colors in swarm_color:
-          self.workers[name].color = colors[0]
-
-        # Add beams if any
-        for name,coords in structure_step:
-          i,j = coords
-
-          # Add new beam if not in dictionary
-          if name not in self.beams:
-            self.add_beam(name,i,j)
-          # Otherwise, this means the beam has deflected, so change the position
-          else:
-            # Scale visualization
-            scale = VISUALIZATION['scaling']
-
-            # Old endpoints (we use this to scale at different values each time
-            # we run)
-            old_i = self.beams[name].pos
-            old_j = helpers.sum_vectors(self.beams[name].pos,self.beams[name].axis)
-
-            # Calculate changes from old location to new location
-            i_change = helpers.scale(scale,helpers.make_vector(old_i,i))
-            j_change = helpers.scale(scale,helpers.make_vector(old_j,j))
-
-            # Calculate the new location based on the scaled chage
-            new_i = helpers.sum_vectors(old_i,i_change) 
-            new_j = helpers.sum_vectors(old_j,j_change)
-            new_axis = helpers.make_vector(new_i,new_j)
-
-            # Update the visualization
-            self.beams[name].pos = new_i
-            self.beams[name].axis = new_axis
-          
-          # Update window dimensions
-          limit = max(j)
-          if limit > max(scene.range):
-            scene.range = (limit,limit,limit)
-            scene.center = helpers.scale(.5,helpers.sum_vectors(
-              CONSTRUCTION['corner'],scene.range))
-
-        # Change the color of the beams
-        for name,colors in struct_color:
-          try:
-            self.beams[name].color = colors[0]
-          except IndexError:
-            print("A nonexistant beam is beam is to be recolored!")
+      # Show the state at the start, then cycle through the following timesteps
+      timestep = self.seek(scene,start)
+      while timestep + 1 < len(self.trajectory):
+        timestep += 1
+        self.show(scene,self.trajectory.frame(timestep))
 
         # Check key_presses
         if scene.kb.keys:
@@ -224,9 +218,132 @@ class Visualization(object):
               self.pause(scene)
             else:
               pass
+          # Jump to another timestep
+          elif s == 'left':
+            timestep = self.seek(scene,timestep - VISUALIZATION['seek'])
+          elif s == 'right':
+            timestep = self.seek(scene,timestep + VISUALIZATION['seek'])
+          elif s == 'home':
+            timestep = self.seek(scene,0)
+          elif s == 'end':
+            timestep = self.seek(scene,len(self.trajectory) - 1)
 
         time.sleep(inverse_speed)
-        timestep += 1
+
+  def fit(self,scene,j):
+    '''
+    Makes the scene large enough to show a beam ending at j
+    '''
+    limit = max(j)
+    if limit > max(scene.range):
+      scene.range = (limit,limit,limit)
+      scene.center = helpers.scale(.5,helpers.sum_vectors(
+        CONSTRUCTION['corner'],scene.range))
+
+  def show(self,scene,frame):
+    '''
+    Shows the changes of one timestep
+    '''
+    swarm_step, swarm_color,structure_step,struct_color = frame
+    for name, locations in swarm_step:
+
+      # Create the object
+      if name not in self.workers:
+        self.workers[name] = visual.sphere(pos=locations[0],
+          radius=VISUALIZATION['robot_size']/2,make_trail=False)
+        self.workers[name].color = (1,0,1)
+
+      # Change the objects position
+      else:
+        self.workers[name].pos = locations[0]
+        self.workers[name].visible = True
+
+    # Set the color
+    for name, colors in swarm_color:
+      self.workers[name].color = colors[0]
+
+    # Add beams if any
+    for name,coords in structure_step:
+      i,j = coords
+
+      # Add new beam if not shown
+      self.origins.setdefault(name,(i,j))
+      if name not in self.beams or not self.beams[name].visible:
+        self.add_beam(name,i,j)
+      # Otherwise, this means the beam has deflected, so change the position
+      else:
+        new_i, new_j = self.scaled(name,i,j)
+
+        # Update the visualization
+        self.beams[name].pos = new_i
+        self.beams[name].axis = helpers.make_vector(new_i,new_j)
+      
+      # Update window dimensions
+      self.fit(scene,j)
+
+    # Change the color of the beams
+    for name,colors in struct_color:
+      try:
+        self.beams[name].color = colors[0]
+      except (IndexError,KeyError):
+        print("A nonexistant beam is beam is to be recolored!")
+
+  def scaled(self,name,i,j):
+    '''
+    Returns the endpoints at which a beam deflected to i and j is shown: its
+    deflection from where it was first shown is scaled by
+    VISUALIZATION['scaling']
+    '''
+    scale = VISUALIZATION['scaling']
+    origin_i, origin_j = self.origins[name]
+    return (helpers.sum_vectors(origin_i,helpers.scale(scale,
+      helpers.make_vector(origin_i,i))),helpers.sum_vectors(origin_j,
+      helpers.scale(scale,helpers.make_vector(origin_j,j))))
+
+  def seek(self,scene,timestep):
+    '''
+    Shows the state of every robot and beam at the end of the timestep (which
+    is limited to the timesteps loaded). Returns the timestep shown.
+    '''
+    timestep = min(max(timestep,0),len(self.trajectory) - 1)
+    swarm_step, swarm_color,structure_step,struct_color = (
+      self.trajectory.state(timestep))
+
+    # Hide whatever does not exist yet at the timestep
+    robots = set(name for name, locations in swarm_step)
+    for name, worker in self.workers.items():
+      worker.visible = name in robots
+    beams = set(name for name, coords in structure_step)
+    for name, beam in self.beams.items():
+      beam.visible = name in beams
+
+    for name, locations in swarm_step:
+      if name not in self.workers:
+        self.workers[name] = visual.sphere(pos=locations[0],
+          radius=VISUALIZATION['robot_size']/2,make_trail=False)
+        self.workers[name].color = (1,0,1)
+      else:
+        self.workers[name].pos = locations[0]
+    for name, colors in swarm_color:
+      self.workers[name].color = colors[0]
+
+    # Beams are shown where they are (with their deflection scaled as during
+    # playback), without the extrusion of add_beam
+    for name, origin in self.trajectory.origins(timestep).items():
+      self.origins.setdefault(name,tuple(origin))
+    for name, (i,j) in structure_step:
+      i, j = self.scaled(name,i,j)
+      if name not in self.beams:
+        self.beams[name] = visual.cylinder(pos=i,axis=helpers.make_vector(i,j),
+          radius=MATERIAL['outside_diameter'],color=(0,1,0))
+      else:
+        self.beams[name].pos = i
+        self.beams[name].axis = helpers.make_vector(i,j)
+      self.fit(scene,j)
+    for name, colors in struct_color:
+      self.beams[name].color = colors[0]
+
+    return timestep
 
   def pause(self,scene):
     '''
@@ -250,9 +367,14 @@ class Visualization(object):
     change = 1
     unit_axis = helpers.make_unit(helpers.make_vector(i,j))
 
-    # Create the beam
-    self.beams[name] = visual.cylinder(pos=i,axis=unit_axis,
-      radius=MATERIAL['outside_diameter'],color=(0,1,0))
+    # Create the beam (or show it again after seeking back in time)
+    if name in self.beams:
+      self.beams[name].pos = i
+      self.beams[name].color = (0,1,0)
+      self.beams[name].visible = True
+    else:
+      self.beams[name] = visual.cylinder(pos=i,axis=unit_axis,
+        radius=MATERIAL['outside_diameter'],color=(0,1,0))
 
     # Extrude the beam from the robot
     while scale <= BEAM['length']: